@@ -1,146 +1,294 @@
-import requests
-from bs4 import BeautifulSoup
-import csv
-import sqlite3
-import time
-from urllib.parse import urljoin
-
-BASE_URL = "https://books.toscrape.com/catalogue/"
-
-def get_soup(url):
-    """Fetches the page content and returns a BeautifulSoup object."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.text, "html.parser")
-        return soup
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {url}: {e}")
-        return None
-
-def get_book_links(page_url):
-    """Extracts all book links from a category page."""
-    soup = get_soup(page_url)
-    if not soup:
-        return []
-    book_links = []
-    link_elements = soup.select('article.product_pod h3 a')
-    for link_element in link_elements:
-        rel_url = link_element.get('href')
-        full_url = urljoin(BASE_URL, rel_url)
-        book_links.append(full_url)
-    return book_links
-
-def parse_book_page(book_url):
-    """Parses a single book page and returns a dictionary of book details."""
-    soup = get_soup(book_url)
-    if not soup:
-        return None
-
-    try:
-        title = soup.h1.text.strip()
-        price = soup.select_one("p.price_color").text.strip()
-        availability = soup.select_one("p.instock.availability").text.strip()
-        
-        # Scrape star rating (e.g., "star-rating One")
-        rating_element = soup.select_one("p.star-rating")
-        rating = rating_element['class'][1] if rating_element else "No Rating"
-
-        description_div = soup.select_one("div#product_description")
-        description_text = ""
-        if description_div:
-            # The description is in the <p> sibling of the <div>
-            description_text = description_div.find_next_sibling("p").text.strip()
-        else:
-            description_text = "No Description"
-
-        # The category is the second last item in the breadcrumb
-        breadcrumb = soup.select('ul.breadcrumb li a')
-        category = breadcrumb[-2].text.strip() if len(breadcrumb) > 1 else "No Category"
-
-        return {
-            'Title': title,
-            'Price': price,
-            'Availability': availability,
-            'Rating': rating,
-            'Description': description_text,
-            'Category': category,
-            'URL': book_url
-        }
-    except Exception as e:
-        print(f"Error parsing book page {book_url}: {e}")
-        return None
-
-def scrap_all_books(limit_pages=5):
-    """Scrapes a specified number of pages and returns a list of book dictionaries."""
-    all_books_dict = []
-    print(f"Scraping {limit_pages} pages in progress...")
-    for i in range(1, limit_pages + 1):
-        page_url = f"https://books.toscrape.com/catalogue/page-{i}.html"
-        book_links = get_book_links(page_url)
-        for desc_link in book_links:
-            book_detail = parse_book_page(desc_link)
-            if book_detail:
-                all_books_dict.append(book_detail)
-            time.sleep(0.5)  # Be polite to the server
-    print("Scraping complete.")
-    return all_books_dict
-
-def save_to_csv(books, filename="books.csv"):
-    """Saves a list of book dictionaries to a CSV file."""
-    if not books:
-        print("No books to save.")
-        return
-
-    fieldnames = list(books[0].keys())
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(books)
-    print(f"Data saved to {filename}")
-
-def save_to_db(books, dbname="books.db"):
-    """Saves a list of book dictionaries to an SQLite database."""
-    conn = sqlite3.connect(dbname)
-    cur = conn.cursor()
-    
-    # Create the table if it doesn't exist
-    qry = '''CREATE TABLE IF NOT EXISTS books (
-        title TEXT,
-        price TEXT,
-        availability TEXT,
-        rating TEXT,
-        description TEXT,
-        category TEXT,
-        url TEXT
-    )'''
-    cur.execute(qry)
-    
-    # Clear existing data
-    cur.execute("DELETE FROM books")
-    conn.commit()
-
-    # Insert new data
-    for book in books:
-        cur.execute('''
-            INSERT INTO books (title, price, availability, rating, description, category, url)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            book['Title'],
-            book['Price'],
-            book['Availability'],
-            book['Rating'],
-            book['Description'],
-            book['Category'],
-            book['URL']
-        ))
-    
-    conn.commit()
-    conn.close()
-    print(f"Data saved to {dbname}")
-
-if __name__ == "__main__":
-    scraped_books = scrap_all_books(limit_pages=5)
-    if scraped_books:
-        save_to_csv(scraped_books)
-        save_to_db(scraped_books)
\ No newline at end of file
+import requests
+from bs4 import BeautifulSoup
+import csv
+import os
+import time
+from urllib.parse import urljoin
+
+import books_schema
+from crawl_metrics import PROGRESS_EVERY, CrawlMetrics, TimedSink
+from price_history import HistorySink
+
+BASE_URL = "https://books.toscrape.com/catalogue/"
+RETRIES = 2
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF = 0.5  # seconds before the first retry, doubled for each further one
+
+# Telemetry of the synchronous scraper; start_metrics() begins a fresh one for a run
+METRICS = CrawlMetrics()
+
+def start_metrics(progress_every=PROGRESS_EVERY):
+    """Replaces METRICS with a fresh collector, printing a progress line every `progress_every` seconds."""
+    global METRICS
+    METRICS = CrawlMetrics(progress_every)
+    return METRICS
+
+def is_retryable(exc):
+    """True for failures worth another attempt: rate limiting, server errors, timeouts and dropped connections."""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None and exc.response.status_code in RETRY_STATUSES
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def fetch(url, kind='book'):
+    """Fetches a page, retrying transient failures, and returns the response, or None on error."""
+    for attempt in range(RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            response = requests.get(url)
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+        except requests.exceptions.RequestException as e:
+            retrying = attempt < RETRIES and is_retryable(e)
+            METRICS.record_error(e, retrying)
+            if not retrying:
+                print(f"Error fetching URL {url}: {e}")
+                return None
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        else:
+            METRICS.record_response(kind, response, time.perf_counter() - start)
+            return response
+
+def get_soup(url):
+    """Fetches the page content and returns a BeautifulSoup object."""
+    response = fetch(url)
+    if response is None:
+        return None
+    return BeautifulSoup(response.text, "html.parser")
+
+def get_book_links(page_url):
+    """Extracts all book links from a category page."""
+    response = fetch(page_url, kind='listing')
+    if response is None:
+        return []
+    with METRICS.time('links'):
+        return extract_book_links(BeautifulSoup(response.text, "html.parser"))
+
+def extract_book_links(soup, base_url=BASE_URL):
+    """Returns the absolute book URLs listed on an already fetched category page."""
+    book_links = []
+    link_elements = soup.select('article.product_pod h3 a')
+    for link_element in link_elements:
+        rel_url = link_element.get('href')
+        full_url = urljoin(base_url, rel_url)
+        book_links.append(full_url)
+    return book_links
+
+def parse_book_page(book_url):
+    """Parses a single book page and returns a dictionary of book details."""
+    response = fetch(book_url)
+    if response is None:
+        return None
+    with METRICS.time('parse'):
+        book_detail = extract_book_details(BeautifulSoup(response.text, "html.parser"), book_url)
+    METRICS.record_book(book_detail)
+    return book_detail
+
+def extract_book_details(soup, book_url):
+    """Builds the book dictionary from an already fetched book page."""
+    try:
+        title = soup.h1.text.strip()
+        price = soup.select_one("p.price_color").text.strip()
+        availability = soup.select_one("p.instock.availability").text.strip()
+        
+        # Scrape star rating (e.g., "star-rating One")
+        rating_element = soup.select_one("p.star-rating")
+        rating = rating_element['class'][1] if rating_element else "No Rating"
+
+        description_div = soup.select_one("div#product_description")
+        description_text = ""
+        if description_div:
+            # The description is in the <p> sibling of the <div>
+            description_text = description_div.find_next_sibling("p").text.strip()
+        else:
+            description_text = "No Description"
+
+        # The category is the second last item in the breadcrumb
+        breadcrumb = soup.select('ul.breadcrumb li a')
+        category = breadcrumb[-2].text.strip() if len(breadcrumb) > 1 else "No Category"
+
+        return {
+            'Title': title,
+            'Price': price,
+            'Availability': availability,
+            'Rating': rating,
+            'Description': description_text,
+            'Category': category,
+            'URL': book_url
+        }
+    except Exception as e:
+        print(f"Error parsing book page {book_url}: {e}")
+        return None
+
+def iter_books(limit_pages=5):
+    """Scrapes a specified number of pages, yielding each book dictionary as soon as it is parsed."""
+    for i in range(1, limit_pages + 1):
+        page_url = f"https://books.toscrape.com/catalogue/page-{i}.html"
+        book_links = get_book_links(page_url)
+        for desc_link in book_links:
+            book_detail = parse_book_page(desc_link)
+            if book_detail:
+                yield book_detail
+            time.sleep(0.5)  # Be polite to the server
+
+def scrap_all_books(limit_pages=5, report=None):
+    """Scrapes a specified number of pages and returns a list of book dictionaries.
+
+    Progress is printed periodically; with `report` the run's telemetry is
+    written there (see finish_metrics).
+    """
+    print(f"Scraping {limit_pages} pages in progress...")
+    metrics = start_metrics()
+    all_books_dict = list(iter_books(limit_pages))
+    print("Scraping complete.")
+    finish_metrics(metrics, report)
+    return all_books_dict
+
+def finish_metrics(metrics, report=None):
+    """Prints the final progress line (unless progress is off) and, with `report`, writes the telemetry there.
+
+    The report is Prometheus text for .prom/.txt paths and JSON otherwise.
+    """
+    metrics.finish()
+    if metrics.progress_every is not None:
+        metrics.progress(force=True)
+    if report:
+        metrics.write_report(report)
+        print(f"Crawl metrics written to {report}")
+
+CSV_FIELDS = ['Title', 'Price', 'Availability', 'Rating', 'Description', 'Category', 'URL']
+
+class CsvSink:
+    """Writes book dictionaries to a CSV file one row at a time.
+
+    The file is created (header included) on the first row, so an empty
+    stream leaves any existing file alone. With append=True rows are added
+    to an existing file instead of replacing it.
+    """
+
+    stage = 'save_csv'  # crawl_metrics stage name
+
+    def __init__(self, filename="books.csv", append=False):
+        self.filename = filename
+        self.append = append
+        self.count = 0
+        self.csvfile = None
+        self.writer = None
+
+    def write(self, book):
+        if self.writer is None:
+            exists = self.append and os.path.exists(self.filename) and os.path.getsize(self.filename) > 0
+            self.csvfile = open(self.filename, 'a' if self.append else 'w', newline='', encoding='utf-8')
+            self.writer = csv.DictWriter(self.csvfile, fieldnames=CSV_FIELDS)
+            if not exists:
+                self.writer.writeheader()
+        self.writer.writerow(book)
+        self.csvfile.flush()
+        self.count += 1
+
+    def close(self):
+        if self.csvfile is not None:
+            self.csvfile.close()
+
+class SqliteSink:
+    """Writes book dictionaries to the typed books table (see books_schema) in batches of `batch_size`.
+
+    Each batch is inserted with executemany and committed, so rows become
+    durable as the crawl goes. By default the old rows are deleted in the
+    same transaction as the first batch, so an empty stream leaves the table
+    alone; with upsert=True rows are merged by URL instead.
+    """
+
+    stage = 'save_db'
+
+    def __init__(self, dbname="books.db", batch_size=500, upsert=False):
+        self.dbname = dbname
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.count = 0
+        self.batch = []
+        self.conn = books_schema.connect(dbname)
+        self.categories = books_schema.CategoryCache(self.conn)
+        self.cleared = upsert
+
+    def write(self, book):
+        self.batch.append(book)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            if not self.cleared:
+                self.conn.execute("DELETE FROM books")
+                self.cleared = True
+            books_schema.write_books(self.conn, self.batch, self.categories)
+            self.conn.commit()
+            self.count += len(self.batch)
+            self.batch.clear()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+def run_pipeline(books, *sinks, metrics=None):
+    """Streams book dictionaries from any iterable into the sinks. Returns the number of books.
+
+    With a CrawlMetrics, the time spent in each sink is recorded under its stage.
+    """
+    if metrics is not None:
+        sinks = [TimedSink(sink, metrics) for sink in sinks]
+    count = 0
+    try:
+        for book in books:
+            for sink in sinks:
+                sink.write(book)
+            count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
+
+def save_to_csv(books, filename="books.csv"):
+    """Saves book dictionaries (a list or any iterable) to a CSV file."""
+    if run_pipeline(books, CsvSink(filename), metrics=METRICS) == 0:
+        print("No books to save.")
+        return
+    print(f"Data saved to {filename}")
+
+def save_to_db(books, dbname="books.db"):
+    """Saves book dictionaries (a list or any iterable) to an SQLite database, replacing its contents.
+
+    The books are also recorded as a crawl in the price history, which is kept across saves.
+    """
+    run_pipeline(books, SqliteSink(dbname), HistorySink(dbname), metrics=METRICS)
+    print(f"Data saved to {dbname}")
+
+def upsert_books(books, dbname="books.db"):
+    """Inserts new books and updates changed ones, keyed by URL. Returns the number of rows written."""
+    sink = SqliteSink(dbname, upsert=True)
+    for book in books:
+        sink.write(book)
+    sink.flush()
+    written = sink.conn.total_changes
+    sink.close()
+    return written
+
+def load_from_db(dbname="books.db"):
+    """Reads the books table back as a list of book dictionaries."""
+    conn = books_schema.connect(dbname)
+    books = list(books_schema.read_books(conn))
+    conn.close()
+    return books
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape books.toscrape.com one page at a time.")
+    parser.add_argument("--pages", type=int, default=5, help="number of listing pages to crawl")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write the crawl telemetry here (.prom/.txt: Prometheus text, otherwise JSON)")
+    args = parser.parse_args()
+
+    print(f"Scraping {args.pages} pages in progress...")
+    metrics = start_metrics()
+    count = run_pipeline(iter_books(limit_pages=args.pages), CsvSink(), SqliteSink(), HistorySink(), metrics=metrics)
+    print(f"Scraping complete. {count} books saved to books.csv and books.db")
+    finish_metrics(metrics, args.metrics)
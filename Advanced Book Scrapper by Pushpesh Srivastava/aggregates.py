@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+import books_schema
+from data_loader import clean_books
+from vectorized import top_k_per_group
+
+# Usage:
+#   python pandas_queries.py --db books.db                  aggregate queries pushed down to SQLite
+#   python pandas_queries.py --chunksize 1000000 4 16 22    aggregate queries over the CSV in chunks
+#
+# The category, rating and price aggregations behind queries such as 3, 4,
+# 16, 22 and 40 need only a few small partial results: counts and sums per
+# (category, rating), the number of books at each price, and the top and
+# bottom books per category. They are computed from a DataFrame, from
+# read_csv chunks merged as they arrive, or by SQLite itself, and the three
+# give identical results. Prices are summed as integer pence, so merged sums
+# do not depend on chunk boundaries.
+
+TOP_K = 10  # books kept per category at each end, so top(k) and cheapest(k) work for k <= TOP_K
+CHUNKSIZE = 500_000
+COLUMNS = ['Title', 'Price', 'Availability', 'Rating', 'Category']
+GROUP_COLUMNS = ['books', 'priced', 'price_pence', 'stock']
+
+def _pence(prices):
+    return np.round(prices.to_numpy(dtype=float) * 100).astype(np.int64)
+
+class BookAggregates:
+    """Mergeable partial aggregates of the books table.
+
+    groups: books, priced books, summed price (pence) and stock per
+        (Category, Rating); a missing category is kept as NaN.
+    prices: number of books at each price (pence).
+    top_books / bottom_books: up to TOP_K most and least expensive books per category,
+        with their row position in the CSV (or books.db id order).
+    """
+
+    def __init__(self, groups, prices, top_books, bottom_books):
+        self.groups = groups
+        self.prices = prices
+        self.top_books = top_books
+        self.bottom_books = bottom_books
+
+    @classmethod
+    def from_frame(cls, df):
+        """Aggregates of a cleaned DataFrame (see data_loader.clean_books); its index holds the row positions."""
+        category = df['Category'].astype(object)
+        priced = df['Price'].notna()
+        parts = pd.DataFrame({
+            'Category': category,
+            'Rating': df['Rating'].astype(np.int64),
+            'books': 1,
+            'priced': priced.astype(np.int64),
+            'price_pence': np.where(priced, _pence(df['Price'].fillna(0)), 0),
+            'stock': df['Availability'].astype(np.int64),
+        })
+        groups = parts.groupby(['Category', 'Rating'], dropna=False, sort=True)[GROUP_COLUMNS].sum()
+        prices = pd.Series(_pence(df.loc[priced, 'Price'])).value_counts().sort_index()
+        books = pd.DataFrame({'Category': category, 'Title': df['Title'], 'Price': df['Price']}, index=df.index)
+        return cls(groups, prices, *_ends(books))
+
+    @classmethod
+    def merge(cls, parts):
+        """Combines the aggregates of consecutive chunks, in row order."""
+        parts = list(parts)
+        if not parts:
+            return cls.from_frame(clean_books(pd.DataFrame(columns=COLUMNS + ['Description'])))
+        groups = pd.concat([part.groups for part in parts]).groupby(level=[0, 1], dropna=False, sort=True).sum()
+        prices = pd.concat([part.prices for part in parts]).groupby(level=0).sum()
+        top = pd.concat([part.top_books for part in parts])
+        bottom = pd.concat([part.bottom_books for part in parts])
+        return cls(groups, prices, top_k_per_group(top, 'Category', 'Price', TOP_K),
+                   _bottom_k(bottom, TOP_K))
+
+    # --- Results, shaped like the pandas expressions they replace ---
+
+    def _categorized(self):
+        return self.groups[self.groups.index.get_level_values('Category').notna()]
+
+    def _by_category(self, column):
+        return self._categorized()[column].groupby(level='Category').sum()
+
+    def row_count(self):
+        return int(self.groups['books'].sum())
+
+    def mean_price(self, above=None, rating=None):
+        """Mean price of all books, of those priced above `above`, or of those with the given rating."""
+        if above is not None:
+            pence = self.prices[self.prices.index > round(above * 100)]
+            count = pence.sum()
+            return float((pence.index.to_numpy() * pence.to_numpy()).sum() / count / 100) if count else np.nan
+        groups = self.groups
+        if rating is not None:
+            groups = groups[groups.index.get_level_values('Rating') == rating]
+        count = groups['priced'].sum()
+        return float(groups['price_pence'].sum() / count / 100) if count else np.nan
+
+    def count_above(self, threshold):
+        return int(self.prices[self.prices.index > round(threshold * 100)].sum())
+
+    def count_equal(self, price):
+        return int(self.prices.get(round(price * 100), 0))
+
+    def rating_counts(self):
+        """df['Rating'].value_counts().sort_index()"""
+        counts = self.groups['books'].groupby(level='Rating').sum()
+        return counts[counts > 0].rename('count').astype(np.int64)
+
+    def category_counts(self):
+        """df['Category'].value_counts()"""
+        counts = self._by_category('books').rename('count')
+        return counts.sort_values(ascending=False, kind='stable')
+
+    def category_mean_price(self):
+        """df.groupby('Category')['Price'].mean()"""
+        pence, priced = self._by_category('price_pence'), self._by_category('priced')
+        return (pence / priced.where(priced > 0) / 100).rename('Price')
+
+    def category_stock(self):
+        """df.groupby('Category')['Availability'].sum()"""
+        return self._by_category('stock').rename('Availability')
+
+    def rating_by_category(self):
+        """df.groupby(['Category', 'Rating'])['Title'].count().unstack(fill_value=0)"""
+        return self._categorized()['books'].rename('Title').unstack(fill_value=0)
+
+    def price_pivot(self):
+        """df.pivot_table(values='Price', index='Category', columns='Rating', aggfunc='mean')"""
+        groups = self._categorized()
+        groups = groups[groups['priced'] > 0]
+        pivot = (groups['price_pence'] / groups['priced'] / 100).unstack()
+        pivot.columns.name = 'Rating'
+        return pivot
+
+    def top(self, k=3):
+        """Rows of the k most expensive books per category, like vectorized.top_k_per_group."""
+        if k > TOP_K:
+            raise ValueError(f"Only the top {TOP_K} books per category are kept")
+        return top_k_per_group(self.top_books, 'Category', 'Price', k)
+
+    def cheapest(self, k=1):
+        """Rows of the k cheapest books per category, ties going to the earlier row (like idxmin)."""
+        if k > TOP_K:
+            raise ValueError(f"Only the bottom {TOP_K} books per category are kept")
+        return _bottom_k(self.bottom_books, k)
+
+    def equals(self, other):
+        return (self.groups.equals(other.groups) and self.prices.equals(other.prices)
+                and self.top_books.equals(other.top_books) and self.bottom_books.equals(other.bottom_books))
+
+def _bottom_k(books, k):
+    order = top_k_per_group(books.assign(Price=-books['Price']), 'Category', 'Price', k).index
+    return books.loc[order]
+
+def _ends(books):
+    books = books[books['Category'].notna()]
+    return top_k_per_group(books, 'Category', 'Price', TOP_K), _bottom_k(books, TOP_K)
+
+def aggregate_frame(df):
+    return BookAggregates.from_frame(df)
+
+def aggregate_csv(filename="books.csv", chunksize=CHUNKSIZE):
+    """Aggregates the CSV `chunksize` rows at a time; memory is bounded by the chunk, not the file."""
+    merged = None
+    for chunk in pd.read_csv(filename, usecols=COLUMNS, chunksize=chunksize):
+        part = BookAggregates.from_frame(clean_books(chunk))
+        merged = part if merged is None else BookAggregates.merge([merged, part])
+    return merged if merged is not None else BookAggregates.merge([])
+
+# Row positions follow books.id, which is the CSV order after BookScraper.save_to_db or bulk_load
+_BOOKS = '''
+    SELECT ROW_NUMBER() OVER (ORDER BY b.id) - 1 AS row, c.name AS category, b.title, b.price
+    FROM books b LEFT JOIN categories c ON c.id = b.category_id
+'''
+
+def aggregate_db(dbname="books.db"):
+    """Aggregates the books table inside SQLite; only the grouped results reach Python."""
+    conn = books_schema.connect_read_only(dbname)
+    try:
+        groups = pd.read_sql_query(
+            "SELECT c.name AS Category, COALESCE(b.rating, 0) AS Rating, COUNT(*) AS books, "
+            "COUNT(b.price) AS priced, COALESCE(SUM(CAST(ROUND(b.price * 100) AS INTEGER)), 0) AS price_pence, "
+            "SUM(COALESCE(b.stock, 0)) AS stock "
+            "FROM books b LEFT JOIN categories c ON c.id = b.category_id GROUP BY b.category_id, 2", conn)
+        prices = pd.read_sql_query(
+            "SELECT CAST(ROUND(price * 100) AS INTEGER) AS pence, COUNT(*) AS n FROM books "
+            "WHERE price IS NOT NULL GROUP BY 1 ORDER BY 1", conn)
+        ends = [pd.read_sql_query(
+            f"SELECT row, category AS Category, title AS Title, price AS Price FROM ("
+            f"  SELECT *, ROW_NUMBER() OVER (PARTITION BY category ORDER BY price {direction}, row) AS k"
+            f"  FROM ({_BOOKS}) WHERE price IS NOT NULL AND category IS NOT NULL"
+            f") WHERE k <= ? ORDER BY row", conn, params=(TOP_K,), index_col='row')
+            for direction in ('DESC', 'ASC')]
+    finally:
+        conn.close()
+    groups = groups.astype({'Rating': np.int64}).set_index(['Category', 'Rating']).sort_index()
+    prices = pd.Series(prices['n'].to_numpy(), index=prices['pence'].to_numpy(), name='count')
+    top, bottom = (books.rename_axis(None).astype({'Category': object}) for books in ends)
+    return BookAggregates(groups, prices, top_k_per_group(top, 'Category', 'Price', TOP_K), _bottom_k(bottom, TOP_K))
@@ -0,0 +1,371 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from BookScraper import (BASE_URL, RETRIES, RETRY_BACKOFF, CsvSink, SqliteSink, extract_book_links, finish_metrics,
+                         is_retryable, load_from_db, save_to_csv)
+from crawl_metrics import PROGRESS_EVERY, CrawlMetrics, TimedSink
+from crawl_state import CrawlState
+from parse_pool import ParsePool
+from price_history import HistorySink
+
+class TokenBucket:
+    """Rate limiter allowing `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncCrawler:
+    """Concurrent crawler for books.toscrape.com.
+
+    Listing pages and book pages are fetched over a pooled keep-alive
+    requests.Session. At most `max_per_host` requests are in flight per host
+    and each host is rate limited by a token bucket (`rate` requests per
+    second, `None` to disable). Book links are queued as soon as their listing
+    page arrives, so discovery overlaps with fetching and parsing book pages.
+
+    Book pages are parsed with the `parser` backend (see parse_pool.PARSERS).
+    With `parse_workers` > 0 the raw page bytes are shipped to a process pool
+    of that size; with 0 they are parsed on the fetching threads.
+
+    With a CrawlState the crawl is incremental: requests are conditional,
+    unchanged book pages are skipped, and an interrupted run resumes from its
+    saved frontier.
+
+    Rate limiting, server errors and network failures are retried up to
+    `retries` times with exponential backoff. Latencies, bytes, responses
+    and errors are recorded in `metrics` (a crawl_metrics.CrawlMetrics).
+    """
+
+    def __init__(self, base_url=BASE_URL, max_per_host=8, rate=10.0, burst=None, timeout=30,
+                 parser='html.parser', parse_workers=0, state=None, retries=RETRIES, metrics=None):
+        self.base_url = base_url
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # requests is blocking, so each in-flight request occupies one thread
+        self.executor = ThreadPoolExecutor(max_workers=max_per_host)
+        self.parse_pool = ParsePool(workers=parse_workers, parser=parser)
+        self.state = state
+        self.retries = retries
+        self.metrics = metrics or CrawlMetrics()
+        self.unchanged = 0
+        self._host_limits = {}
+
+    def page_url(self, page_no):
+        return urljoin(self.base_url, f"page-{page_no}.html")
+
+    def _limits(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            bucket = TokenBucket(self.rate, self.burst) if self.rate else None
+            self._host_limits[host] = (asyncio.Semaphore(self.max_per_host), bucket)
+        return self._host_limits[host]
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _get(self, url, headers=None):
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+        return response
+
+    async def fetch(self, url, kind='book'):
+        """Fetches a page and returns the response, or None on error."""
+        semaphore, bucket = self._limits(url)
+        headers = self.state.conditional_headers(url) if self.state else None
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                if bucket:
+                    await bucket.acquire()
+                start = time.perf_counter()
+                try:
+                    response = await self._run(self._get, url, headers)
+                except requests.exceptions.RequestException as e:
+                    retrying = attempt < self.retries and is_retryable(e)
+                    self.metrics.record_error(e, retrying)
+                    if not retrying:
+                        print(f"Error fetching URL {url}: {e}")
+                        return None
+                else:
+                    self.metrics.record_response(kind, response, time.perf_counter() - start)
+                    return response
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)  # without holding the host's slot
+
+    def _content(self, url, response):
+        if self.state:
+            return self.state.content(url, response)
+        return response.content, response.encoding
+
+    async def _links_from(self, page_url, response):
+        content, encoding = self._content(page_url, response)
+        html = content.decode(encoding or 'utf-8', errors='replace')
+        with self.metrics.time('links'):
+            soup = await self._run(BeautifulSoup, html, "html.parser")
+            return extract_book_links(soup, self.base_url)
+
+    async def _book_from(self, book_url, response):
+        content, encoding = self._content(book_url, response)
+        with self.metrics.time('parse'):
+            if self.parse_pool.executor is None:
+                book_detail = await self._run(self.parse_pool.parse, content, book_url, encoding)
+            else:
+                book_detail = await self.parse_pool.parse_async(content, book_url, encoding)
+        self.metrics.record_book(book_detail)
+        return book_detail
+
+    async def get_book_links(self, page_url):
+        """Async counterpart of BookScraper.get_book_links."""
+        response = await self.fetch(page_url, kind='listing')
+        if response is None:
+            return []
+        return await self._links_from(page_url, response)
+
+    async def parse_book_page(self, book_url):
+        """Async counterpart of BookScraper.parse_book_page."""
+        response = await self.fetch(book_url)
+        if response is None:
+            return None
+        return await self._book_from(book_url, response)
+
+    async def crawl(self, limit_pages=5, on_record=None):
+        """Scrapes `limit_pages` listing pages and returns the book dictionaries in catalogue order.
+
+        `on_record` is called with each book as soon as it is parsed. In
+        incremental mode only new or changed books are returned, and each one
+        is marked done only after `on_record` has returned, so `on_record`
+        should persist it.
+        """
+        results = {}
+
+        def emit(key, book_detail):
+            results[key] = book_detail
+            if on_record:
+                on_record(book_detail)
+
+        await self._crawl(limit_pages, emit)
+        return [results[key] for key in sorted(results)]
+
+    async def iter_books(self, limit_pages=5):
+        """Scrapes `limit_pages` listing pages, yielding each book dictionary as soon as it is parsed.
+
+        Books arrive in completion order and nothing is retained once yielded,
+        so memory stays flat however many pages are crawled.
+        """
+        queue = asyncio.Queue()
+        done = object()
+        task = asyncio.create_task(self._crawl(limit_pages, lambda key, book_detail: queue.put_nowait(book_detail)))
+        task.add_done_callback(lambda _: queue.put_nowait(done))
+        try:
+            while True:
+                book_detail = await queue.get()
+                if book_detail is done:
+                    break
+                yield book_detail
+            await task  # re-raise any crawl error
+        finally:
+            task.cancel()
+
+    async def _crawl(self, limit_pages, emit):
+        state = self.state
+        queue = asyncio.Queue()
+        if state:
+            if state.start_run(limit_pages):
+                print(f"Resuming crawl run {state.run_id}...")
+            for page_no, position, book_url in state.pending_books():
+                queue.put_nowait(((page_no, position), book_url))
+
+        async def discover(page_no):
+            page_url = self.page_url(page_no)
+            if state and state.is_done(page_url):
+                return
+            response = await self.fetch(page_url, kind='listing')
+            if response is None:
+                return
+            book_links = await self._links_from(page_url, response)
+            if state:
+                state.add_listing(page_url, page_no, book_links, response)
+            for position, book_url in enumerate(book_links):
+                await queue.put(((page_no, position), book_url))
+
+        async def process(key, book_url):
+            response = await self.fetch(book_url)
+            if response is None:
+                return  # never cached, so the next run fetches it again
+            if state and not state.is_changed(book_url, response):
+                self.unchanged += 1
+                state.mark_done(book_url, response)
+                return
+            book_detail = await self._book_from(book_url, response)
+            if book_detail:
+                emit(key, book_detail)
+            if state:
+                # Parse failures are not cached, so the next run fetches them again
+                state.mark_done(book_url, response if book_detail else None)
+
+        async def worker():
+            while True:
+                key, book_url = await queue.get()
+                try:
+                    await process(key, book_url)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_per_host)]
+        try:
+            await asyncio.gather(*(discover(i) for i in range(1, limit_pages + 1)))
+            await queue.join()
+            if state:
+                state.finish_run()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def close(self):
+        self.session.close()
+        self.executor.shutdown(wait=False)
+        self.parse_pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def scrap_all_books_async(limit_pages=5, report=None, **options):
+    """Drop-in replacement for BookScraper.scrap_all_books using the concurrent crawler.
+
+    Keyword options are passed to AsyncCrawler (base_url, max_per_host, rate, burst, timeout,
+    parser, parse_workers, retries, metrics).
+    """
+    print(f"Scraping {limit_pages} pages in progress...")
+    metrics = options.pop('metrics', None) or CrawlMetrics(PROGRESS_EVERY)
+    with AsyncCrawler(metrics=metrics, **options) as crawler:
+        books = asyncio.run(crawler.crawl(limit_pages))
+    print("Scraping complete.")
+    finish_metrics(metrics, report)
+    return books
+
+async def run_pipeline_async(books, *sinks, metrics=None):
+    """Async counterpart of BookScraper.run_pipeline for an async iterator of books."""
+    if metrics is not None:
+        sinks = [TimedSink(sink, metrics) for sink in sinks]
+    count = 0
+    try:
+        async for book in books:
+            for sink in sinks:
+                sink.write(book)
+            count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
+
+def stream_all_books_async(limit_pages=5, csv_filename="books.csv", dbname="books.db", batch_size=500,
+                           report=None, **options):
+    """Crawls concurrently, appending each book to the CSV file and committing to the database in batches.
+
+    The crawl is also recorded in the price history (see price_history.py).
+    Progress is printed periodically; with `report` the run's telemetry is
+    written there (see BookScraper.finish_metrics).
+    """
+    print(f"Scraping {limit_pages} pages in progress...")
+    metrics = options.pop('metrics', None) or CrawlMetrics(PROGRESS_EVERY)
+    with AsyncCrawler(metrics=metrics, **options) as crawler:
+        sinks = (CsvSink(csv_filename), SqliteSink(dbname, batch_size=batch_size),
+                 HistorySink(dbname, batch_size=batch_size))
+        count = asyncio.run(run_pipeline_async(crawler.iter_books(limit_pages), *sinks, metrics=metrics))
+    print(f"Scraping complete. {count} books saved to {csv_filename} and {dbname}")
+    finish_metrics(metrics, report)
+    return count
+
+def crawl_incremental(limit_pages=5, dbname="books.db", state_db="crawl_state.db", report=None, **options):
+    """Incrementally refreshes `dbname`, upserting only new or changed books.
+
+    Rerunning after an interruption resumes the unfinished run. Returns the
+    books that were upserted. They are also recorded as one crawl in the
+    price history; unchanged pages are skipped and so add nothing to it.
+    """
+    print(f"Incremental scrape of {limit_pages} pages in progress...")
+    metrics = options.pop('metrics', None) or CrawlMetrics(PROGRESS_EVERY)
+    state = CrawlState(state_db)
+    # One connection for the whole run. Each book is committed as it arrives, because the
+    # crawl state marks its page done right after; a batched book lost to a crash would
+    # then count as unchanged and never be written.
+    db = TimedSink(SqliteSink(dbname, batch_size=1, upsert=True), metrics)
+    history = TimedSink(HistorySink(dbname), metrics)
+
+    def on_record(book):
+        db.write(book)
+        history.write(book)
+    try:
+        with AsyncCrawler(state=state, metrics=metrics, **options) as crawler:
+            books = asyncio.run(crawler.crawl(limit_pages, on_record=on_record))
+            print(f"Scraping complete: {len(books)} new or changed, {crawler.unchanged} unchanged.")
+    finally:
+        db.close()
+        history.close()
+        state.close()
+    finish_metrics(metrics, report)
+    return books
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape books.toscrape.com concurrently.")
+    parser.add_argument("--pages", type=int, default=5, help="number of listing pages to crawl")
+    parser.add_argument("--base-url", default=BASE_URL, help="catalogue root, e.g. a local fixture server")
+    parser.add_argument("--max-per-host", type=int, default=8, help="maximum in-flight requests per host")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second per host (0 to disable)")
+    parser.add_argument("--parser", default="html.parser", help="book page parser backend: html.parser, lxml or selectors")
+    parser.add_argument("--parse-workers", type=int, default=0, help="parser processes (0 parses on the fetch threads)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="use the HTTP cache and crawl frontier, upserting only changed books into books.db")
+    parser.add_argument("--state", default="crawl_state.db", help="crawl frontier and HTTP cache file")
+    parser.add_argument("--batch-size", type=int, default=500, help="books per SQLite commit")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="retries of rate-limited or failed requests")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write the crawl telemetry here (.prom/.txt: Prometheus text, otherwise JSON)")
+    args = parser.parse_args()
+
+    options = dict(
+        base_url=args.base_url,
+        max_per_host=args.max_per_host,
+        rate=args.rate,
+        parser=args.parser,
+        parse_workers=args.parse_workers,
+        retries=args.retries,
+        report=args.metrics,
+    )
+    if args.incremental:
+        if crawl_incremental(limit_pages=args.pages, state_db=args.state, **options):
+            save_to_csv(load_from_db())
+    else:
+        stream_all_books_async(limit_pages=args.pages, batch_size=args.batch_size, **options)
@@ -0,0 +1,81 @@
+import argparse
+import re
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from vectorized import most_common_word, threshold_counts, top_k_per_group
+
+WORDS = ['the', 'of', 'a', 'and', 'night', 'garden', 'python', 'mystery', 'river', 'love', 'war', 'house',
+         'city', 'girl', 'secret', 'life', 'world', 'guide', 'history', 'été', "don't", 'vol.', '(1)']
+THRESHOLDS = [10, 20, 30, 40, 50, 60]
+
+def synthetic_books(rows, categories=50, seed=0):
+    """A books DataFrame shaped like data_loader.load_books output, with repeated prices to exercise ties."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(WORDS + [f"word{i}" for i in range(2000)], dtype=object)
+    title_lengths = rng.integers(1, 9, rows)
+    tokens = rng.choice(vocabulary, title_lengths.sum())
+    bounds = np.concatenate([[0], np.cumsum(title_lengths)])
+    titles = [' '.join(tokens[bounds[i]:bounds[i + 1]]).title() for i in range(rows)]
+    return pd.DataFrame({
+        'Title': titles,
+        'Price': rng.integers(1000, 6000, rows) / 100,
+        'Availability': rng.integers(0, 23, rows).astype('int32'),
+        'Rating': rng.integers(1, 6, rows).astype('int8'),
+        'Category': pd.Categorical(rng.integers(0, categories, rows).astype(str)),
+    })
+
+# Reference implementations, as previously written in pandas_queries.py and matplotlib_plots.py
+
+def top3_reference(df):
+    return df.groupby('Category').apply(lambda x: x.nlargest(3, 'Price'))[['Title', 'Price']].droplevel(0)
+
+def threshold_reference(df):
+    return [len(df[df['Price'] > t]) for t in THRESHOLDS]
+
+def most_common_word_reference(df):
+    words = re.findall(r'\b\w+\b', ' '.join(df['Title'].values).lower())
+    return Counter(words).most_common(1)[0]
+
+CASES = [
+    ('top3_per_category', top3_reference,
+     lambda df: top_k_per_group(df, 'Category', 'Price', 3)[['Title', 'Price']],
+     lambda a, b: a.equals(b)),
+    ('price_thresholds', threshold_reference,
+     lambda df: threshold_counts(df['Price'], THRESHOLDS),
+     lambda a, b: list(a) == list(b)),
+    ('most_common_title_word', most_common_word_reference,
+     lambda df: most_common_word(df['Title']),
+     lambda a, b: tuple(a) == tuple(b)),
+]
+
+def timed(func, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the vectorized analytics against the originals.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="best of N timings")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'case':<24} {'original':>10} {'vectorized':>11} {'speedup':>8}  same result")
+    failures = 0
+    for rows in args.rows:
+        df = synthetic_books(rows)
+        for name, reference, vectorized, same in CASES:
+            expected, reference_time = timed(reference, df, args.repeat)
+            result, vectorized_time = timed(vectorized, df, args.repeat)
+            ok = same(expected, result)
+            failures += not ok
+            print(f"{rows:>9} {name:<24} {reference_time * 1000:>8.1f}ms {vectorized_time * 1000:>9.1f}ms "
+                  f"{reference_time / vectorized_time:>7.1f}x  {ok}")
+    if failures:
+        raise SystemExit(f"{failures} vectorized result(s) differ from the original implementation")
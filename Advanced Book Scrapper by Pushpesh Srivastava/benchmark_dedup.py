@@ -0,0 +1,101 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from near_duplicates import MORE, THRESHOLD, MinHasher, clean_description, flag_near_duplicates
+
+# Usage:
+#   python benchmark_dedup.py                      100k and 200k descriptions
+#   python benchmark_dedup.py --rows 20000 --duplicates 0.1 --edits 0.05
+
+def synthetic_descriptions(rows, duplicates=0.05, edits=0.02, teasers=0.5, words=120, seed=0):
+    """Descriptions with planted near-duplicates, shaped like the scraped ones.
+
+    Returns (DataFrame with a Description column, {copy row: original row}).
+    A `duplicates` share of rows copy an earlier row with an `edits` share of
+    their words replaced, and a `teasers` share of all rows carry the scraped
+    teaser + full text + '...more' repetition.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(20_000)], dtype=object)
+    lengths = rng.integers(words // 2, words * 3 // 2, rows)
+    tokens = [rng.choice(vocabulary, length) for length in lengths]
+    copies = np.flatnonzero(rng.random(rows) < duplicates)
+    copies = copies[copies > 0]
+    planted = {}
+    for row in copies:
+        original = int(rng.integers(0, row))
+        while original in planted:
+            original = planted[original]
+        text = tokens[original].copy()
+        changed = rng.random(len(text)) < edits
+        text[changed] = rng.choice(vocabulary, changed.sum())
+        tokens[row] = text
+        planted[int(row)] = original
+    texts = []
+    for text, teaser in zip(tokens, rng.random(rows) < teasers):
+        full = ' '.join(text)
+        if teaser:
+            cut = full[:int(len(full) * 0.6)]
+            full = f"{cut} {full}{MORE}"
+        texts.append(full)
+    return pd.DataFrame({'Description': texts}), planted
+
+def exact_jaccard(a, b, shingle_words):
+    a, b = a.split(), b.split()
+    a = {tuple(a[i:i + shingle_words]) for i in range(len(a) - shingle_words + 1)}
+    b = {tuple(b[i:i + shingle_words]) for i in range(len(b) - shingle_words + 1)}
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def brute_force_estimate(texts, shingle_words, samples=2000, seed=0):
+    """Seconds an all-pairs exact Jaccard comparison would take, from timing a sample of pairs."""
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, len(texts), (samples, 2))
+    start = time.perf_counter()
+    for i, j in pairs:
+        exact_jaccard(texts[i], texts[j], shingle_words)
+    per_pair = (time.perf_counter() - start) / samples
+    return per_pair * len(texts) * (len(texts) - 1) / 2
+
+def score(duplicate_of, planted, texts, threshold, shingle_words):
+    """(pairs that should be found, precision, recall).
+
+    A flagged row is right when it and its reported original copy the same
+    row. Recall counts the planted copies whose exact Jaccard similarity to
+    their original reaches the threshold; edits push some copies below it.
+    """
+    family = {**planted, **{original: original for original in planted.values()}}
+    flagged = duplicate_of.dropna()
+    right = sum(family.get(row, row) == family.get(original, original) for row, original in flagged.items())
+    expected = [row for row, original in planted.items()
+                if exact_jaccard(texts[row], texts[original], shingle_words) >= threshold]
+    found = sum(pd.notna(duplicate_of.iat[row]) for row in expected)
+    precision = right / len(flagged) if len(flagged) else 1.0
+    recall = found / len(expected) if expected else 1.0
+    return len(expected), precision, recall
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and check MinHash LSH near-duplicate detection.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 200_000])
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of rows that copy an earlier row")
+    parser.add_argument("--edits", type=float, default=0.02, help="share of words changed in each copy")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'planted':>8} {'similar':>8} {'clean':>8} {'lsh':>9} {'precision':>10} {'recall':>7} "
+          f"{'all pairs (est.)':>17}")
+    for rows in args.rows:
+        df, planted = synthetic_descriptions(rows, args.duplicates, args.edits)
+        start = time.perf_counter()
+        df['Description'] = df['Description'].map(clean_description)
+        clean_time = time.perf_counter() - start
+        start = time.perf_counter()
+        duplicate_of = flag_near_duplicates(df, threshold=args.threshold)
+        lsh_time = time.perf_counter() - start
+        texts, shingle_words = df['Description'].to_list(), MinHasher().shingle_words
+        expected, precision, recall = score(duplicate_of, planted, texts, args.threshold, shingle_words)
+        brute = brute_force_estimate(texts, shingle_words)
+        print(f"{rows:>9} {len(planted):>8} {expected:>8} {clean_time:>7.2f}s {lsh_time:>8.2f}s {precision:>10.3f} "
+              f"{recall:>7.3f} {brute / 3600:>15.1f}h")
@@ -0,0 +1,219 @@
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+REPORT_VERSION = 1
+
+class Benchmark:
+    """A registered case: `setup` takes the suite's shared data and returns (run, items).
+
+    `run` is the zero-argument callable that is timed and `items` the number
+    of units (pages, rows, ...) it processes per call.
+    """
+
+    def __init__(self, name, setup, unit, description):
+        self.name = name
+        self.setup = setup
+        self.unit = unit
+        self.description = description
+
+def select(benchmarks, names=None):
+    if not names:
+        return list(benchmarks.values())
+    unknown = [name for name in names if name not in benchmarks]
+    if unknown:
+        raise KeyError(f"Unknown benchmark(s) {', '.join(unknown)}, use --list to see them")
+    return [benchmarks[name] for name in names]
+
+def _quiet(run):
+    # The analytics scripts print their answers; keep them out of the report
+    with redirect_stdout(io.StringIO()):
+        return run()
+
+def time_runs(run, repeat, warmup=1):
+    for _ in range(warmup):
+        _quiet(run)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _quiet(run)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def peak_memory(run):
+    """Peak bytes allocated by Python objects during one call, as seen by tracemalloc."""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        _quiet(run)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+def profile(run, top=15, dump_path=None):
+    """Runs once under cProfile; returns the `top` functions by cumulative time."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        _quiet(run)
+    finally:
+        profiler.disable()
+    if dump_path:
+        profiler.dump_stats(dump_path)
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        if filename == __file__ or function in ('<lambda>', '<listcomp>'):
+            continue  # the harness and the case's own wrapper
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({function})", 'calls': calls,
+                     'tottime': round(tottime, 6), 'cumtime': round(cumtime, 6)})
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:top]
+
+def run_benchmark(bench, data, repeat=3, memory=False, profile_top=0, profile_dir=None):
+    run, items = bench.setup(data)
+    seconds = time_runs(run, repeat)
+    best = min(seconds)
+    result = {
+        'unit': bench.unit,
+        'items': items,
+        'repeat': repeat,
+        'seconds': [round(s, 6) for s in seconds],
+        'best': round(best, 6),
+        'mean': round(sum(seconds) / len(seconds), 6),
+        'per_second': round(items / best, 3) if best > 0 else None,
+    }
+    if memory:
+        result['peak_bytes'] = peak_memory(run)
+    if profile_top or profile_dir:
+        dump_path = os.path.join(profile_dir, f"{bench.name}.prof") if profile_dir else None
+        result['profile'] = profile(run, profile_top or 15, dump_path)
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=10, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+def make_report(suite, params, results):
+    """The JSON report: the suite, its parameters and environment, and one entry per benchmark."""
+    return {'version': REPORT_VERSION, 'suite': suite, 'params': params, 'environment': environment(),
+            'results': results}
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def load_report(path):
+    with open(path) as f:
+        report = json.load(f)
+    if not isinstance(report, dict):
+        raise ValueError(f"{path} is not a benchmark report")
+    if report.get('version') != REPORT_VERSION:
+        raise ValueError(f"{path} is a version {report.get('version')} report, expected {REPORT_VERSION}")
+    return report
+
+def compare(report, baseline):
+    """Best-time ratio (current / baseline) per benchmark run with the same items in both reports."""
+    ratios = {}
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before and before['items'] == result['items'] and before['best'] > 0:
+            ratios[name] = result['best'] / before['best']
+    return ratios
+
+def print_results(report, ratios=None):
+    ratios = ratios or {}
+    print(f"{'benchmark':<28} {'items':>9} {'best':>10} {'mean':>10} {'rate':>16} {'peak mem':>10} {'vs base':>8}")
+    for name, result in report['results'].items():
+        rate = f"{result['per_second']:.0f} {result['unit']}/s" if result['per_second'] else '-'
+        peak = f"{result['peak_bytes'] / 2 ** 20:.1f}MB" if 'peak_bytes' in result else '-'
+        ratio = f"{ratios[name]:.2f}x" if name in ratios else '-'
+        print(f"{name:<28} {result['items']:>9} {result['best'] * 1000:>8.1f}ms {result['mean'] * 1000:>8.1f}ms "
+              f"{rate:>16} {peak:>10} {ratio:>8}")
+        for row in result.get('profile', [])[:5]:
+            print(f"    {row['cumtime'] * 1000:>9.1f}ms cum {row['calls']:>8} calls  {row['function']}")
+
+def add_arguments(parser):
+    parser.add_argument("benchmarks", nargs="*", help="benchmark names (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (the best is reported)")
+    parser.add_argument("--memory", action="store_true", help="also record peak allocations with tracemalloc")
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help="also profile one run with cProfile and keep the top N functions")
+    parser.add_argument("--profile-dir", help="write a .prof file per benchmark here (for snakeviz, pstats)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier JSON report to compare best times against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit with an error if any benchmark is this much slower than --compare, e.g. 0.2")
+
+def parse_args(parser, benchmarks, argv=None):
+    """Parses the command line, checking the benchmark names and loading the --compare baseline first.
+
+    Problems are reported through parser.error before any data is prepared or benchmark run.
+    """
+    args = parser.parse_args(argv)
+    if not args.list:
+        try:
+            select(benchmarks, args.benchmarks)
+        except KeyError as e:
+            parser.error(e.args[0])
+    args.baseline = None
+    if args.compare:
+        try:
+            args.baseline = load_report(args.compare)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot use --compare {args.compare}: {e}")
+    return args
+
+def main(suite, benchmarks, args, data, params):
+    """Runs the selected benchmarks on `data` and reports them as the command line arguments ask."""
+    if args.list:
+        for bench in benchmarks.values():
+            print(f"{bench.name:<28} {bench.description}")
+        return 0
+    selected = select(benchmarks, args.benchmarks)
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+    results = {}
+    for bench in selected:
+        print(f"Running {bench.name}...", file=sys.stderr)
+        results[bench.name] = run_benchmark(bench, data, args.repeat, args.memory, args.profile, args.profile_dir)
+    report = make_report(suite, params, results)
+    ratios = compare(report, args.baseline) if args.baseline else {}
+    print_results(report, ratios)
+    if args.output:
+        write_report(report, args.output)
+        print(f"Report written to {args.output}")
+    if args.max_regression is not None:
+        slower = {name: ratio for name, ratio in ratios.items() if ratio > 1 + args.max_regression}
+        for name, ratio in slower.items():
+            print(f"Regression: {name} is {ratio:.2f}x the baseline time", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
@@ -0,0 +1,103 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from aggregates import aggregate_csv, aggregate_db, aggregate_frame
+from books_schema import RATING_WORDS, bulk_load
+from data_loader import load_books
+from fixture_server import CATEGORIES
+
+# Usage:
+#   python benchmark_out_of_core.py                        1M generated books
+#   python benchmark_out_of_core.py --rows 20000000 --chunksize 1000000 --skip-memory
+#
+# Writes a CSV of generated books in the scraper's text format, loads it into
+# a SQLite database, then aggregates it three ways: in memory (load_books +
+# aggregate_frame), over read_csv chunks, and inside SQLite. Reports the time
+# and peak traced allocations of each and checks that they agree exactly.
+
+WRITE_CHUNK = 200_000
+
+def write_books_csv(path, rows, seed=0):
+    """Writes `rows` generated books, WRITE_CHUNK at a time, with repeated prices and a few missing ones."""
+    rng = np.random.default_rng(seed)
+    categories = np.array(CATEGORIES, dtype=object)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write('Title,Price,Availability,Rating,Description,Category,URL\n')
+        for start in range(0, rows, WRITE_CHUNK):
+            n = min(WRITE_CHUNK, rows - start)
+            ids = np.arange(start, start + n)
+            pence = rng.integers(1000, 6000, n)
+            stock = rng.integers(0, 23, n)
+            chunk = pd.DataFrame({
+                'Title': [f"Book {i}" for i in ids],
+                'Price': np.where(rng.random(n) < 0.001, '', [f"£{p // 100}.{p % 100:02d}" for p in pence]),
+                'Availability': np.where(stock > 0, [f"In stock ({s} available)" for s in stock], 'Out of stock'),
+                'Rating': np.array(RATING_WORDS, dtype=object)[rng.integers(1, 6, n)],
+                'Description': 'A generated book.',
+                'Category': categories[rng.integers(0, len(categories), n)],
+                'URL': [f"https://books.toscrape.com/catalogue/book_{i}/index.html" for i in ids],
+            })
+            chunk.to_csv(f, header=False, index=False)
+
+def load_db(csv_path, dbname):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return bulk_load(csv.DictReader(f), dbname=dbname)
+
+def measure(func, memory=True):
+    """(result, seconds, peak traced bytes or None)."""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare in-memory, chunked and SQLite aggregation of books.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=250_000)
+    parser.add_argument("--skip-memory", action="store_true",
+                        help="do not trace allocations (tracemalloc slows pandas down)")
+    parser.add_argument("--skip-in-memory", action="store_true", help="only run the bounded-memory modes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, dbname = os.path.join(tmp, 'books.csv'), os.path.join(tmp, 'books.db')
+        start = time.perf_counter()
+        write_books_csv(csv_path, args.rows)
+        print(f"Wrote {args.rows} books ({os.path.getsize(csv_path) / 2 ** 20:.0f} MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        load_db(csv_path, dbname)
+        print(f"Loaded books.db in {time.perf_counter() - start:.1f}s\n")
+
+        modes = [
+            ('chunked csv', lambda: aggregate_csv(csv_path, args.chunksize)),
+            ('sqlite', lambda: aggregate_db(dbname)),
+        ]
+        if not args.skip_in_memory:
+            modes.insert(0, ('in memory', lambda: aggregate_frame(load_books(csv_path, use_cache=False))))
+        print(f"{'mode':<12} {'seconds':>9} {'peak alloc':>11}  same as first")
+        first = None
+        mismatches = 0
+        for name, func in modes:
+            result, seconds, peak = measure(func, not args.skip_memory)
+            first = first or result
+            same = result.equals(first)
+            mismatches += not same
+            peak_text = f"{peak / 2 ** 20:.0f} MB" if peak is not None else '-'
+            print(f"{name:<12} {seconds:>8.1f}s {peak_text:>11}  {same}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} mode(s) disagree with the first")
@@ -0,0 +1,42 @@
+import argparse
+import csv
+import os
+import time
+
+from fixture_server import encode_page, render_book_page
+from parse_pool import PARSERS, ParsePool
+
+def load_pages(filename="books.csv", count=1000):
+    """Renders `count` book pages (cycling through the CSV records) as raw bytes."""
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        books = list(csv.DictReader(csvfile))
+    pages = []
+    for i in range(count):
+        book = books[i % len(books)]
+        pages.append((encode_page(render_book_page(book)), book['URL'], 'ISO-8859-1'))
+    return pages
+
+def run(pages, parser, workers):
+    with ParsePool(workers=workers, parser=parser) as pool:
+        start = time.perf_counter()
+        records = list(pool.map(pages))
+        elapsed = time.perf_counter() - start
+    return records, elapsed
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compare book page parsing throughput.")
+    arg_parser.add_argument("--pages", type=int, default=2000)
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    arg_parser.add_argument("--parsers", nargs="+", default=list(PARSERS))
+    args = arg_parser.parse_args()
+
+    pages = load_pages(count=args.pages)
+    baseline, baseline_time = run(pages, 'html.parser', 0)
+    print(f"{'parser':<12} {'workers':>7} {'pages/sec':>10} {'speedup':>8}  same output")
+    print(f"{'html.parser':<12} {0:>7} {len(pages) / baseline_time:>10.0f} {1:>8.2f}  baseline")
+    for parser in args.parsers:
+        for workers in (0, args.workers):
+            if parser == 'html.parser' and workers == 0:
+                continue
+            records, elapsed = run(pages, parser, workers)
+            print(f"{parser:<12} {workers:>7} {len(pages) / elapsed:>10.0f} {baseline_time / elapsed:>8.2f}  {records == baseline}")
@@ -0,0 +1,135 @@
+import argparse
+import os
+import sys
+import tempfile
+from functools import cached_property
+
+import pandas as pd
+
+import benchmark_harness
+import pandas_queries  # noqa: F401  (registers the queries with query_engine)
+from async_crawler import scrap_all_books_async
+from BookScraper import parse_book_page
+from benchmark_harness import Benchmark
+from books_schema import bulk_load
+from crawl_metrics import CrawlMetrics
+from data_loader import clean_books
+from fixture_server import BOOKS_PER_PAGE, FixtureServer, FixtureSite, encode_page, render_book_page, synthetic_books
+from matplotlib_plots import render_plots, select as select_plots
+from near_duplicates import flag_near_duplicates
+from parse_pool import PARSERS, parse_book_html
+from query_engine import run_queries
+
+# Usage:
+#   python benchmark_suite.py --books 5000 --output before.json
+#   python benchmark_suite.py --books 5000 --compare before.json --max-regression 0.2
+#   python benchmark_suite.py parse_selectors pandas_queries --memory --profile 10
+#
+# Every case runs on generated books (see fixture_server.synthetic_books), and
+# network cases fetch from a local FixtureServer, so runs with the same
+# arguments measure the same work and their JSON reports can be compared.
+
+BENCHMARKS = {}
+
+def benchmark(name, unit='items', description=''):
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, unit, description)
+        return setup
+    return register
+
+class SuiteData:
+    """Synthetic inputs shared by the cases, each built on first use."""
+
+    def __init__(self, books=1000, seed=0, fetch_books=200, crawl_pages=10):
+        self.books = books
+        self.seed = seed
+        self.fetch_books = fetch_books
+        self.crawl_pages = crawl_pages
+        self.tmp = tempfile.TemporaryDirectory()
+        self._server = None
+
+    @cached_property
+    def records(self):
+        return synthetic_books(self.books, self.seed)
+
+    @cached_property
+    def pages(self):
+        # (raw page bytes, book URL, encoding) as the crawler hands them to the parsers
+        return [(encode_page(render_book_page(book)), book['URL'], 'ISO-8859-1') for book in self.records]
+
+    @cached_property
+    def df(self):
+        return clean_books(pd.DataFrame(self.records))
+
+    @property
+    def server(self):
+        if self._server is None:
+            self._server = FixtureServer(FixtureSite(self.records)).start()
+        return self._server
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def close(self):
+        if self._server is not None:
+            self._server.stop()
+        self.tmp.cleanup()
+
+def _parse_case(parser):
+    def setup(data):
+        pages = data.pages
+        return lambda: [parse_book_html(*page, parser=parser) for page in pages], len(pages)
+    return setup
+
+for _parser in PARSERS:
+    benchmark(f'parse_{_parser}', 'pages', f"parse rendered book pages in-process with {_parser}")(_parse_case(_parser))
+
+@benchmark('parse_book_page', 'pages', "BookScraper.parse_book_page: fetch from the fixture server and parse")
+def fetch_and_parse(data):
+    base_url = data.server.base_url
+    urls = [base_url + book['URL'].split('/catalogue/', 1)[1] for book in data.records[:data.fetch_books]]
+    return lambda: [parse_book_page(url) for url in urls], len(urls)
+
+@benchmark('crawl_async', 'books', "AsyncCrawler over the fixture server, unthrottled")
+def crawl(data):
+    pages = min(data.crawl_pages, -(-data.books // BOOKS_PER_PAGE))
+    base_url = data.server.base_url
+    items = min(data.books, pages * BOOKS_PER_PAGE)
+    return lambda: scrap_all_books_async(limit_pages=pages, base_url=base_url, rate=None, metrics=CrawlMetrics()), items
+
+@benchmark('bulk_load', 'books', "books_schema.bulk_load into a fresh SQLite file")
+def load_db(data):
+    records, dbname = data.records, data.path('books.db')
+    return lambda: bulk_load(records, dbname=dbname), len(records)
+
+@benchmark('pandas_queries', 'rows', "every query in pandas_queries.py")
+def queries(data):
+    df = data.df
+    return lambda: run_queries(df), len(df)
+
+@benchmark('near_duplicates', 'rows', "MinHash LSH near-duplicate descriptions (see benchmark_dedup.py at scale)")
+def near_duplicates(data):
+    df = data.df
+    return lambda: flag_near_duplicates(df), len(df)
+
+@benchmark('matplotlib_plots', 'plots', "render every plot of matplotlib_plots.py in-process")
+def plots(data):
+    df, out_dir = data.df, data.path('plots')
+    return lambda: render_plots(df, out_dir=out_dir, workers=0, force=True), len(select_plots())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the scraper and analytics hot paths on synthetic books.")
+    benchmark_harness.add_arguments(parser)
+    parser.add_argument("--books", type=int, default=1000, help="synthetic books to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fetch-books", type=int, default=200, help="books fetched one by one in parse_book_page")
+    parser.add_argument("--crawl-pages", type=int, default=10, help="listing pages crawled in crawl_async")
+    args = benchmark_harness.parse_args(parser, BENCHMARKS)
+
+    data = SuiteData(args.books, args.seed, args.fetch_books, args.crawl_pages)
+    params = {'books': args.books, 'seed': args.seed, 'fetch_books': args.fetch_books, 'crawl_pages': args.crawl_pages}
+    try:
+        status = benchmark_harness.main('scraper', BENCHMARKS, args, data, params)
+    finally:
+        data.close()
+    sys.exit(status)
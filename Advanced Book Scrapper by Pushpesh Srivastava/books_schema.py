@@ -0,0 +1,302 @@
+import re
+import sqlite3
+from pathlib import Path
+
+SCHEMA_VERSION = 3
+
+RATING_WORDS = ['Zero', 'One', 'Two', 'Three', 'Four', 'Five']
+RATINGS = {word: number for number, word in enumerate(RATING_WORDS)}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    price REAL,
+    stock INTEGER,
+    rating INTEGER,
+    description TEXT,
+    category_id INTEGER REFERENCES categories (id)
+);
+CREATE INDEX IF NOT EXISTS idx_books_category ON books (category_id);
+CREATE INDEX IF NOT EXISTS idx_books_rating ON books (rating);
+CREATE INDEX IF NOT EXISTS idx_books_price ON books (price);
+CREATE VIEW IF NOT EXISTS books_view AS
+    SELECT b.id, b.title, b.price, b.stock, b.rating, b.description, c.name AS category, b.url
+    FROM books b LEFT JOIN categories c ON c.id = b.category_id;
+'''
+
+# Version 2: full-text index over title and description, kept in sync by triggers.
+# Statements are listed separately because the trigger bodies contain semicolons.
+SEARCH_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5 (
+        title, description,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts (books_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, description ON books BEGIN
+        INSERT INTO books_fts (books_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+    END''',
+]
+
+# Version 3: price/stock/rating history across crawls (see price_history.py). history_books
+# gives each URL a stable id (books.id changes when the table is reloaded) and holds its
+# latest values; history holds one row per book and crawl in which something changed, with
+# NULL for the values that did not. Prices are stored as integer cents, -1 when unknown.
+HISTORY_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS crawls (
+        id INTEGER PRIMARY KEY,
+        crawled_at REAL NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS history_books (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        price_cents INTEGER,
+        stock INTEGER,
+        rating INTEGER,
+        last_crawl INTEGER
+    )''',
+    '''CREATE TABLE IF NOT EXISTS history (
+        book_id INTEGER NOT NULL,
+        crawl_id INTEGER NOT NULL,
+        price_cents INTEGER,
+        stock INTEGER,
+        rating INTEGER,
+        PRIMARY KEY (book_id, crawl_id)
+    ) WITHOUT ROWID''',
+]
+
+BOOK_FIELDS = ('url', 'title', 'price', 'stock', 'rating', 'description', 'category_id')
+
+INSERT_BOOK = f'''
+    INSERT INTO books ({", ".join(BOOK_FIELDS)})
+    VALUES ({", ".join("?" * len(BOOK_FIELDS))})
+'''
+
+# Rows whose values are all unchanged are left untouched
+UPSERT_BOOK = INSERT_BOOK + '''    ON CONFLICT(url) DO UPDATE SET {updates} WHERE {changed}
+'''.format(
+    updates=', '.join(f"{col}=excluded.{col}" for col in BOOK_FIELDS[1:]),
+    changed=' OR '.join(f"books.{col} IS NOT excluded.{col}" for col in BOOK_FIELDS[1:]),
+)
+
+def parse_price(text):
+    """'£51.77' (or the mis-decoded 'Â£51.77') -> 51.77"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = re.search(r'\d+(?:\.\d+)?', text)
+    return float(match.group()) if match else None
+
+def parse_stock(text):
+    """'In stock (22 available)' -> 22, 'Out of stock' -> 0"""
+    if isinstance(text, int):
+        return text
+    match = re.search(r'\d+', text or '')
+    return int(match.group()) if match else 0
+
+def parse_rating(text):
+    """'Three' -> 3, anything unknown (e.g. 'No Rating') -> 0"""
+    if isinstance(text, int):
+        return text
+    return RATINGS.get(text, 0)
+
+def format_price(price):
+    return f"£{price:.2f}" if price is not None else ""
+
+def format_stock(stock):
+    return f"In stock ({stock} available)" if stock else "Out of stock"
+
+def format_rating(rating):
+    return RATING_WORDS[rating] if rating else "No Rating"
+
+def connect(dbname="books.db"):
+    """Opens the books database with bulk-friendly pragmas, creating or migrating the schema."""
+    conn = sqlite3.connect(dbname)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    conn.execute("PRAGMA foreign_keys=ON")
+    ensure_schema(conn)
+    return conn
+
+def connect_read_only(dbname="books.db"):
+    """Opens an existing, migrated books database for reading only.
+
+    Never creates, migrates or changes the journal mode of the file; raises
+    sqlite3.OperationalError if it is missing or at an older schema version.
+    """
+    conn = sqlite3.connect(Path(dbname).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.DatabaseError:
+        conn.close()
+        raise sqlite3.OperationalError(f"{dbname} is not a SQLite database") from None
+    if version < SCHEMA_VERSION:
+        conn.close()
+        raise sqlite3.OperationalError(f"{dbname} is at schema version {version}, not {SCHEMA_VERSION}; "
+                                       f"migrate it with: python books_schema.py --db {dbname}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    return conn
+
+def ensure_schema(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(books)")]
+    with conn:
+        # Explicit BEGIN so the DDL below is part of the transaction too
+        conn.execute("BEGIN")
+        if version < 1:
+            if columns and 'stock' not in columns:
+                migrate_legacy_books(conn)
+            else:
+                create_schema(conn)
+        if version < 2:
+            for statement in SEARCH_SCHEMA:
+                conn.execute(statement)
+            # Index the rows that existed before the triggers
+            conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+        if version < 3:
+            for statement in HISTORY_SCHEMA:
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+def create_schema(conn):
+    for statement in SCHEMA.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+def migrate_legacy_books(conn):
+    """Converts the original all-TEXT books table into the typed schema, keeping row order.
+
+    Duplicate URLs keep their last row, matching what a re-crawl would upsert.
+    """
+    conn.create_function("parse_price", 1, parse_price, deterministic=True)
+    conn.create_function("parse_stock", 1, parse_stock, deterministic=True)
+    conn.create_function("parse_rating", 1, parse_rating, deterministic=True)
+    conn.execute("DROP INDEX IF EXISTS idx_books_url")
+    conn.execute("ALTER TABLE books RENAME TO books_legacy")
+    create_schema(conn)
+    conn.execute("INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM books_legacy WHERE category IS NOT NULL")
+    conn.execute('''
+        INSERT INTO books (url, title, price, stock, rating, description, category_id)
+        SELECT l.url, COALESCE(l.title, ''), parse_price(l.price), parse_stock(l.availability), parse_rating(l.rating),
+               l.description, c.id
+        FROM books_legacy l LEFT JOIN categories c ON c.name = l.category
+        WHERE l.url IS NOT NULL
+        ORDER BY l.rowid
+        ON CONFLICT(url) DO UPDATE SET title=excluded.title, price=excluded.price, stock=excluded.stock,
+            rating=excluded.rating, description=excluded.description, category_id=excluded.category_id
+    ''')
+    conn.execute("DROP TABLE books_legacy")
+
+class CategoryCache:
+    """Maps category names to ids, inserting unseen names into the lookup table."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = dict((name, id_) for id_, name in conn.execute("SELECT id, name FROM categories"))
+
+    def ids_for(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if missing:
+            self.conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)", [(name,) for name in missing])
+            placeholders = ', '.join('?' * len(missing))
+            for id_, name in self.conn.execute(f"SELECT id, name FROM categories WHERE name IN ({placeholders})", list(missing)):
+                self.ids[name] = id_
+        return self.ids
+
+def typed_row(book, category_ids):
+    """Returns the typed books row for a scraped book dictionary."""
+    return (
+        book['URL'],
+        book['Title'],
+        parse_price(book['Price']),
+        parse_stock(book['Availability']),
+        parse_rating(book['Rating']),
+        book['Description'],
+        category_ids[book['Category']]
+    )
+
+def write_books(conn, books, categories):
+    """Upserts a batch of book dictionaries with executemany. Does not commit.
+
+    A URL seen twice keeps its last values, as in migrate_legacy_books, even
+    right after the table was cleared.
+    """
+    ids = categories.ids_for({book['Category'] for book in books})
+    conn.executemany(UPSERT_BOOK, [typed_row(book, ids) for book in books])
+
+def bulk_load(books, dbname="books.db", replace=True, chunk_size=5000):
+    """Loads book dictionaries in a single transaction, replacing the table unless replace=False.
+
+    Rows are passed to executemany `chunk_size` at a time, so any iterable can be loaded.
+    """
+    conn = connect(dbname)
+    categories = CategoryCache(conn)
+    count = 0
+    with conn:
+        conn.execute("BEGIN")
+        if replace:
+            conn.execute("DELETE FROM books")
+        chunk = []
+        for book in books:
+            chunk.append(book)
+            if len(chunk) >= chunk_size:
+                write_books(conn, chunk, categories)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            write_books(conn, chunk, categories)
+            count += len(chunk)
+    conn.execute("PRAGMA optimize")
+    conn.close()
+    return count
+
+def read_books(conn):
+    """Yields the stored books as dictionaries in the scraper's text format."""
+    rows = conn.execute("SELECT title, price, stock, rating, description, category, url FROM books_view ORDER BY id")
+    for title, price, stock, rating, description, category, url in rows:
+        yield {
+            'Title': title,
+            'Price': format_price(price),
+            'Availability': format_stock(stock),
+            'Rating': format_rating(rating),
+            'Description': description,
+            'Category': category,
+            'URL': url
+        }
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+    import time
+
+    parser = argparse.ArgumentParser(description="Create or migrate books.db, optionally bulk-loading a CSV.")
+    parser.add_argument("--db", default="books.db")
+    parser.add_argument("--load", metavar="CSV", help="replace the books table with the rows of this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    connect(args.db).close()
+    print(f"{args.db} is at schema version {SCHEMA_VERSION} ({time.perf_counter() - start:.3f}s)")
+    if args.load:
+        start = time.perf_counter()
+        with open(args.load, newline='', encoding='utf-8') as csvfile:
+            count = bulk_load(csv.DictReader(csvfile), args.db)
+        print(f"Loaded {count} books from {args.load} in {time.perf_counter() - start:.3f}s")
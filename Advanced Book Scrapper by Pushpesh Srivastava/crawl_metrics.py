@@ -0,0 +1,242 @@
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency buckets, from sub-millisecond parses to slow fetches
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROGRESS_EVERY = 5.0
+PREFIX = 'bookscraper'
+
+class Histogram:
+    """Latency histogram with fixed buckets, so its size does not grow with the crawl.
+
+    Quantiles are interpolated within the bucket they fall in, as Prometheus'
+    histogram_quantile does.
+    """
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': _round(self.quantile(0.5)),
+            'p90': _round(self.quantile(0.9)),
+            'p99': _round(self.quantile(0.99)),
+            'max': round(self.max, 6),
+            'buckets': buckets,
+        }
+
+def _round(value):
+    return round(value, 6) if value is not None else None
+
+def error_reason(exc):
+    """Label for a failed request: the HTTP status code, or the exception class (Timeout, ConnectionError, ...)."""
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        return str(response.status_code)
+    return type(exc).__name__
+
+class CrawlMetrics:
+    """Telemetry of one crawl: per-stage latency, pages and bytes fetched, responses, errors and retries.
+
+    Stages are 'fetch' (request and download), 'links' (listing pages),
+    'parse' (book pages) and one per sink ('save_csv', 'save_db', ...).
+    Safe to update from the crawler's fetch threads. With `progress_every`
+    set, a one-line summary is printed to stderr at most that often.
+    """
+
+    def __init__(self, progress_every=None, stream=None):
+        self.progress_every = progress_every
+        self.stream = stream or sys.stderr
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}
+        self.pages = Counter()  # by kind: listing, book
+        self.bytes = 0
+        self.books = 0
+        self.parse_errors = 0
+        self.responses = Counter()  # by status code
+        self.errors = Counter()  # by status code or exception
+        self.retries = Counter()
+        self.lock = threading.Lock()
+        self._last_progress = self.started
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def record_response(self, kind, response, seconds):
+        """A completed fetch of a `kind` ('listing' or 'book') page."""
+        with self.lock:
+            self.pages[kind] += 1
+            self.bytes += len(response.content)
+            self.responses[str(response.status_code)] += 1
+        self.observe('fetch', seconds)
+        self.progress()
+
+    def record_error(self, exc, retrying=False):
+        """A failed fetch; returns its reason. Retried attempts count as retries, the final one as an error."""
+        reason = error_reason(exc)
+        with self.lock:
+            response = getattr(exc, 'response', None)
+            if response is not None:
+                self.responses[reason] += 1
+            (self.retries if retrying else self.errors)[reason] += 1
+        return reason
+
+    def record_book(self, book):
+        with self.lock:
+            if book:
+                self.books += 1
+            else:
+                self.parse_errors += 1
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+        return self
+
+    def progress_line(self):
+        elapsed = self.elapsed
+        with self.lock:
+            pages = sum(self.pages.values())
+            line = (f"[{elapsed:7.1f}s] {pages} pages ({pages / elapsed if elapsed else 0:.1f}/s), "
+                    f"{self.books} books, {self.bytes / 2 ** 20:.1f} MB, {sum(self.errors.values())} errors, "
+                    f"{sum(self.retries.values())} retries")
+            for stage, histogram in self.stages.items():
+                line += (f" | {stage} p50 {histogram.quantile(0.5) * 1000:.0f}ms "
+                         f"p90 {histogram.quantile(0.9) * 1000:.0f}ms")
+        return line
+
+    def progress(self, force=False):
+        if self.progress_every is None and not force:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            if not force and now - self._last_progress < self.progress_every:
+                return
+            self._last_progress = now
+        print(self.progress_line(), file=self.stream, flush=True)
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        with self.lock:
+            pages = sum(self.pages.values())
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'pages': dict(self.pages),
+                'pages_per_second': round(pages / elapsed, 3) if elapsed else None,
+                'books': self.books,
+                'parse_errors': self.parse_errors,
+                'bytes': self.bytes,
+                'bytes_per_second': round(self.bytes / elapsed, 1) if elapsed else None,
+                'responses': dict(self.responses),
+                'errors': dict(self.errors),
+                'retries': dict(self.retries),
+                'stages': {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+            }
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        report = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{PREFIX}_{name}{suffix}{{{label_text}}} {value}" if label_text
+                             else f"{PREFIX}_{name}{suffix} {value}")
+
+        metric('stage_seconds', 'histogram', "Latency of each crawl stage.", [
+            sample for stage, histogram in report['stages'].items() for sample in
+            [('_bucket', {'stage': stage, 'le': le}, count) for le, count in histogram['buckets'].items()]
+            + [('_sum', {'stage': stage}, histogram['sum']), ('_count', {'stage': stage}, histogram['count'])]])
+        metric('pages_total', 'counter', "Pages fetched, by kind.",
+               [('', {'kind': kind}, count) for kind, count in report['pages'].items()])
+        metric('bytes_total', 'counter', "Response bytes downloaded.", [('', {}, report['bytes'])])
+        metric('books_total', 'counter', "Book pages parsed into records.", [('', {}, report['books'])])
+        metric('parse_errors_total', 'counter', "Book pages that could not be parsed.",
+               [('', {}, report['parse_errors'])])
+        metric('responses_total', 'counter', "HTTP responses, by status code.",
+               [('', {'status': status}, count) for status, count in report['responses'].items()])
+        metric('errors_total', 'counter', "Failed fetches after retries, by status code or exception.",
+               [('', {'reason': reason}, count) for reason, count in report['errors'].items()])
+        metric('retries_total', 'counter', "Retried fetch attempts, by status code or exception.",
+               [('', {'reason': reason}, count) for reason, count in report['retries'].items()])
+        metric('elapsed_seconds', 'gauge', "Duration of the crawl.", [('', {}, report['elapsed_seconds'])])
+        metric('pages_per_second', 'gauge', "Pages fetched per second over the crawl.",
+               [('', {}, report['pages_per_second'] or 0)])
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path):
+        """Writes the report as Prometheus text for .prom/.txt paths and as JSON otherwise."""
+        text = (self.to_prometheus() if path.endswith(('.prom', '.txt'))
+                else json.dumps(self.to_dict(), indent=2) + '\n')
+        with open(path, 'w') as f:
+            f.write(text)
+
+class TimedSink:
+    """Wraps a pipeline sink, timing its writes and close under the sink's `stage` name."""
+
+    def __init__(self, sink, metrics):
+        self.sink = sink
+        self.metrics = metrics
+        self.stage = getattr(sink, 'stage', 'save')
+
+    def write(self, book):
+        with self.metrics.time(self.stage):
+            self.sink.write(book)
+
+    def close(self):
+        with self.metrics.time(self.stage):
+            self.sink.close()
@@ -0,0 +1,142 @@
+import hashlib
+import sqlite3
+import time
+import zlib
+
+class CrawlState:
+    """Persistent crawl frontier and HTTP response cache, kept in an SQLite file.
+
+    The cache stores, per URL, the ETag/Last-Modified validators, a hash of
+    the body and the compressed body itself, so reruns can send conditional
+    requests and recognise unchanged pages. The frontier records which
+    listing and book pages of the current run are done, so a crawl that
+    stops halfway resumes where it left off.
+
+    A page is only marked done (and its new validators cached) after its
+    record has been saved, so a crash never hides a change from the next run.
+    """
+
+    def __init__(self, dbname="crawl_state.db"):
+        self.dbname = dbname
+        self.conn = sqlite3.connect(dbname)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                body BLOB,
+                encoding TEXT,
+                fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS crawl_runs (
+                id INTEGER PRIMARY KEY,
+                limit_pages INTEGER,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS frontier (
+                run_id INTEGER,
+                url TEXT,
+                kind TEXT,
+                page_no INTEGER,
+                position INTEGER,
+                status TEXT DEFAULT 'pending',
+                PRIMARY KEY (run_id, url)
+            );
+        ''')
+        self.conn.commit()
+        self.run_id = None
+
+    def start_run(self, limit_pages):
+        """Resumes the last unfinished run, or starts a new one. Returns True when resuming."""
+        row = self.conn.execute(
+            "SELECT id FROM crawl_runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row:
+            self.run_id = row[0]
+            return True
+        cur = self.conn.execute(
+            "INSERT INTO crawl_runs (limit_pages, started_at) VALUES (?, ?)", (limit_pages, time.time())
+        )
+        self.conn.commit()
+        self.run_id = cur.lastrowid
+        return False
+
+    def finish_run(self):
+        self.conn.execute("UPDATE crawl_runs SET finished_at=? WHERE id=?", (time.time(), self.run_id))
+        # Finished frontiers are never read again
+        self.conn.execute("DELETE FROM frontier WHERE run_id=?", (self.run_id,))
+        self.conn.commit()
+
+    def is_done(self, url):
+        row = self.conn.execute(
+            "SELECT status FROM frontier WHERE run_id=? AND url=?", (self.run_id, url)
+        ).fetchone()
+        return row is not None and row[0] == 'done'
+
+    def pending_books(self):
+        """Returns (page_no, position, url) for book pages discovered but not yet done in this run."""
+        return self.conn.execute(
+            "SELECT page_no, position, url FROM frontier WHERE run_id=? AND kind='book' AND status='pending' "
+            "ORDER BY page_no, position", (self.run_id,)
+        ).fetchall()
+
+    def add_listing(self, page_url, page_no, book_links, response):
+        """Queues the books found on a listing page and marks the page done, in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (run_id, url, kind, page_no, position) VALUES (?, ?, 'book', ?, ?)",
+                [(self.run_id, url, page_no, position) for position, url in enumerate(book_links)]
+            )
+            self._mark_done(page_url, 'listing', page_no, response)
+
+    def mark_done(self, url, response=None):
+        """Marks a book page done; caches the response if given."""
+        with self.conn:
+            self._mark_done(url, 'book', None, response)
+
+    def _mark_done(self, url, kind, page_no, response):
+        self.conn.execute(
+            "INSERT INTO frontier (run_id, url, kind, page_no, status) VALUES (?, ?, ?, ?, 'done') "
+            "ON CONFLICT(run_id, url) DO UPDATE SET status='done'", (self.run_id, url, kind, page_no)
+        )
+        if response is not None and response.status_code != 304:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 body_hash(response.content), zlib.compress(response.content), response.encoding, time.time())
+            )
+
+    def conditional_headers(self, url):
+        """Returns If-None-Match/If-Modified-Since headers for a cached URL."""
+        row = self.conn.execute("SELECT etag, last_modified FROM http_cache WHERE url=?", (url,)).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def is_changed(self, url, response):
+        """False if the server answered 304 or sent back a body identical to the cached one."""
+        if response.status_code == 304:
+            return False
+        row = self.conn.execute("SELECT body_hash FROM http_cache WHERE url=?", (url,)).fetchone()
+        return row is None or row[0] != body_hash(response.content)
+
+    def content(self, url, response):
+        """Returns (body bytes, encoding) of a response, taken from the cache on 304 Not Modified."""
+        if response.status_code != 304:
+            return response.content, response.encoding
+        body, encoding = self.conn.execute("SELECT body, encoding FROM http_cache WHERE url=?", (url,)).fetchone()
+        return zlib.decompress(body), encoding
+
+    def close(self):
+        self.conn.close()
+
+def body_hash(content):
+    return hashlib.sha256(content).hexdigest()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from books_schema import RATINGS
+from near_duplicates import clean_description
+
+CACHE_DIR = ".cache"
+CACHE_VERSION = 2  # bump when clean_books changes, so older caches are rebuilt
+
+def clean_books(df):
+    """Turns the scraped text columns into typed, compact columns.
+
+    Price '£51.77' (or the mis-decoded 'Â£51.77') -> float, Availability
+    'In stock (22 available)' -> int, Rating 'Three' -> int8 (0 when unknown),
+    Category -> categorical. Descriptions lose the repeated teaser and the
+    '...more' link the scraper picks up (see near_duplicates.clean_description).
+    Columns left out of the DataFrame (e.g. by read_csv's usecols) are skipped.
+    """
+    df['Price'] = df['Price'].astype(str).str.extract(r'(\d+(?:\.\d+)?)', expand=False).astype(float)
+    df['Availability'] = df['Availability'].astype(str).str.extract(r'(\d+)', expand=False).fillna(0).astype('int32')
+    df['Rating'] = df['Rating'].map(RATINGS).fillna(0).astype('int8')
+    df['Category'] = df['Category'].astype('category')
+    if 'Description' in df:
+        df['Description'] = df['Description'].map(clean_description)
+    return df
+
+def _fingerprint(filename):
+    stat = os.stat(filename)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+def _file_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _cache_paths(filename):
+    base = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIR, os.path.basename(filename))
+    try:
+        import pyarrow  # noqa: F401  (optional dependency for the Parquet cache)
+        return base + ".parquet", base + ".json"
+    except ImportError:
+        return base + ".pkl", base + ".json"
+
+def _read_cache(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, memory_map=True)
+    return pd.read_pickle(path)
+
+def _write_cache(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_pickle(path)
+
+def load_books(filename="books.csv", use_cache=True):
+    """Loads and cleans books.csv, reusing a typed columnar cache while the CSV is unchanged.
+
+    The cache (Parquet when pyarrow is installed, pickle otherwise) lives in
+    .cache/ next to the CSV. It is reused while the CSV's mtime and size
+    (and CACHE_VERSION) match; if they differ but the content hash is the
+    same (e.g. the file was only touched) the cache is kept and its
+    fingerprint refreshed.
+    Raises FileNotFoundError if the CSV does not exist.
+    """
+    fingerprint = dict(_fingerprint(filename), version=CACHE_VERSION)
+    if not use_cache:
+        return clean_books(pd.read_csv(filename))
+
+    data_path, meta_path = _cache_paths(filename)
+    meta = None
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if all(meta.get(key) == value for key, value in fingerprint.items()):
+            return _read_cache(data_path)
+
+    content_hash = _file_hash(filename)
+    if meta and meta.get('sha256') == content_hash and meta.get('version') == CACHE_VERSION:
+        df = _read_cache(data_path)
+    else:
+        df = clean_books(pd.read_csv(filename))
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        _write_cache(df, data_path)
+    with open(meta_path, 'w') as f:
+        json.dump(dict(fingerprint, sha256=content_hash), f)
+    return df
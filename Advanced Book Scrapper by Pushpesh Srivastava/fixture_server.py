@@ -0,0 +1,239 @@
+import csv
+import hashlib
+import os
+import random
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from books_schema import RATING_WORDS, format_price, format_stock
+
+BOOKS_PER_PAGE = 20
+
+CATEGORIES = ['Travel', 'Mystery', 'Historical Fiction', 'Sequential Art', 'Classics', 'Philosophy', 'Romance',
+              'Womens Fiction', 'Fiction', 'Childrens', 'Religion', 'Nonfiction', 'Music', 'Science Fiction',
+              'Sports and Games', 'Fantasy', 'New Adult', 'Young Adult', 'Science', 'Poetry', 'Paranormal',
+              'Art', 'Psychology', 'Autobiography', 'Parenting', 'Adult Fiction', 'Humor', 'Horror', 'History',
+              'Food and Drink', 'Christian Fiction', 'Business', 'Biography', 'Thriller', 'Contemporary',
+              'Spirituality', 'Academic', 'Self Help', 'Historical', 'Christian', 'Suspense', 'Short Stories',
+              'Novels', 'Health', 'Politics', 'Cultural', 'Erotica', 'Crime', 'Add a comment', 'Default']
+WORDS = ['the', 'of', 'a', 'and', 'night', 'garden', 'python', 'mystery', 'river', 'love', 'war', 'house', 'city',
+         'girl', 'secret', 'life', 'world', 'guide', 'history', 'light', 'attic', 'dark', 'summer', 'stone', 'été',
+         "don't", 'vol.', '(1)', '&', 'café']
+
+def encode_page(text):
+    """Encodes a page the way books.toscrape.com serves it.
+
+    The live site sends UTF-8 without a charset, so requests decodes it as
+    ISO-8859-1 and the scraped records contain text such as "Â£51.77".
+    Re-encoding that text as latin-1 gives back the original bytes, which
+    lets records from books.csv round-trip through the scraper unchanged.
+    """
+    try:
+        return text.encode('latin-1')
+    except UnicodeEncodeError:
+        return text.encode('utf-8')
+
+def book_slug(book):
+    """Returns the catalogue-relative path of a book, e.g. 'a-light-in-the-attic_1000/index.html'."""
+    path = urlsplit(book['URL']).path
+    return path.split('/catalogue/', 1)[-1]
+
+def render_listing_page(books, page_no, page_count):
+    """Renders a category page in the books.toscrape.com markup."""
+    pods = []
+    for book in books:
+        pods.append(
+            '<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3"><article class="product_pod">'
+            f'<p class="star-rating {escape(book["Rating"])}"></p>'
+            f'<h3><a href="{escape(book_slug(book))}" title="{escape(book["Title"])}">{escape(book["Title"][:40])}</a></h3>'
+            f'<div class="product_price"><p class="price_color">{escape(book["Price"])}</p></div>'
+            '</article></li>'
+        )
+    pager = f'<li class="current">Page {page_no} of {page_count}</li>'
+    if page_no < page_count:
+        pager += f'<li class="next"><a href="page-{page_no + 1}.html">next</a></li>'
+    return (
+        '<!DOCTYPE html><html lang="en-us"><head><title>All products | Books to Scrape - Sandbox</title></head><body>'
+        '<div class="page_inner"><ul class="breadcrumb"><li><a href="../index.html">Home</a></li><li class="active">All products</li></ul>'
+        f'<section><ol class="row">{"".join(pods)}</ol><ul class="pager">{pager}</ul></section></div></body></html>'
+    )
+
+def render_book_page(book):
+    """Renders a book detail page in the books.toscrape.com markup."""
+    if book.get('Description') in (None, '', 'No Description'):
+        description = ''
+    else:
+        description = (
+            '<div id="product_description" class="sub-header"><h2>Product Description</h2></div>'
+            f'<p>{escape(book["Description"])}</p>'
+        )
+    return (
+        f'<!DOCTYPE html><html lang="en-us"><head><title>{escape(book["Title"])} | Books to Scrape - Sandbox</title></head><body>'
+        '<div class="page_inner"><ul class="breadcrumb">'
+        '<li><a href="../../index.html">Home</a></li>'
+        '<li><a href="../category/books_1/index.html">Books</a></li>'
+        f'<li><a href="../category/books/{escape(book["Category"].lower())}/index.html">{escape(book["Category"])}</a></li>'
+        f'<li class="active">{escape(book["Title"])}</li></ul>'
+        '<article class="product_page"><div class="row"><div class="col-sm-6 product_main">'
+        f'<h1>{escape(book["Title"])}</h1>'
+        f'<p class="price_color">{escape(book["Price"])}</p>'
+        f'<p class="instock availability"><i class="icon-ok"></i>\n    \n        {escape(book["Availability"])}\n    \n</p>'
+        f'<p class="star-rating {escape(book["Rating"])}"><i class="icon-star"></i></p>'
+        f'</div></div>{description}'
+        '<table class="table table-striped"><tr><th>UPC</th><td>-</td></tr></table>'
+        '</article></div></body></html>'
+    )
+
+def synthetic_books(count, seed=0, description_words=230):
+    """Returns `count` distinct book records in the books.csv text format, the same for the same seed.
+
+    Titles, prices, stock, ratings and descriptions (about the length of the
+    real ones, with the odd missing one) are drawn at random, including the
+    accented and HTML-special characters the real catalogue has.
+    """
+    rng = random.Random(seed)
+    books = []
+    for i in range(count):
+        title = ' '.join(rng.choices(WORDS, k=rng.randint(1, 8))).capitalize()
+        if rng.random() < 0.05:
+            description = 'No Description'
+        else:
+            description = ' '.join(rng.choices(WORDS, k=rng.randint(description_words // 2, description_words * 3 // 2)))
+        slug = '-'.join(''.join(ch for ch in word if ch.isalnum()) or 'x' for word in title.lower().split())
+        books.append({
+            'Title': title,
+            'Price': format_price(rng.randint(1000, 5999) / 100).replace('£', 'Â£'),
+            'Availability': format_stock(rng.choice([0] + list(range(1, 23)))),
+            'Rating': RATING_WORDS[rng.randint(1, 5)],
+            'Description': description,
+            'Category': rng.choice(CATEGORIES),
+            'URL': f"https://books.toscrape.com/catalogue/{slug}_{i + 1}/index.html",
+        })
+    return books
+
+class FixtureSite:
+    """An in-memory copy of books.toscrape.com built from book records or saved HTML files."""
+
+    def __init__(self, books=(), fixtures_dir=None):
+        self.pages = {}
+        books = list(books)
+        page_count = max(1, -(-len(books) // BOOKS_PER_PAGE))
+        for page_no in range(1, page_count + 1):
+            chunk = books[(page_no - 1) * BOOKS_PER_PAGE:page_no * BOOKS_PER_PAGE]
+            self.pages[f'/catalogue/page-{page_no}.html'] = encode_page(render_listing_page(chunk, page_no, page_count))
+        for book in books:
+            self.set_book(book)
+        if fixtures_dir:
+            # Saved pages override rendered ones, keyed by their path below the site root
+            for root, _, files in os.walk(fixtures_dir):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    rel_path = os.path.relpath(full_path, fixtures_dir).replace(os.sep, '/')
+                    with open(full_path, 'rb') as f:
+                        self.pages['/' + rel_path] = f.read()
+
+    def set_book(self, book):
+        """Adds or replaces the detail page of a book."""
+        self.pages['/catalogue/' + book_slug(book)] = encode_page(render_book_page(book))
+
+    @classmethod
+    def from_csv(cls, filename="books.csv"):
+        with open(filename, newline='', encoding='utf-8') as csvfile:
+            return cls(csv.DictReader(csvfile))
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+
+    def do_GET(self):
+        body = self.server.site.pages.get(unquote(urlsplit(self.path).path))
+        self.server.request_count += 1
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified_count += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FixtureServer:
+    """Serves a FixtureSite on localhost in a background thread.
+
+    Usage:
+        with FixtureServer(FixtureSite.from_csv()) as server:
+            books = scrap_all_books_async(limit_pages=5, base_url=server.base_url)
+    """
+
+    def __init__(self, site, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.site = site
+        self.httpd.request_count = 0
+        self.httpd.not_modified_count = 0
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/catalogue/"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def not_modified_count(self):
+        return self.httpd.not_modified_count
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve books.toscrape.com fixture pages locally.")
+    parser.add_argument("--csv", default="books.csv", help="book records to render as pages")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="serve N generated books instead of the CSV")
+    parser.add_argument("--fixtures", help="directory of saved HTML pages, laid out like the site")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        site = FixtureSite(synthetic_books(args.synthetic), fixtures_dir=args.fixtures)
+    else:
+        with open(args.csv, newline='', encoding='utf-8') as csvfile:
+            site = FixtureSite(csv.DictReader(csvfile), fixtures_dir=args.fixtures)
+    server = FixtureServer(site, port=args.port)
+    print(f"Serving {len(site.pages)} pages at {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
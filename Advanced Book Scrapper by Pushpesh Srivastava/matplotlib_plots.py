@@ -1,137 +1,281 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import os
-
-# Create a directory to save the plots
-if not os.path.exists('plots'):
-    os.makedirs('plots')
-
-# Load and clean data
-try:
-    df = pd.read_csv("books.csv")
-    df['Price'] = df['Price'].str.replace('£', '').astype(float)
-    df['Availability'] = df['Availability'].str.extract('(\d+)').astype(int)
-    rating_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
-    df['Rating'] = df['Rating'].map(rating_map).fillna(0).astype(int)
-except FileNotFoundError:
-    print("Error: 'books.csv' not found. Please run the scraping script first.")
-    exit()
-
-# 1. Average Price per Category
-avg_price_cat = df.groupby('Category')['Price'].mean().sort_values(ascending=False)
-plt.figure(figsize=(15, 8))
-avg_price_cat.plot(kind='bar', color='skyblue')
-plt.title('Average Price per Category')
-plt.xlabel('Category')
-plt.ylabel('Average Price (£)')
-plt.xticks(rotation=90, ha='right')
-plt.tight_layout()
-plt.savefig('plots/1_avg_price_per_category.png')
-plt.close()
-
-# 2. Number of Books by Rating
-books_by_rating = df['Rating'].value_counts().sort_index()
-plt.figure(figsize=(8, 6))
-books_by_rating.plot(kind='bar', color='lightcoral')
-plt.title('Number of Books by Star Rating')
-plt.xlabel('Star Rating')
-plt.ylabel('Number of Books')
-plt.xticks(rotation=0)
-plt.tight_layout()
-plt.savefig('plots/2_books_by_rating.png')
-plt.close()
-
-# 3. Books in Stock vs Out of Stock
-in_stock = df[df['Availability'] > 0].shape[0]
-out_of_stock = df[df['Availability'] == 0].shape[0]
-stock_counts = pd.Series([in_stock, out_of_stock], index=['In Stock', 'Out of Stock'])
-plt.figure(figsize=(6, 6))
-stock_counts.plot(kind='pie', autopct='%1.1f%%', colors=['lightgreen', 'salmon'], startangle=90)
-plt.title('Books in Stock vs Out of Stock')
-plt.ylabel('')
-plt.tight_layout()
-plt.savefig('plots/3_stock_distribution.png')
-plt.close()
-
-# 4. Top 10 Most Expensive Books
-top_10_expensive = df.nlargest(10, 'Price')[['Title', 'Price']]
-plt.figure(figsize=(12, 8))
-plt.barh(top_10_expensive['Title'], top_10_expensive['Price'], color='purple')
-plt.title('Top 10 Most Expensive Books')
-plt.xlabel('Price (£)')
-plt.ylabel('Book Title')
-plt.gca().invert_yaxis()
-plt.tight_layout()
-plt.savefig('plots/4_top_10_expensive_books.png')
-plt.close()
-
-# 5. Book Count by Category (Top 10)
-book_counts_cat = df['Category'].value_counts().nlargest(10)
-plt.figure(figsize=(15, 8))
-book_counts_cat.plot(kind='bar', color='darkcyan')
-plt.title('Top 10 Categories by Book Count')
-plt.xlabel('Category')
-plt.ylabel('Number of Books')
-plt.xticks(rotation=45, ha='right')
-plt.tight_layout()
-plt.savefig('plots/5_top_10_categories.png')
-plt.close()
-
-# 6. Distribution of Book Prices (Histogram)
-plt.figure(figsize=(10, 6))
-df['Price'].plot(kind='hist', bins=20, color='royalblue', edgecolor='black')
-plt.title('Distribution of Book Prices')
-plt.xlabel('Price (£)')
-plt.ylabel('Frequency')
-plt.tight_layout()
-plt.savefig('plots/6_price_distribution.png')
-plt.close()
-
-# 7. Title Length Distribution
-df['Title_Length'] = df['Title'].str.len()
-plt.figure(figsize=(10, 6))
-df['Title_Length'].plot(kind='hist', bins=20, color='orange', edgecolor='black')
-plt.title('Distribution of Book Title Lengths')
-plt.xlabel('Title Length (Characters)')
-plt.ylabel('Frequency')
-plt.tight_layout()
-plt.savefig('plots/7_title_length_distribution.png')
-plt.close()
-
-# 8. Boxplot of Prices by Rating
-plt.figure(figsize=(10, 6))
-df.boxplot(column='Price', by='Rating', grid=False)
-plt.title('Boxplot of Prices by Rating')
-plt.suptitle('')
-plt.xlabel('Star Rating')
-plt.ylabel('Price (£)')
-plt.tight_layout()
-plt.savefig('plots/8_price_by_rating_boxplot.png')
-plt.close()
-
-# 9. Number of Books Over Price Thresholds
-thresholds = [10, 20, 30, 40, 50, 60]
-counts = [len(df[df['Price'] > t]) for t in thresholds]
-plt.figure(figsize=(10, 6))
-plt.bar([f'>£{t}' for t in thresholds], counts, color='teal')
-plt.title('Number of Books Over Price Thresholds')
-plt.xlabel('Price Threshold')
-plt.ylabel('Number of Books')
-plt.tight_layout()
-plt.savefig('plots/9_price_thresholds.png')
-plt.close()
-
-# 10. Top Categories with Most 5-Star Books
-five_star_books = df[df['Rating'] == 5]
-top_5_star_cats = five_star_books['Category'].value_counts().nlargest(10)
-plt.figure(figsize=(15, 8))
-top_5_star_cats.plot(kind='bar', color='gold', edgecolor='black')
-plt.title('Top 10 Categories with the Most 5-Star Books')
-plt.xlabel('Category')
-plt.ylabel('Number of 5-Star Books')
-plt.xticks(rotation=45, ha='right')
-plt.tight_layout()
-plt.savefig('plots/10_top_5_star_categories.png')
-plt.close()
-
-print("All plots have been generated and saved in the 'plots' directory.")
\ No newline at end of file
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # render to files only, also inside worker processes
+import matplotlib.pyplot as plt
+from matplotlib import cbook
+
+from data_loader import load_books
+from vectorized import threshold_counts
+
+# Usage:
+#   python matplotlib_plots.py                        render every plot whose data changed
+#   python matplotlib_plots.py price_thresholds --force
+#   python matplotlib_plots.py --list
+
+PLOTS = {}
+MANIFEST = '.manifest.json'
+
+class Plot:
+    def __init__(self, number, name, filename, prepare, render):
+        self.number = number
+        self.name = name
+        self.filename = filename
+        self.prepare = prepare
+        self.render = render
+
+    def fingerprint(self, inputs):
+        """Hash of the plot's input data and rendering code; equal hashes mean an identical image."""
+        digest = hashlib.sha256(pickle.dumps(inputs, protocol=4))
+        digest.update(inspect.getsource(self.render).encode('utf-8'))
+        return digest.hexdigest()
+
+def plot(number, name, filename, prepare):
+    """Registers a render function. `prepare` turns the PlotData into the (small) inputs the render needs."""
+    def register(render):
+        PLOTS[name] = Plot(number, name, filename, prepare, render)
+        return render
+    return register
+
+class PlotData:
+    """Aggregations shared between plots, each computed once per run."""
+
+    def __init__(self, df):
+        self.df = df
+
+    @cached_property
+    def category_groups(self):
+        return self.df.groupby('Category', observed=True)
+
+    @cached_property
+    def category_counts(self):
+        return self.df['Category'].value_counts()
+
+    @cached_property
+    def title_length(self):
+        return self.df['Title'].str.len()
+
+    @cached_property
+    def five_star(self):
+        return self.df['Rating'] == 5
+
+def _histogram(values, bins=20):
+    counts, edges = np.histogram(values.dropna(), bins=bins)
+    return counts, edges
+
+# 1. Average Price per Category
+@plot(1, 'avg_price_per_category', '1_avg_price_per_category.png',
+      lambda data: data.category_groups['Price'].mean().sort_values(ascending=False))
+def avg_price_per_category(avg_price_cat):
+    plt.figure(figsize=(15, 8))
+    avg_price_cat.plot(kind='bar', color='skyblue')
+    plt.title('Average Price per Category')
+    plt.xlabel('Category')
+    plt.ylabel('Average Price (£)')
+    plt.xticks(rotation=90, ha='right')
+
+# 2. Number of Books by Rating
+@plot(2, 'books_by_rating', '2_books_by_rating.png',
+      lambda data: data.df['Rating'].value_counts().sort_index())
+def books_by_rating(books_by_rating):
+    plt.figure(figsize=(8, 6))
+    books_by_rating.plot(kind='bar', color='lightcoral')
+    plt.title('Number of Books by Star Rating')
+    plt.xlabel('Star Rating')
+    plt.ylabel('Number of Books')
+    plt.xticks(rotation=0)
+
+# 3. Books in Stock vs Out of Stock
+def _stock_counts(data):
+    out_of_stock = int((data.df['Availability'] == 0).sum())
+    in_stock = int((data.df['Availability'] > 0).sum())
+    return pd.Series([in_stock, out_of_stock], index=['In Stock', 'Out of Stock'])
+
+@plot(3, 'stock_distribution', '3_stock_distribution.png', _stock_counts)
+def stock_distribution(stock_counts):
+    plt.figure(figsize=(6, 6))
+    stock_counts.plot(kind='pie', autopct='%1.1f%%', colors=['lightgreen', 'salmon'], startangle=90)
+    plt.title('Books in Stock vs Out of Stock')
+    plt.ylabel('')
+
+# 4. Top 10 Most Expensive Books
+@plot(4, 'top_10_expensive_books', '4_top_10_expensive_books.png',
+      lambda data: data.df.nlargest(10, 'Price')[['Title', 'Price']])
+def top_10_expensive_books(top_10_expensive):
+    plt.figure(figsize=(12, 8))
+    plt.barh(top_10_expensive['Title'], top_10_expensive['Price'], color='purple')
+    plt.title('Top 10 Most Expensive Books')
+    plt.xlabel('Price (£)')
+    plt.ylabel('Book Title')
+    plt.gca().invert_yaxis()
+
+# 5. Book Count by Category (Top 10)
+@plot(5, 'top_10_categories', '5_top_10_categories.png',
+      lambda data: data.category_counts.nlargest(10))
+def top_10_categories(book_counts_cat):
+    plt.figure(figsize=(15, 8))
+    book_counts_cat.plot(kind='bar', color='darkcyan')
+    plt.title('Top 10 Categories by Book Count')
+    plt.xlabel('Category')
+    plt.ylabel('Number of Books')
+    plt.xticks(rotation=45, ha='right')
+
+# 6. Distribution of Book Prices (Histogram)
+# Histograms are binned here, so only 20 counts are sent to the renderer
+@plot(6, 'price_distribution', '6_price_distribution.png',
+      lambda data: _histogram(data.df['Price']))
+def price_distribution(histogram):
+    counts, edges = histogram
+    plt.figure(figsize=(10, 6))
+    plt.hist(edges[:-1], bins=edges, weights=counts, color='royalblue', edgecolor='black')
+    plt.title('Distribution of Book Prices')
+    plt.xlabel('Price (£)')
+    plt.ylabel('Frequency')
+
+# 7. Title Length Distribution
+@plot(7, 'title_length_distribution', '7_title_length_distribution.png',
+      lambda data: _histogram(data.title_length))
+def title_length_distribution(histogram):
+    counts, edges = histogram
+    plt.figure(figsize=(10, 6))
+    plt.hist(edges[:-1], bins=edges, weights=counts, color='orange', edgecolor='black')
+    plt.title('Distribution of Book Title Lengths')
+    plt.xlabel('Title Length (Characters)')
+    plt.ylabel('Frequency')
+
+# 8. Boxplot of Prices by Rating
+def _price_box_stats(data):
+    stats = []
+    for rating, prices in data.df.groupby('Rating')['Price']:
+        box = cbook.boxplot_stats(prices.dropna().to_numpy())[0]
+        box['label'] = str(rating)
+        stats.append(box)
+    return stats
+
+@plot(8, 'price_by_rating_boxplot', '8_price_by_rating_boxplot.png', _price_box_stats)
+def price_by_rating_boxplot(box_stats):
+    plt.figure(figsize=(10, 6))
+    plt.gca().bxp(box_stats)
+    plt.title('Boxplot of Prices by Rating')
+    plt.xlabel('Star Rating')
+    plt.ylabel('Price (£)')
+
+# 9. Number of Books Over Price Thresholds
+THRESHOLDS = [10, 20, 30, 40, 50, 60]
+
+@plot(9, 'price_thresholds', '9_price_thresholds.png',
+      lambda data: threshold_counts(data.df['Price'], THRESHOLDS))
+def price_thresholds(counts):
+    plt.figure(figsize=(10, 6))
+    plt.bar([f'>£{t}' for t in THRESHOLDS], counts, color='teal')
+    plt.title('Number of Books Over Price Thresholds')
+    plt.xlabel('Price Threshold')
+    plt.ylabel('Number of Books')
+
+# 10. Top Categories with Most 5-Star Books
+@plot(10, 'top_5_star_categories', '10_top_5_star_categories.png',
+      # Category is categorical, so value_counts also lists categories without 5-star books
+      lambda data: data.df.loc[data.five_star, 'Category'].value_counts().loc[lambda counts: counts > 0].nlargest(10))
+def top_5_star_categories(top_5_star_cats):
+    plt.figure(figsize=(15, 8))
+    top_5_star_cats.plot(kind='bar', color='gold', edgecolor='black')
+    plt.title('Top 10 Categories with the Most 5-Star Books')
+    plt.xlabel('Category')
+    plt.ylabel('Number of 5-Star Books')
+    plt.xticks(rotation=45, ha='right')
+
+def _render(name, inputs, path):
+    PLOTS[name].render(inputs)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close('all')
+    return name
+
+def select(names=None):
+    plots = sorted(PLOTS.values(), key=lambda p: p.number)
+    if not names:
+        return plots
+    by_number = {str(p.number): p for p in plots}
+    selected = []
+    for name in names:
+        if name not in PLOTS and name not in by_number:
+            raise KeyError(f"Unknown plot {name!r}, use --list to see the available plots")
+        selected.append(PLOTS.get(name) or by_number[name])
+    return sorted(set(selected), key=lambda p: p.number)
+
+def render_plots(df, names=None, out_dir='plots', workers=None, force=False):
+    """Renders the selected plots into out_dir, skipping those whose inputs are unchanged.
+
+    Aggregations run once in this process; only their small results are sent
+    to a pool of `workers` processes (0 renders here). Returns the names of
+    the rendered and the skipped plots.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    data = PlotData(df)
+    jobs, skipped = [], []
+    for p in select(names):
+        inputs = p.prepare(data)
+        fingerprint = p.fingerprint(inputs)
+        path = os.path.join(out_dir, p.filename)
+        if not force and manifest.get(p.name) == fingerprint and os.path.exists(path):
+            skipped.append(p.name)
+            continue
+        jobs.append((p.name, inputs, path, fingerprint))
+
+    if workers == 0 or len(jobs) <= 1:
+        rendered = [_render(name, inputs, path) for name, inputs, path, _ in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_render, name, inputs, path) for name, inputs, path, _ in jobs]
+            rendered = [future.result() for future in futures]
+
+    for name, _, _, fingerprint in jobs:
+        manifest[name] = fingerprint
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return rendered, skipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the book plots, all of them or a subset by name or number.")
+    parser.add_argument("plots", nargs="*", help="plot names or numbers (default: all)")
+    parser.add_argument("--csv", default="books.csv")
+    parser.add_argument("--out", default="plots", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes (0 renders in this process)")
+    parser.add_argument("--force", action="store_true", help="re-render even if the data is unchanged")
+    parser.add_argument("--list", action="store_true", help="list the available plots and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for p in select():
+            print(f"{p.number:>2}. {p.name} -> {p.filename}")
+        raise SystemExit
+    try:
+        selected = [p.name for p in select(args.plots)]
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    # Load and clean data (parsed once and cached, see data_loader.py)
+    try:
+        df = load_books(args.csv)
+    except FileNotFoundError:
+        print(f"Error: '{args.csv}' not found. Please run the scraping script first.")
+        exit()
+
+    rendered, skipped = render_plots(df, selected, out_dir=args.out, workers=args.workers, force=args.force)
+    print(f"{len(rendered)} plot(s) generated and saved in the '{args.out}' directory"
+          + (f", {len(skipped)} unchanged plot(s) skipped." if skipped else "."))
@@ -0,0 +1,216 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Usage:
+#   python near_duplicates.py                     near-duplicate descriptions in books.csv
+#   python near_duplicates.py --threshold 0.6 --column Title
+#
+# Near-duplicates are found with MinHash signatures over word shingles and
+# locality-sensitive hashing: signatures are cut into bands, and only texts
+# that agree on a whole band are compared, so the work grows with the number
+# of texts instead of the number of pairs.
+
+_WORD = re.compile(r'\w+')
+
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+THRESHOLD = 0.8
+CHUNK_DOCS = 5000
+PRIME = (1 << 31) - 1  # hash values and permutation parameters stay below 2**31, so products fit in uint64
+MORE = ' ...more'
+TEASER_PROBE = 30
+PLACEHOLDERS = ('', 'No Description')
+
+def clean_description(text):
+    """Removes the scraped page furniture from a description.
+
+    Book pages show a truncated teaser, cut mid-word, followed by the full
+    text and a '...more' link, and the scraper keeps all three. Returns the
+    full text alone; other text is returned unchanged.
+    """
+    if not isinstance(text, str):
+        return text
+    if text.endswith(MORE):
+        text = text[:-len(MORE)]
+    head = text[:TEASER_PROBE]
+    start = text.find(head, 1) if len(text) > 2 * len(head) else -1
+    if start > 0:
+        teaser = text[:start].rstrip()
+        complete = teaser.rsplit(' ', 1)[0] if ' ' in teaser else teaser
+        if text.startswith(complete, start):
+            return text[start:]
+    return text
+
+def lsh_params(threshold=THRESHOLD, num_perm=NUM_PERM, false_negative_weight=0.8):
+    """(bands, rows) splitting num_perm that best separates pairs above and below `threshold`.
+
+    Minimizes the weighted probability mass of false positives (similarity
+    below the threshold, yet some band matches) and false negatives (above
+    it, yet no band matches), as in the usual MinHash LSH parameter search.
+    Missed pairs weigh more by default: candidates are verified against the
+    full signatures afterwards, but a missed pair is never seen again.
+    """
+    best, best_error = None, float('inf')
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        below = np.linspace(0, threshold, 200)
+        above = np.linspace(threshold, 1, 200)
+        false_positive = np.mean(1 - (1 - below ** rows) ** bands) * threshold
+        false_negative = np.mean((1 - above ** rows) ** bands) * (1 - threshold)
+        error = (1 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+class MinHasher:
+    """MinHash signatures of texts, computed for many texts at once with NumPy.
+
+    Words are given stable integer ids, each run of `shingle_words` words is
+    hashed to 31 bits, and permutation j maps a shingle hash x to
+    (a_j * x + b_j) mod 2**31 - 1. A text's signature holds the minimum of each
+    permutation over its shingles; the share of equal entries in two
+    signatures estimates the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle_words=SHINGLE_WORDS, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)
+        self.vocabulary = {}
+
+    def _token_ids(self, texts):
+        # Word ids of every text, concatenated, and the number of words in each text
+        words = [_WORD.findall(text.lower()) if isinstance(text, str) else [] for text in texts]
+        lengths = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+        flat = [word for text_words in words for word in text_words]
+        codes, uniques = pd.factorize(np.array(flat, dtype=object)) if flat else (np.zeros(0, np.int64), [])
+        vocabulary = self.vocabulary
+        ids = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in uniques], dtype=np.uint64)
+        return ids[codes] if len(flat) else np.zeros(0, np.uint64), lengths
+
+    def _shingles(self, ids, lengths):
+        # 31-bit hashes of the word shingles, and the number of shingles per text; texts shorter
+        # than a shingle get one shingle of all their words
+        k = self.shingle_words
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        counts = np.where(lengths >= k, lengths - k + 1, np.minimum(lengths, 1))
+        shingle_starts = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+        width = np.repeat(np.minimum(lengths, k), counts)
+        combined = np.zeros(len(shingle_starts), dtype=np.uint64)
+        padded = np.r_[ids, np.zeros(k, np.uint64)]
+        for offset in range(k):
+            word = np.where(offset < width, padded[shingle_starts + offset] + np.uint64(1), np.uint64(0))
+            combined = combined * np.uint64(1_000_003) + word
+        return (combined * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(33), counts
+
+    def signatures(self, texts, chunk=CHUNK_DOCS):
+        """(len(texts), num_perm) uint32 signatures; texts without words get all entries = 2**31 - 1."""
+        texts = list(texts)
+        result = np.full((len(texts), self.num_perm), PRIME, dtype=np.uint32)
+        for first in range(0, len(texts), chunk):
+            ids, lengths = self._token_ids(texts[first:first + chunk])
+            hashes, counts = self._shingles(ids, lengths)
+            has_words = counts > 0
+            if not has_words.any():
+                continue
+            offsets = np.r_[0, np.cumsum(counts)[:-1]][has_words]
+            rows = first + np.flatnonzero(has_words)
+            for j in range(self.num_perm):
+                permuted = (self.a[j] * hashes + self.b[j]) % np.uint64(PRIME)
+                result[rows, j] = np.minimum.reduceat(permuted, offsets)
+        return result
+
+def _band_keys(signatures, bands, rows):
+    # One 64-bit key per text and band, mixing the band's signature entries
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for r in range(rows):
+        keys = keys * np.uint64(0x100000001B3) + signatures[:, r::rows][:, :bands].astype(np.uint64)
+    return keys
+
+def _components(pairs, n):
+    # Connected components of the pair graph; each text is labelled with the smallest index in its group
+    labels = np.arange(n)
+    if len(pairs) == 0:
+        return labels
+    left, right = pairs[:, 0], pairs[:, 1]
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        if np.array_equal(low, labels[left]) and np.array_equal(low, labels[right]):
+            return labels
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+def near_duplicate_groups(texts, threshold=THRESHOLD, num_perm=NUM_PERM, shingle_words=SHINGLE_WORDS, seed=1):
+    """Group label per text: the index of the first text it is a near-duplicate of, or its own index.
+
+    Texts whose estimated Jaccard similarity reaches `threshold` are joined,
+    and groups are closed transitively. Within each LSH bucket every text is
+    checked against the bucket's first text only, keeping the work linear.
+    """
+    hasher = MinHasher(num_perm, shingle_words, seed)
+    signatures = hasher.signatures(texts)
+    has_words = signatures[:, 0] != PRIME
+    bands, rows = lsh_params(threshold, num_perm)
+    keys = _band_keys(signatures, bands, rows)
+    candidates = np.flatnonzero(has_words)
+    pairs = []
+    for band in range(bands):
+        band_keys = keys[candidates, band]
+        order = candidates[np.argsort(band_keys, kind='stable')]
+        sorted_keys = keys[order, band]
+        run_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        first = order[np.flatnonzero(run_start)[np.cumsum(run_start) - 1]]
+        members = order[~run_start]
+        reps = first[~run_start]
+        if len(members):
+            similar = (signatures[members] == signatures[reps]).mean(axis=1) >= threshold
+            pairs.append(np.column_stack([members[similar], reps[similar]]))
+    pairs = np.unique(np.concatenate(pairs), axis=0) if pairs else np.zeros((0, 2), dtype=np.int64)
+    return _components(pairs, len(signatures))
+
+def flag_near_duplicates(df, column='Description', threshold=THRESHOLD, **options):
+    """Returns a Series 'Duplicate_Of' with, for each later copy, the index label of the first listing.
+
+    Placeholder texts ('No Description', empty) never count as duplicates.
+    """
+    texts = df[column].where(~df[column].isin(PLACEHOLDERS), '').fillna('')
+    groups = near_duplicate_groups(texts.to_list(), threshold, **options)
+    positions = np.arange(len(df))
+    duplicate_of = pd.Series(pd.NA, index=df.index, dtype=object, name='Duplicate_Of')
+    copies = groups != positions
+    duplicate_of[copies] = df.index.to_numpy()[groups[copies]]
+    return duplicate_of
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from data_loader import load_books
+
+    parser = argparse.ArgumentParser(description="Flag near-duplicate book listings with MinHash LSH.")
+    parser.add_argument("--csv", default="books.csv")
+    parser.add_argument("--column", default="Description")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="estimated Jaccard similarity")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM)
+    args = parser.parse_args()
+
+    df = load_books(args.csv)
+    start = time.perf_counter()
+    duplicate_of = flag_near_duplicates(df, args.column, args.threshold, num_perm=args.num_perm)
+    elapsed = time.perf_counter() - start
+    copies = duplicate_of.dropna()
+    print(f"{len(copies)} of {len(df)} listing(s) are near-duplicates of an earlier one ({elapsed:.2f}s)")
+    for index, original in copies.items():
+        print(f"  {df.at[index, 'Title']!r} duplicates {df.at[original, 'Title']!r}")
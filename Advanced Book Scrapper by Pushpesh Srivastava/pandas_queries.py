@@ -1,185 +1,319 @@
-import pandas as pd
-import re
-from collections import Counter
-
-# Step 1: Load Data and Clean
-df = pd.read_csv("books.csv")
-df['Price'] = df['Price'].str.replace('£', '').astype(float)
-df['Availability'] = df['Availability'].str.extract('(\d+)').astype(int)
-
-# Normalize the 'Rating' column to be consistent (e.g., 'One' -> 1)
-rating_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
-df['Rating'] = df['Rating'].map(rating_map).fillna(0).astype(int)
-
-print("Data loaded and cleaned successfully.\n" + "="*50)
-
-# --- Pandas Queries ---
-
-# 1. Convert Price from string to float (Already done in the setup)
-print("1. Price column converted to float.")
-
-# 2. Top 5 most expensive books
-print("\n2. Top 5 most expensive books:")
-print(df.nlargest(5, 'Price')[['Title', 'Price']])
-
-# 3. Average price of all books
-print(f"\n3. Average price of all books: £{df['Price'].mean():.2f}")
-
-# 4. Count of books by star rating
-print("\n4. Count of books by star rating:")
-print(df['Rating'].value_counts().sort_index())
-
-# 5. Number of books in each category
-print("\n5. Number of books in each category:")
-print(df['Category'].value_counts())
-
-# 6. Books with "Python" in the title
-print("\n6. Books with 'Python' in the title:")
-print(df[df['Title'].str.contains('python', case=False, na=False)][['Title', 'Category']])
-
-# 7. Books currently in stock
-print("\n7. Books currently in stock:")
-print(df[df['Availability'] > 0][['Title', 'Availability']])
-
-# 8. Out-of-stock books
-print("\n8. Out-of-stock books:")
-print(df[df['Availability'] == 0][['Title', 'Availability']])
-
-# 9. Count of books missing a description
-print(f"\n9. Count of books missing a description: {df['Description'].isna().sum()}")
-
-# 10. Most common book rating
-most_common_rating = df['Rating'].mode()[0]
-print(f"\n10. Most common book rating: {most_common_rating} star(s)")
-
-# 11. Number of unique categories
-print(f"\n11. Number of unique categories: {df['Category'].nunique()}")
-
-# 12. List all unique categories
-print("\n12. List all unique categories:")
-print(df['Category'].unique())
-
-# 13. Sort all books alphabetically by title
-print("\n13. First 10 books sorted alphabetically by title:")
-print(df.sort_values('Title')[['Title']].head(10))
-
-# 14. Books with the longest descriptions
-df['Description_Length'] = df['Description'].str.len()
-print("\n14. Top 5 books with the longest descriptions:")
-print(df.nlargest(5, 'Description_Length')[['Title', 'Description_Length']])
-df.drop('Description_Length', axis=1, inplace=True)
-
-# 15. Cheapest book in each category
-print("\n15. Cheapest book in each category:")
-print(df.loc[df.groupby('Category')['Price'].idxmin()][['Category', 'Title', 'Price']])
-
-# 16. Top 3 most expensive books per category
-print("\n16. Top 3 most expensive books per category:")
-print(df.groupby('Category').apply(lambda x: x.nlargest(3, 'Price'))[['Title', 'Price']].droplevel(0))
-
-# 17. Books with title length > 50 characters
-df['Title_Length'] = df['Title'].str.len()
-print("\n17. Books with title length > 50 characters:")
-print(df[df['Title_Length'] > 50][['Title', 'Title_Length']])
-df.drop('Title_Length', axis=1, inplace=True)
-
-# 18. Add a column for "is_expensive" (price > £40)
-df['is_expensive'] = df['Price'] > 40
-print("\n18. Count of expensive books (price > £40):")
-print(df['is_expensive'].value_counts())
-
-# 19. Average price of expensive books
-print(f"\n19. Average price of expensive books: £{df[df['is_expensive']]['Price'].mean():.2f}")
-
-# 20. Books with a 5-star rating
-print("\n20. Books with a 5-star rating:")
-print(df[df['Rating'] == 5][['Title', 'Rating']])
-
-# 21. Books with multiple copies in stock
-print("\n21. Books with multiple copies in stock:")
-print(df[df['Availability'] > 1][['Title', 'Availability']])
-
-# 22. Category with the lowest average price
-avg_price_by_cat = df.groupby('Category')['Price'].mean()
-lowest_avg_price_cat = avg_price_by_cat.idxmin()
-print(f"\n22. Category with the lowest average price: {lowest_avg_price_cat} (Average Price: £{avg_price_by_cat.min():.2f})")
-
-# 23. How many books have 5-star ratings
-print(f"\n23. Number of books with 5-star ratings: {len(df[df['Rating'] == 5])}")
-
-# 24. List all 5-star books priced above £50
-print("\n24. 5-star books priced above £50:")
-print(df[(df['Rating'] == 5) & (df['Price'] > 50)][['Title', 'Price', 'Rating']])
-
-# 25. What is the average price of 1-star books?
-print(f"\n25. Average price of 1-star books: £{df[df['Rating'] == 1]['Price'].mean():.2f}")
-
-# 26. Top 10 categories with the most in-stock books
-print("\n26. Top 10 categories with the most in-stock books:")
-print(df.groupby('Category')['Availability'].sum().nlargest(10))
-
-# 27. Which books are completely out of stock?
-print("\n27. Books completely out of stock:")
-print(df[df['Availability'] == 0][['Title', 'Availability']])
-
-# 28. Books with descriptions containing the word "mystery"
-print("\n28. Books with descriptions containing the word 'mystery':")
-print(df[df['Description'].str.contains('mystery', case=False, na=False)][['Title']])
-
-# 29. Book with the highest price in the entire dataset
-highest_price_book = df.loc[df['Price'].idxmax()]
-print(f"\n29. Book with the highest price: {highest_price_book['Title']} (Price: £{highest_price_book['Price']})")
-
-# 30. Book with the lowest price
-lowest_price_book = df.loc[df['Price'].idxmin()]
-print(f"\n30. Book with the lowest price: {lowest_price_book['Title']} (Price: £{lowest_price_book['Price']})")
-
-# 31. How many books are priced exactly at £50?
-print(f"\n31. Number of books priced exactly at £50: {len(df[df['Price'] == 50])}")
-
-# 32. Rank books by price within each category
-print("\n32. First 10 books ranked by price within each category:")
-df['Rank_by_Price_in_Category'] = df.groupby('Category')['Price'].rank(ascending=False, method='min')
-print(df.sort_values(['Category', 'Rank_by_Price_in_Category'])[['Category', 'Title', 'Price', 'Rank_by_Price_in_Category']].head(10))
-
-# 33. Books with a title starting with 'A'
-print("\n33. Books with a title starting with 'A':")
-print(df[df['Title'].str.startswith('A')][['Title']])
-
-# 34. Average title length per category
-df['Title_Length'] = df['Title'].str.len()
-print("\n34. Average title length per category:")
-print(df.groupby('Category')['Title_Length'].mean())
-df.drop('Title_Length', axis=1, inplace=True)
-
-# 35. Most common word in all titles
-all_titles = ' '.join(df['Title'].values).lower()
-words = re.findall(r'\b\w+\b', all_titles)
-most_common_word = Counter(words).most_common(1)
-print(f"\n35. Most common word in all titles: {most_common_word[0][0]} (Count: {most_common_word[0][1]})")
-
-# 36. Books with descriptions longer than 300 characters
-df['Description_Length'] = df['Description'].str.len()
-print("\n36. Books with descriptions longer than 300 characters:")
-print(df[df['Description_Length'] > 300][['Title', 'Description_Length']])
-df.drop('Description_Length', axis=1, inplace=True)
-
-# 37. Distribution of books by rating and category
-print("\n37. Distribution of books by rating and category:")
-print(df.groupby(['Category', 'Rating'])['Title'].count().unstack(fill_value=0))
-
-# 38. Remove duplicate titles
-# Note: The scraped dataset from the first 5 pages doesn't have duplicates, but here is the code.
-df_no_duplicates = df.drop_duplicates(subset='Title', keep='first')
-print(f"\n38. Original number of books: {len(df)}, Books after removing duplicate titles: {len(df_no_duplicates)}")
-
-# 39. Find books priced below category average
-category_avg_prices = df.groupby('Category')['Price'].transform('mean')
-books_below_avg = df[df['Price'] < category_avg_prices]
-print("\n39. First 10 books priced below their category average:")
-print(books_below_avg[['Title', 'Category', 'Price']].head(10))
-
-# 40. Pivot table of average price per category and rating
-print("\n40. Pivot table of average price per category and rating:")
-pivot_table = df.pivot_table(values='Price', index='Category', columns='Rating', aggfunc='mean')
-print(pivot_table)
\ No newline at end of file
+import pandas as pd
+
+from aggregates import aggregate_csv, aggregate_db, aggregate_frame
+from data_loader import load_books
+from near_duplicates import flag_near_duplicates
+from query_engine import intermediate, main, query
+from vectorized import most_common_word
+
+# Usage:
+#   python pandas_queries.py                      run all queries
+#   python pandas_queries.py 15 cheapest_per_category --timing
+#   python pandas_queries.py --list
+#   python pandas_queries.py --db books.db            only the [out-of-core] queries, aggregated by SQLite
+#   python pandas_queries.py --chunksize 1000000      ... or over the CSV in chunks (see aggregates.py)
+
+# --- Shared intermediates ---
+# Each is computed at most once per run, and only when a selected query needs it.
+
+@intermediate('category_groups')
+def category_groups(ctx):
+    return ctx.df.groupby('Category')
+
+@intermediate('aggregates')
+def aggregates(ctx):
+    # Counts and sums per category and rating, prices and per-category extremes (see aggregates.py).
+    # Out-of-core runs supply it from books.db or CSV chunks instead of the DataFrame.
+    return aggregate_frame(ctx.df)
+
+@intermediate('category_avg_price', needs=['aggregates'])
+def category_avg_price(ctx):
+    # Per-row category average, i.e. groupby('Category')['Price'].transform('mean')
+    return ctx.aggregates.category_mean_price().reindex(ctx.df['Category']).to_numpy()
+
+@intermediate('five_star')
+def five_star(ctx):
+    return ctx.df['Rating'] == 5
+
+@intermediate('out_of_stock')
+def out_of_stock(ctx):
+    return ctx.df['Availability'] == 0
+
+@intermediate('title_length')
+def title_length(ctx):
+    return ctx.df['Title'].str.len().rename('Title_Length')
+
+@intermediate('near_duplicates')
+def near_duplicates(ctx):
+    return flag_near_duplicates(ctx.df, 'Description')
+
+@intermediate('description_length')
+def description_length(ctx):
+    return ctx.df['Description'].str.len().rename('Description_Length')
+
+# --- Pandas Queries ---
+
+# 1. Convert Price from string to float (Already done in the setup)
+@query(1, 'price_to_float')
+def price_to_float(ctx):
+    print("1. Price column converted to float.")
+
+# 2. Top 5 most expensive books
+@query(2, 'top_expensive')
+def top_expensive(ctx):
+    print("\n2. Top 5 most expensive books:")
+    print(ctx.df.nlargest(5, 'Price')[['Title', 'Price']])
+
+# 3. Average price of all books
+@query(3, 'average_price', needs=['aggregates'], out_of_core=True)
+def average_price(ctx):
+    print(f"\n3. Average price of all books: £{ctx.aggregates.mean_price():.2f}")
+
+# 4. Count of books by star rating
+@query(4, 'count_by_rating', needs=['aggregates'], out_of_core=True)
+def count_by_rating(ctx):
+    print("\n4. Count of books by star rating:")
+    print(ctx.aggregates.rating_counts())
+
+# 5. Number of books in each category
+@query(5, 'count_by_category', needs=['aggregates'], out_of_core=True)
+def count_by_category(ctx):
+    print("\n5. Number of books in each category:")
+    print(ctx.aggregates.category_counts())
+
+# 6. Books with "Python" in the title
+@query(6, 'python_titles')
+def python_titles(ctx):
+    df = ctx.df
+    print("\n6. Books with 'Python' in the title:")
+    print(df[df['Title'].str.contains('python', case=False, na=False)][['Title', 'Category']])
+
+# 7. Books currently in stock
+@query(7, 'in_stock', needs=['out_of_stock'])
+def in_stock(ctx):
+    print("\n7. Books currently in stock:")
+    print(ctx.df[~ctx.out_of_stock][['Title', 'Availability']])
+
+# 8. Out-of-stock books
+@query(8, 'out_of_stock_books', needs=['out_of_stock'])
+def out_of_stock_books(ctx):
+    print("\n8. Out-of-stock books:")
+    print(ctx.df[ctx.out_of_stock][['Title', 'Availability']])
+
+# 9. Count of books missing a description
+@query(9, 'missing_descriptions')
+def missing_descriptions(ctx):
+    print(f"\n9. Count of books missing a description: {ctx.df['Description'].isna().sum()}")
+
+# 10. Most common book rating
+@query(10, 'most_common_rating', needs=['aggregates'], out_of_core=True)
+def most_common_rating(ctx):
+    most_common_rating = ctx.aggregates.rating_counts().idxmax()  # the lowest of tied ratings, like mode()
+    print(f"\n10. Most common book rating: {most_common_rating} star(s)")
+
+# 11. Number of unique categories
+@query(11, 'unique_category_count', needs=['aggregates'], out_of_core=True)
+def unique_category_count(ctx):
+    print(f"\n11. Number of unique categories: {len(ctx.aggregates.category_counts())}")
+
+# 12. List all unique categories
+@query(12, 'unique_categories')
+def unique_categories(ctx):
+    print("\n12. List all unique categories:")
+    print(ctx.df['Category'].unique())
+
+# 13. Sort all books alphabetically by title
+@query(13, 'sorted_titles')
+def sorted_titles(ctx):
+    print("\n13. First 10 books sorted alphabetically by title:")
+    print(ctx.df.sort_values('Title')[['Title']].head(10))
+
+# 14. Books with the longest descriptions
+@query(14, 'longest_descriptions', needs=['description_length'])
+def longest_descriptions(ctx):
+    books = ctx.df[['Title']].assign(Description_Length=ctx.description_length)
+    print("\n14. Top 5 books with the longest descriptions:")
+    print(books.nlargest(5, 'Description_Length'))
+
+# 15. Cheapest book in each category
+@query(15, 'cheapest_per_category', needs=['aggregates'], out_of_core=True)
+def cheapest_per_category(ctx):
+    print("\n15. Cheapest book in each category:")
+    print(ctx.aggregates.cheapest()[['Category', 'Title', 'Price']])
+
+# 16. Top 3 most expensive books per category
+@query(16, 'top3_per_category', needs=['aggregates'], out_of_core=True)
+def top3_per_category(ctx):
+    print("\n16. Top 3 most expensive books per category:")
+    print(ctx.aggregates.top(3)[['Title', 'Price']])
+
+# 17. Books with title length > 50 characters
+@query(17, 'long_titles', needs=['title_length'])
+def long_titles(ctx):
+    books = ctx.df[['Title']].assign(Title_Length=ctx.title_length)
+    print("\n17. Books with title length > 50 characters:")
+    print(books[books['Title_Length'] > 50])
+
+# 18. Add a column for "is_expensive" (price > £40)
+@query(18, 'expensive_count', needs=['aggregates'], out_of_core=True)
+def expensive_count(ctx):
+    expensive = ctx.aggregates.count_above(40)
+    counts = pd.Series([ctx.aggregates.row_count() - expensive, expensive],
+                       index=pd.Index([False, True], name='is_expensive'), name='count')
+    print("\n18. Count of expensive books (price > £40):")
+    print(counts[counts > 0].sort_values(ascending=False, kind='stable'))
+
+# 19. Average price of expensive books
+@query(19, 'expensive_average_price', needs=['aggregates'], out_of_core=True)
+def expensive_average_price(ctx):
+    print(f"\n19. Average price of expensive books: £{ctx.aggregates.mean_price(above=40):.2f}")
+
+# 20. Books with a 5-star rating
+@query(20, 'five_star_books', needs=['five_star'])
+def five_star_books(ctx):
+    print("\n20. Books with a 5-star rating:")
+    print(ctx.df[ctx.five_star][['Title', 'Rating']])
+
+# 21. Books with multiple copies in stock
+@query(21, 'multiple_copies')
+def multiple_copies(ctx):
+    df = ctx.df
+    print("\n21. Books with multiple copies in stock:")
+    print(df[df['Availability'] > 1][['Title', 'Availability']])
+
+# 22. Category with the lowest average price
+@query(22, 'cheapest_category', needs=['aggregates'], out_of_core=True)
+def cheapest_category(ctx):
+    avg_price_by_cat = ctx.aggregates.category_mean_price()
+    lowest_avg_price_cat = avg_price_by_cat.idxmin()
+    print(f"\n22. Category with the lowest average price: {lowest_avg_price_cat} (Average Price: £{avg_price_by_cat.min():.2f})")
+
+# 23. How many books have 5-star ratings
+@query(23, 'five_star_count', needs=['aggregates'], out_of_core=True)
+def five_star_count(ctx):
+    print(f"\n23. Number of books with 5-star ratings: {int(ctx.aggregates.rating_counts().get(5, 0))}")
+
+# 24. List all 5-star books priced above £50
+@query(24, 'five_star_above_50', needs=['five_star'])
+def five_star_above_50(ctx):
+    df = ctx.df
+    print("\n24. 5-star books priced above £50:")
+    print(df[ctx.five_star & (df['Price'] > 50)][['Title', 'Price', 'Rating']])
+
+# 25. What is the average price of 1-star books?
+@query(25, 'one_star_average_price', needs=['aggregates'], out_of_core=True)
+def one_star_average_price(ctx):
+    print(f"\n25. Average price of 1-star books: £{ctx.aggregates.mean_price(rating=1):.2f}")
+
+# 26. Top 10 categories with the most in-stock books
+@query(26, 'top_stocked_categories', needs=['aggregates'], out_of_core=True)
+def top_stocked_categories(ctx):
+    print("\n26. Top 10 categories with the most in-stock books:")
+    print(ctx.aggregates.category_stock().nlargest(10))
+
+# 27. Which books are completely out of stock?
+@query(27, 'completely_out_of_stock', needs=['out_of_stock'])
+def completely_out_of_stock(ctx):
+    print("\n27. Books completely out of stock:")
+    print(ctx.df[ctx.out_of_stock][['Title', 'Availability']])
+
+# 28. Books with descriptions containing the word "mystery"
+@query(28, 'mystery_descriptions')
+def mystery_descriptions(ctx):
+    df = ctx.df
+    print("\n28. Books with descriptions containing the word 'mystery':")
+    print(df[df['Description'].str.contains('mystery', case=False, na=False)][['Title']])
+
+# 29. Book with the highest price in the entire dataset
+@query(29, 'highest_price_book')
+def highest_price_book(ctx):
+    highest_price_book = ctx.df.loc[ctx.df['Price'].idxmax()]
+    print(f"\n29. Book with the highest price: {highest_price_book['Title']} (Price: £{highest_price_book['Price']})")
+
+# 30. Book with the lowest price
+@query(30, 'lowest_price_book')
+def lowest_price_book(ctx):
+    lowest_price_book = ctx.df.loc[ctx.df['Price'].idxmin()]
+    print(f"\n30. Book with the lowest price: {lowest_price_book['Title']} (Price: £{lowest_price_book['Price']})")
+
+# 31. How many books are priced exactly at £50?
+@query(31, 'priced_at_50', needs=['aggregates'], out_of_core=True)
+def priced_at_50(ctx):
+    print(f"\n31. Number of books priced exactly at £50: {ctx.aggregates.count_equal(50)}")
+
+# 32. Rank books by price within each category
+@query(32, 'price_rank_in_category', needs=['category_groups'])
+def price_rank_in_category(ctx):
+    print("\n32. First 10 books ranked by price within each category:")
+    ranked = ctx.df[['Category', 'Title', 'Price']].assign(
+        Rank_by_Price_in_Category=ctx.category_groups['Price'].rank(ascending=False, method='min'))
+    print(ranked.sort_values(['Category', 'Rank_by_Price_in_Category']).head(10))
+
+# 33. Books with a title starting with 'A'
+@query(33, 'titles_starting_with_a')
+def titles_starting_with_a(ctx):
+    df = ctx.df
+    print("\n33. Books with a title starting with 'A':")
+    print(df[df['Title'].str.startswith('A')][['Title']])
+
+# 34. Average title length per category
+@query(34, 'average_title_length', needs=['title_length'])
+def average_title_length(ctx):
+    print("\n34. Average title length per category:")
+    print(ctx.title_length.groupby(ctx.df['Category']).mean())
+
+# 35. Most common word in all titles
+@query(35, 'most_common_title_word')
+def most_common_title_word(ctx):
+    word, count = most_common_word(ctx.df['Title'])
+    print(f"\n35. Most common word in all titles: {word} (Count: {count})")
+
+# 36. Books with descriptions longer than 300 characters
+@query(36, 'long_descriptions', needs=['description_length'])
+def long_descriptions(ctx):
+    books = ctx.df[['Title']].assign(Description_Length=ctx.description_length)
+    print("\n36. Books with descriptions longer than 300 characters:")
+    print(books[books['Description_Length'] > 300])
+
+# 37. Distribution of books by rating and category
+@query(37, 'rating_by_category', needs=['aggregates'], out_of_core=True)
+def rating_by_category(ctx):
+    print("\n37. Distribution of books by rating and category:")
+    print(ctx.aggregates.rating_by_category())
+
+# 38. Remove duplicate titles
+# Note: The scraped dataset from the first 5 pages doesn't have duplicates, but here is the code.
+@query(38, 'duplicate_titles')
+def duplicate_titles(ctx):
+    df_no_duplicates = ctx.df.drop_duplicates(subset='Title', keep='first')
+    print(f"\n38. Original number of books: {len(ctx.df)}, Books after removing duplicate titles: {len(df_no_duplicates)}")
+
+# 39. Find books priced below category average
+@query(39, 'below_category_average', needs=['category_avg_price'])
+def below_category_average(ctx):
+    df = ctx.df
+    books_below_avg = df[df['Price'] < ctx.category_avg_price]
+    print("\n39. First 10 books priced below their category average:")
+    print(books_below_avg[['Title', 'Category', 'Price']].head(10))
+
+# 40. Pivot table of average price per category and rating
+@query(40, 'price_pivot', needs=['aggregates'], out_of_core=True)
+def price_pivot(ctx):
+    print("\n40. Pivot table of average price per category and rating:")
+    print(ctx.aggregates.price_pivot())
+
+# 41. Listings whose description nearly matches an earlier one (MinHash LSH, see near_duplicates.py)
+@query(41, 'near_duplicate_listings', needs=['near_duplicates'])
+def near_duplicate_listings(ctx):
+    copies = ctx.near_duplicates.dropna()
+    print(f"\n41. Listings with a near-duplicate description: {len(copies)} of {len(ctx.df)}")
+    if len(copies):
+        originals = ctx.df.loc[copies.to_numpy(), 'Title'].to_numpy()
+        print(ctx.df.loc[copies.index, ['Title']].assign(Duplicate_Of=originals).head(10))
+
+def load_aggregates(csv, db=None, chunksize=None):
+    """The 'aggregates' intermediate for out-of-core runs: pushed down to SQLite, or merged over CSV chunks."""
+    return {'aggregates': aggregate_db(db) if db else aggregate_csv(csv, chunksize)}
+
+if __name__ == "__main__":
+    main(load_books, load_values=load_aggregates)
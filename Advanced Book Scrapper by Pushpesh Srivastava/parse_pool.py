@@ -0,0 +1,155 @@
+import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html import unescape
+
+from bs4 import BeautifulSoup
+
+from BookScraper import extract_book_details
+
+def parse_with_bs4(html, book_url, features="html.parser"):
+    """Reference backend: builds the full BeautifulSoup tree, exactly like parse_book_page."""
+    return extract_book_details(BeautifulSoup(html, features), book_url)
+
+def parse_with_lxml(html, book_url):
+    """Parses the page with lxml.html and XPath, skipping BeautifulSoup entirely."""
+    import lxml.html  # optional dependency, only needed for this backend
+
+    try:
+        doc = lxml.html.fromstring(html)
+        title = doc.xpath('//h1')[0].text_content().strip()
+        price = doc.xpath('//p[contains(concat(" ", @class, " "), " price_color ")]')[0].text_content().strip()
+        availability = doc.xpath(
+            '//p[contains(concat(" ", @class, " "), " instock ")'
+            ' and contains(concat(" ", @class, " "), " availability ")]'
+        )[0].text_content().strip()
+
+        rating_elements = doc.xpath('//p[contains(concat(" ", @class, " "), " star-rating ")]')
+        rating = rating_elements[0].get('class').split()[1] if rating_elements else "No Rating"
+
+        description = doc.xpath('//div[@id="product_description"]/following-sibling::p[1]')
+        if doc.xpath('//div[@id="product_description"]'):
+            description_text = description[0].text_content().strip()
+        else:
+            description_text = "No Description"
+
+        breadcrumb = doc.xpath('//ul[contains(concat(" ", @class, " "), " breadcrumb ")]//li//a')
+        category = breadcrumb[-2].text_content().strip() if len(breadcrumb) > 1 else "No Category"
+
+        return {
+            'Title': title,
+            'Price': price,
+            'Availability': availability,
+            'Rating': rating,
+            'Description': description_text,
+            'Category': category,
+            'URL': book_url
+        }
+    except Exception as e:
+        print(f"Error parsing book page {book_url}: {e}")
+        return None
+
+_TAG = re.compile(r'<[^>]+>')
+_TITLE = re.compile(r'<h1[^>]*>(.*?)</h1>', re.S)
+_PRICE = re.compile(r'<p[^>]*class="[^"]*\bprice_color\b[^"]*"[^>]*>(.*?)</p>', re.S)
+_AVAILABILITY = re.compile(r'<p[^>]*class="[^"]*\binstock availability\b[^"]*"[^>]*>(.*?)</p>', re.S)
+_RATING = re.compile(r'<p[^>]*class="star-rating (\w+)"')
+_DESCRIPTION = re.compile(r'<div[^>]*id="product_description"[^>]*>.*?</div>\s*<p[^>]*>(.*?)</p>', re.S)
+_BREADCRUMB = re.compile(r'<ul[^>]*class="breadcrumb"[^>]*>(.*?)</ul>', re.S)
+_LINK_TEXT = re.compile(r'<a[^>]*>(.*?)</a>', re.S)
+
+def _text(fragment):
+    return unescape(_TAG.sub('', fragment)).strip()
+
+def parse_with_selectors(html, book_url):
+    """Targeted extractor: pulls only the fields we need with precompiled patterns, no tree is built.
+
+    Relies on the books.toscrape.com markup; use the bs4 backends for arbitrary pages.
+    """
+    try:
+        title = _text(_TITLE.search(html).group(1))
+        price = _text(_PRICE.search(html).group(1))
+        availability = _text(_AVAILABILITY.search(html).group(1))
+
+        rating_match = _RATING.search(html)
+        rating = rating_match.group(1) if rating_match else "No Rating"
+
+        description_match = _DESCRIPTION.search(html)
+        description_text = _text(description_match.group(1)) if description_match else "No Description"
+
+        breadcrumb_match = _BREADCRUMB.search(html)
+        breadcrumb = _LINK_TEXT.findall(breadcrumb_match.group(1)) if breadcrumb_match else []
+        category = _text(breadcrumb[-2]) if len(breadcrumb) > 1 else "No Category"
+
+        return {
+            'Title': title,
+            'Price': price,
+            'Availability': availability,
+            'Rating': rating,
+            'Description': description_text,
+            'Category': category,
+            'URL': book_url
+        }
+    except Exception as e:
+        print(f"Error parsing book page {book_url}: {e}")
+        return None
+
+# Parser backends by name. Backends must be module-level functions so the
+# process pool can pickle them; add new ones here.
+PARSERS = {
+    'html.parser': parse_with_bs4,
+    'lxml': parse_with_lxml,
+    'selectors': parse_with_selectors,
+}
+
+def parse_book_html(html_bytes, book_url, encoding=None, parser='html.parser'):
+    """Decodes raw page bytes and returns the same dictionary as parse_book_page."""
+    html = html_bytes.decode(encoding or 'utf-8', errors='replace')
+    return PARSERS[parser](html, book_url)
+
+def _parse_job(job):
+    return parse_book_html(*job)
+
+class ParsePool:
+    """Parses book pages in a pool of worker processes.
+
+    With workers=0 pages are parsed in the calling process, which is the
+    single-process path used for comparison.
+    """
+
+    def __init__(self, workers=None, parser='html.parser'):
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser backend {parser!r}, choose from {sorted(PARSERS)}")
+        self.parser = parser
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+
+    def parse(self, html_bytes, book_url, encoding=None):
+        """Parses one page synchronously."""
+        if self.executor is None:
+            return parse_book_html(html_bytes, book_url, encoding, self.parser)
+        return self.executor.submit(parse_book_html, html_bytes, book_url, encoding, self.parser).result()
+
+    async def parse_async(self, html_bytes, book_url, encoding=None):
+        """Parses one page without blocking the event loop."""
+        if self.executor is None:
+            return parse_book_html(html_bytes, book_url, encoding, self.parser)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, parse_book_html, html_bytes, book_url, encoding, self.parser)
+
+    def map(self, pages, chunksize=16):
+        """Parses an iterable of (html_bytes, book_url, encoding) tuples, preserving order."""
+        jobs = ((html_bytes, book_url, encoding, self.parser) for html_bytes, book_url, encoding in pages)
+        if self.executor is None:
+            return map(_parse_job, jobs)
+        return self.executor.map(_parse_job, jobs, chunksize=chunksize)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
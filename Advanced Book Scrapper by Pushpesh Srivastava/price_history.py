@@ -0,0 +1,265 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import books_schema
+from books_schema import parse_price, parse_stock, parse_rating
+
+# Usage:
+#   python price_history.py --since 2026-01-01            price changes since a date
+#   python price_history.py --since 2026-01-01 --field stock
+#   python price_history.py --at 2026-02-01 --limit 20    the catalogue as it was then
+#   python price_history.py --url https://books.toscrape.com/catalogue/..._1000/index.html
+
+FIELDS = ('price_cents', 'stock', 'rating')
+UNKNOWN_PRICE = -1
+CHUNK = 500
+
+def _typed(book):
+    price = parse_price(book['Price'])
+    return (round(price * 100) if price is not None else UNKNOWN_PRICE,
+            parse_stock(book['Availability']), parse_rating(book['Rating']))
+
+class PriceHistory:
+    """Append-only price, stock and rating history of the crawled books, stored in books.db.
+
+    Each crawl gets a row in `crawls`; a book gets a `history` row only in the
+    crawls where one of its values changed, holding just the changed values.
+    The latest values per URL are kept in `history_books`, so recording a
+    crawl reads and writes only the books it saw.
+    """
+
+    def __init__(self, dbname="books.db"):
+        self.conn = books_schema.connect(dbname)
+
+    def start_crawl(self, crawled_at=None):
+        """Registers a crawl (now, or at the given Unix time) and returns its id."""
+        crawled_at = time.time() if crawled_at is None else crawled_at
+        with self.conn:
+            last = self.conn.execute("SELECT MAX(crawled_at) FROM crawls").fetchone()[0]
+            if last is not None and crawled_at < last:
+                raise ValueError("Crawls must be recorded in time order")
+            return self.conn.execute("INSERT INTO crawls (crawled_at) VALUES (?)", (crawled_at,)).lastrowid
+
+    def _latest(self, urls):
+        latest = {}
+        for start in range(0, len(urls), CHUNK):
+            chunk = urls[start:start + CHUNK]
+            rows = self.conn.execute(f"SELECT url, id, {', '.join(FIELDS)} FROM history_books "
+                                     f"WHERE url IN ({', '.join('?' * len(chunk))})", chunk)
+            latest.update((url, (book_id, values)) for url, book_id, *values in rows)
+        return latest
+
+    def record(self, crawl_id, books):
+        """Records a batch of book dictionaries seen in a crawl. Returns how many of them changed."""
+        typed = {book['URL']: _typed(book) for book in books}
+        latest = self._latest(list(typed))
+        new, changes, updates = [], [], []
+        for url, values in typed.items():
+            if url not in latest:
+                new.append((url, *values, crawl_id))
+                continue
+            book_id, previous = latest[url]
+            if tuple(previous) != values:
+                changes.append((book_id, crawl_id, *(v if v != p else None for v, p in zip(values, previous))))
+                updates.append((*values, crawl_id, book_id))
+        with self.conn:
+            self.conn.executemany(f"INSERT INTO history_books (url, {', '.join(FIELDS)}, last_crawl) "
+                                  "VALUES (?, ?, ?, ?, ?)", new)
+            if new:
+                ids = self._latest([row[0] for row in new])
+                changes.extend((ids[url][0], crawl_id, *values) for url, *values, _ in new)
+            self.conn.executemany("UPDATE history_books SET price_cents=?, stock=?, rating=?, last_crawl=? "
+                                  "WHERE id=?", updates)
+            # A book seen twice in one crawl keeps one row, merging the values that changed
+            self.conn.executemany(f"INSERT INTO history (book_id, crawl_id, {', '.join(FIELDS)}) "
+                                  "VALUES (?, ?, ?, ?, ?) ON CONFLICT(book_id, crawl_id) DO UPDATE SET "
+                                  + ', '.join(f"{f}=COALESCE(excluded.{f}, {f})" for f in FIELDS), changes)
+        return len(changes)
+
+    def close(self):
+        self.conn.close()
+
+class HistorySink:
+    """Pipeline sink (see BookScraper.run_pipeline) recording a stream of books as one crawl.
+
+    The crawl is registered with the first batch, so an empty stream records nothing.
+    """
+
+    stage = 'save_history'  # crawl_metrics stage name
+
+    def __init__(self, dbname="books.db", batch_size=500, crawled_at=None):
+        self.history = PriceHistory(dbname)
+        self.batch_size = batch_size
+        self.crawled_at = crawled_at
+        self.crawl_id = None
+        self.count = 0
+        self.changed = 0
+        self.batch = []
+
+    def write(self, book):
+        self.batch.append(book)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            if self.crawl_id is None:
+                self.crawl_id = self.history.start_crawl(self.crawled_at)
+            self.changed += self.history.record(self.crawl_id, self.batch)
+            self.count += len(self.batch)
+            self.batch.clear()
+
+    def close(self):
+        self.flush()
+        self.history.close()
+
+def record_crawl(books, dbname="books.db", crawled_at=None):
+    """Records an iterable of book dictionaries as one crawl. Returns the number of changed books."""
+    sink = HistorySink(dbname, crawled_at=crawled_at)
+    try:
+        for book in books:
+            sink.write(book)
+    finally:
+        sink.close()
+    return sink.changed
+
+class HistoryArrays:
+    """The whole history as NumPy columns, for point-in-time and change queries without SQL per book.
+
+    Rows are ordered by book and crawl (the history table's clustering order).
+    Unchanged (NULL) values are forward-filled within each book once at load
+    time; this needs no grouping because a book's first row holds all values.
+    """
+
+    def __init__(self, dbname="books.db"):
+        conn = books_schema.connect_read_only(dbname)
+        try:
+            books = conn.execute("SELECT id, url FROM history_books").fetchall()
+            rows = conn.execute(f"SELECT h.book_id, c.crawled_at, {', '.join('h.' + f for f in FIELDS)} "
+                                "FROM history h JOIN crawls c ON c.id = h.crawl_id ORDER BY h.book_id, h.crawl_id")
+            data = np.array(rows.fetchall(), dtype=np.float64).reshape(-1, 2 + len(FIELDS))
+            self.crawl_times = np.array([t for t, in conn.execute("SELECT crawled_at FROM crawls ORDER BY id")])
+        finally:
+            conn.close()
+        # urls[book id] is the book's URL; ids are dense, so this doubles as the per-book array length
+        self.urls = np.full(max((book_id for book_id, _ in books), default=0) + 1, None, dtype=object)
+        for book_id, url in books:
+            self.urls[book_id] = url
+        self.ids = {url: book_id for book_id, url in books}
+        self.book_ids = data[:, 0].astype(np.int64)
+        self.times = data[:, 1]
+        positions = np.arange(len(data))
+        self.values = {}
+        for column, field in enumerate(FIELDS, start=2):
+            raw = data[:, column]
+            last_set = np.maximum.accumulate(np.where(np.isnan(raw), 0, positions)) if len(data) else positions
+            self.values[field] = raw[last_set]
+        self.values['price_cents'][self.values['price_cents'] == UNKNOWN_PRICE] = np.nan
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def _state_rows(self, at=None):
+        # Index of each book's last row at or before `at` (Unix time); books not seen by then have none
+        selected = np.flatnonzero(self.times <= at) if at is not None else np.arange(len(self))
+        ids = self.book_ids[selected]
+        return selected[np.r_[ids[1:] != ids[:-1], True]] if len(selected) else selected
+
+    def state(self, at=None):
+        """Per-field arrays indexed by book id (NaN where the book was not yet seen) as of `at`."""
+        last = self._state_rows(at)
+        ids = self.book_ids[last]
+        state = {}
+        for field, values in self.values.items():
+            column = np.full(len(self.urls), np.nan)
+            column[ids] = values[last]
+            state[field] = column
+        return state
+
+    def snapshot(self, at=None):
+        """The catalogue as of `at` (latest when None): url, price, stock, rating."""
+        last = self._state_rows(at)
+        return pd.DataFrame({
+            'url': self.urls[self.book_ids[last]],
+            'price': self.values['price_cents'][last] / 100,
+            'stock': self.values['stock'][last].astype(np.int64),
+            'rating': self.values['rating'][last].astype(np.int8),
+        })
+
+    def changes(self, since, until=None, field='price'):
+        """Books whose `field` (price, stock or rating) differs between `since` and `until` (latest when None).
+
+        Books first seen after `since` are not changes and are left out.
+        """
+        key = 'price_cents' if field == 'price' else field
+        before = self.state(since)[key]
+        after = self.state(until)[key]
+        changed = np.flatnonzero(~np.isnan(before) & ~np.isnan(after) & (before != after))
+        scale = 100 if field == 'price' else 1
+        old, new = before[changed] / scale, after[changed] / scale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent = np.where(old != 0, (new - old) / old * 100, np.nan)
+        return pd.DataFrame({'url': self.urls[changed], 'old': old, 'new': new, 'change': new - old,
+                             'percent': percent}).sort_values('percent', key=np.abs, ascending=False,
+                                                              ignore_index=True)
+
+    def book_history(self, url):
+        """The values of one book after each crawl in which it changed."""
+        if url not in self.ids:
+            raise KeyError(f"No history for {url}")
+        book_id = self.ids[url]
+        start, end = np.searchsorted(self.book_ids, [book_id, book_id + 1])
+        return pd.DataFrame({
+            'crawled_at': pd.to_datetime(self.times[start:end], unit='s'),
+            'price': self.values['price_cents'][start:end] / 100,
+            'stock': self.values['stock'][start:end].astype(np.int64),
+            'rating': self.values['rating'][start:end].astype(np.int8),
+        })
+
+def _timestamp(text):
+    return datetime.fromisoformat(text).timestamp()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the price, stock and rating history of crawled books.")
+    parser.add_argument("--db", default="books.db")
+    parser.add_argument("--since", help="list changes since this ISO date or time")
+    parser.add_argument("--until", help="end of the --since window (default: latest crawl)")
+    parser.add_argument("--field", choices=['price', 'stock', 'rating'], default='price')
+    parser.add_argument("--at", help="show the catalogue as of this ISO date or time")
+    parser.add_argument("--url", help="show the history of one book")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--record", metavar="CSV", help="record the books of a scraped CSV as a new crawl")
+    args = parser.parse_args()
+
+    if args.record:
+        import csv
+        with open(args.record, newline='', encoding='utf-8') as csvfile:
+            changed = record_crawl(csv.DictReader(csvfile), args.db)
+        print(f"Crawl recorded: {changed} new or changed book(s)")
+
+    start = time.perf_counter()
+    try:
+        history = HistoryArrays(args.db)
+    except sqlite3.OperationalError as e:
+        parser.error(f"cannot read {args.db}: {e}")
+    print(f"{len(history)} history rows over {len(history.crawl_times)} crawl(s) and {len(history.ids)} "
+          f"book(s), loaded in {time.perf_counter() - start:.3f}s")
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_colwidth', 80)
+    if args.since:
+        until = _timestamp(args.until) if args.until else None
+        changes = history.changes(_timestamp(args.since), until, args.field)
+        print(f"\n{len(changes)} {args.field} change(s) since {args.since}:")
+        print(changes.head(args.limit).round(2).to_string())
+    if args.at:
+        snapshot = history.snapshot(_timestamp(args.at))
+        print(f"\n{len(snapshot)} book(s) as of {args.at}:")
+        print(snapshot.head(args.limit).to_string())
+    if args.url:
+        print(history.book_history(args.url).to_string())
@@ -0,0 +1,172 @@
+import argparse
+import sqlite3
+import time
+
+QUERIES = {}
+INTERMEDIATES = {}
+
+class Query:
+    def __init__(self, number, name, func, needs, out_of_core=False):
+        self.number = number
+        self.name = name
+        self.func = func
+        self.needs = needs
+        self.out_of_core = out_of_core
+
+def query(number, name, needs=(), out_of_core=False):
+    """Registers a query function taking a QueryContext.
+
+    `needs` names the shared intermediates the query reads, so the planner
+    can compute them once up front for every selected query. Queries marked
+    `out_of_core` read only their intermediates, never ctx.df, so they can
+    also run from intermediates computed without loading the DataFrame.
+    """
+    def register(func):
+        QUERIES[name] = Query(number, name, func, tuple(needs), out_of_core)
+        return func
+    return register
+
+def intermediate(name, needs=()):
+    """Registers a shared intermediate (a grouped aggregation, mask or derived column)."""
+    def register(func):
+        INTERMEDIATES[name] = (func, tuple(needs))
+        return func
+    return register
+
+class QueryContext:
+    """Holds the DataFrame and every intermediate computed so far, e.g. ctx.category_price.
+
+    `values` supplies intermediates computed elsewhere; with them `df` may be None.
+    """
+
+    def __init__(self, df, values=None, timings=None):
+        self.df = df
+        self.values = dict(values or {})
+        self.timings = dict(timings or {})
+
+    def compute(self, name):
+        if name not in self.values:
+            func, needs = INTERMEDIATES[name]
+            for dependency in needs:
+                self.compute(dependency)
+            start = time.perf_counter()
+            self.values[name] = func(self)
+            self.timings[name] = time.perf_counter() - start
+        return self.values[name]
+
+    def __getattr__(self, name):
+        if name in INTERMEDIATES:
+            return self.compute(name)
+        raise AttributeError(name)
+
+def select(names=None, out_of_core=False):
+    """Returns the registered queries matching names or numbers (all of them by default), in order.
+
+    With out_of_core=True only queries that can run without the DataFrame are allowed.
+    """
+    queries = sorted(QUERIES.values(), key=lambda q: q.number)
+    if not names:
+        return [q for q in queries if q.out_of_core or not out_of_core]
+    by_number = {str(q.number): q for q in queries}
+    selected = []
+    for name in names:
+        if name in QUERIES:
+            selected.append(QUERIES[name])
+        elif name in by_number:
+            selected.append(by_number[name])
+        else:
+            raise KeyError(f"Unknown query {name!r}, use --list to see the available queries")
+        if out_of_core and not selected[-1].out_of_core:
+            raise KeyError(f"Query {name!r} needs the whole DataFrame, use --list to see the out-of-core ones")
+    return sorted(set(selected), key=lambda q: q.number)
+
+def plan(queries):
+    """Returns the shared intermediates needed by the queries, dependencies first, each listed once."""
+    ordered = []
+
+    def visit(name):
+        if name in ordered:
+            return
+        for dependency in INTERMEDIATES[name][1]:
+            visit(dependency)
+        ordered.append(name)
+
+    for q in queries:
+        for name in q.needs:
+            visit(name)
+    return ordered
+
+def run_queries(df, names=None, values=None, timings=None):
+    """Runs the selected queries, computing their shared intermediates first.
+
+    `values` and `timings` pass in intermediates computed without `df`
+    (see the out-of-core mode of main). Returns (intermediate timings,
+    per-query timings) in seconds.
+    """
+    queries = select(names, out_of_core=df is None)
+    ctx = QueryContext(df, values, timings)
+    for name in plan(queries):
+        ctx.compute(name)
+    query_timings = {}
+    for q in queries:
+        start = time.perf_counter()
+        q.func(ctx)
+        query_timings[q.name] = time.perf_counter() - start
+    return ctx.timings, query_timings
+
+def print_timings(intermediate_timings, query_timings):
+    print("\nShared intermediates:")
+    for name, seconds in intermediate_timings.items():
+        print(f"  {name:<32} {seconds * 1000:9.3f} ms")
+    print("Queries:")
+    for name, seconds in query_timings.items():
+        print(f"  {QUERIES[name].number:>2}. {name:<28} {seconds * 1000:9.3f} ms")
+    total = sum(intermediate_timings.values()) + sum(query_timings.values())
+    print(f"Total: {total * 1000:.3f} ms")
+
+def main(load, argv=None, load_values=None):
+    """Command line entry point; `load` is called with the CSV path and returns the DataFrame.
+
+    With `load_values`, --db and --chunksize run the out-of-core queries
+    instead: load_values(csv, db, chunksize) returns their intermediates
+    without loading the whole DataFrame.
+    """
+    parser = argparse.ArgumentParser(description="Run the book queries, all of them or a subset by name or number.")
+    parser.add_argument("queries", nargs="*", help="query names or numbers (default: all)")
+    parser.add_argument("--csv", default="books.csv")
+    parser.add_argument("--list", action="store_true", help="list the available queries and exit")
+    parser.add_argument("--timing", action="store_true", help="report time spent per query and intermediate")
+    if load_values:
+        parser.add_argument("--db", help="run the out-of-core queries inside this SQLite database")
+        parser.add_argument("--chunksize", type=int,
+                            help="run the out-of-core queries over the CSV this many rows at a time")
+    args = parser.parse_args(argv)
+    out_of_core = bool(load_values and (args.db or args.chunksize))
+
+    if args.list:
+        for q in select():
+            needs = f"  (uses {', '.join(q.needs)})" if q.needs else ""
+            mode = "  [out-of-core]" if load_values and q.out_of_core else ""
+            print(f"{q.number:>2}. {q.name}{needs}{mode}")
+        return
+    try:
+        queries = select(args.queries, out_of_core)
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    names = [q.name for q in queries]
+    if out_of_core:
+        start = time.perf_counter()
+        try:
+            values = load_values(args.csv, args.db, args.chunksize)
+        except sqlite3.OperationalError as e:
+            parser.error(f"cannot read {args.db}: {e}")
+        timings = {name: time.perf_counter() - start for name in values}
+        print(f"Aggregated {'in ' + args.db if args.db else args.csv + ' in chunks'}.\n" + "="*50)
+        intermediate_timings, query_timings = run_queries(None, names, values, timings)
+    else:
+        df = load(args.csv)
+        print("Data loaded and cleaned successfully.\n" + "="*50)
+        intermediate_timings, query_timings = run_queries(df, names)
+    if args.timing:
+        print_timings(intermediate_timings, query_timings)
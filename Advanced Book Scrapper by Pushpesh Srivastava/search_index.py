@@ -0,0 +1,116 @@
+import re
+import sqlite3
+
+import books_schema
+
+_TERM = re.compile(r'\w+')
+
+def build_match(text, prefix=True):
+    """Turns free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    'python prog' -> '"python" "prog"*'. Words are quoted so FTS5 operators
+    and punctuation in the input are taken literally.
+    """
+    terms = _TERM.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if prefix:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+class BookSearch:
+    """Keyword search over the title and description of the books in books.db.
+
+    The books_fts index (see books_schema.SEARCH_SCHEMA) is maintained by
+    triggers, so every book the scraper inserts or updates is searchable
+    immediately. Results are ranked by BM25 with title matches weighted
+    `title_weight` times a description match.
+    """
+
+    def __init__(self, dbname="books.db", title_weight=10.0, writable=False):
+        # Searching only reads; rebuild() needs writable=True
+        self.conn = books_schema.connect(dbname) if writable else books_schema.connect_read_only(dbname)
+        self.title_weight = title_weight
+
+    def search(self, text, limit=10, prefix=True, raw=False):
+        """Returns the best matching books as dictionaries, best first.
+
+        With raw=True `text` is passed to FTS5 unchanged, allowing its full
+        syntax (OR, NOT, NEAR, column filters such as 'title:python').
+        """
+        match = text if raw else build_match(text, prefix)
+        if not match:
+            return []
+        rows = self.conn.execute('''
+            SELECT b.id, b.title, b.price, b.rating, b.category, b.url,
+                   bm25(books_fts, ?, 1.0) AS score,
+                   snippet(books_fts, 1, '[', ']', '...', 12) AS snippet
+            FROM books_fts JOIN books_view b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        ''', (self.title_weight, match, limit)).fetchall()
+        keys = ('id', 'title', 'price', 'rating', 'category', 'url', 'score', 'snippet')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count(self, text, prefix=True, raw=False):
+        match = text if raw else build_match(text, prefix)
+        if not match:
+            return 0
+        return self.conn.execute("SELECT count(*) FROM books_fts WHERE books_fts MATCH ?", (match,)).fetchone()[0]
+
+    def rebuild(self):
+        """Re-indexes every book, e.g. after editing books.db with another tool while the triggers were absent."""
+        with self.conn:
+            self.conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+            self.conn.execute("INSERT INTO books_fts (books_fts) VALUES ('optimize')")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def search_books(text, limit=10, dbname="books.db", **options):
+    """One-off search; keep a BookSearch open for repeated lookups."""
+    with BookSearch(dbname) as index:
+        return index.search(text, limit, **options)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Search book titles and descriptions in books.db.")
+    parser.add_argument("query", nargs="*", help="keywords; the last one also matches as a prefix")
+    parser.add_argument("--db", default="books.db")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--exact", action="store_true", help="no prefix matching on the last keyword")
+    parser.add_argument("--raw", action="store_true", help="pass the query to FTS5 unchanged")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index before searching")
+    args = parser.parse_args()
+
+    try:
+        index = BookSearch(args.db, writable=args.rebuild)
+    except sqlite3.OperationalError as e:
+        parser.error(f"cannot open {args.db}: {e}")
+    with index:
+        if args.rebuild:
+            index.rebuild()
+        if args.query:
+            text = ' '.join(args.query)
+            start = time.perf_counter()
+            try:
+                results = index.search(text, args.limit, prefix=not args.exact, raw=args.raw)
+                total = index.count(text, prefix=not args.exact, raw=args.raw)
+            except sqlite3.OperationalError as e:
+                parser.error(f"invalid FTS5 query {text!r}: {e}" if args.raw else str(e))
+            elapsed = time.perf_counter() - start
+            for book in results:
+                price = books_schema.format_price(book['price']) or '-'
+                print(f"{book['score']:8.2f}  {book['title']} ({book['category']}, {price})")
+                print(f"          {book['snippet']}")
+            print(f"{len(results)} of {total} matching books in {elapsed * 1000:.2f} ms")
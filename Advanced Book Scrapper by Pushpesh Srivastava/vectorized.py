@@ -0,0 +1,51 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+_WORD = re.compile(r'\w+')  # same tokens as r'\b\w+\b'
+
+def top_k_per_group(df, group, column, k):
+    """Rows with the k largest `column` values in each `group`, without a per-group apply.
+
+    Equivalent to df.groupby(group).apply(lambda x: x.nlargest(k, column)).droplevel(0):
+    groups in sorted order, values descending, ties kept in their original order.
+    Only the two key columns are sorted (one stable lexsort); the k rows per
+    group are found from each row's offset within its group run.
+    """
+    df = df[df[column].notna()]
+    if isinstance(df[group].dtype, pd.CategoricalDtype):
+        codes = df[group].cat.codes.to_numpy()
+    else:
+        codes, _ = pd.factorize(df[group], sort=True)
+    order = np.lexsort((-df[column].to_numpy(dtype=float), codes))
+    order = order[codes[order] >= 0]  # groupby drops missing groups
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    offsets = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return df.iloc[order[offsets < k]]
+
+def threshold_counts(values, thresholds):
+    """Number of values strictly greater than each threshold, from one sort and a binary search.
+
+    Equivalent to [len(values[values > t]) for t in thresholds]; NaN never counts.
+    """
+    values = np.asarray(values, dtype=float)
+    ordered = np.sort(values[~np.isnan(values)])
+    return len(ordered) - np.searchsorted(ordered, np.asarray(thresholds, dtype=float), side='right')
+
+def word_frequencies(texts):
+    """Lower-cased word counts over all texts, in order of first appearance.
+
+    The texts are joined with Series.str.cat and tokenized with one regex
+    pass; counting is a factorize + bincount instead of a Counter.
+    """
+    words = _WORD.findall(pd.Series(texts).str.cat(sep=' ').lower())
+    codes, uniques = pd.factorize(np.array(words, dtype=object))
+    return pd.Series(np.bincount(codes, minlength=len(uniques)), index=uniques)
+
+def most_common_word(texts):
+    """(word, count) of the most frequent word, ties going to the word seen first, like Counter.most_common(1)."""
+    counts = word_frequencies(texts)
+    position = int(counts.to_numpy().argmax())
+    return counts.index[position], int(counts.iloc[position])
@@ -1,40 +1,86 @@
-import sqlite3
-import csv
-
-def add_question():
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-    question = input("Enter question: ")
-    options = [input(f"Option {i+1}: ") for i in range(4)]
-    answer = input("Enter correct option (1-4): ")
-    c.execute("INSERT INTO quiz VALUES (?, ?, ?, ?, ?, ?)", (question, *options, answer))
-    conn.commit()
-    conn.close()
-    print("Question added successfully.")
-
-def import_questions_from_csv(filename='quiz.csv'):
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-    with open(filename, newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if len(row) == 6:
-                c.execute("INSERT INTO quiz VALUES (?, ?, ?, ?, ?, ?)", tuple(row))
-    conn.commit()
-    conn.close()
-    print("Questions imported from CSV.")
-
-def view_users():
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-    for row in c.execute("SELECT username, role, status FROM login"):
-        print(row)
-    conn.close()
-
-def block_user(username):
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-    c.execute("UPDATE login SET status='blocked' WHERE username=?", (username,))
-    conn.commit()
-    conn.close()
-    print(f"User '{username}' has been blocked.")
\ No newline at end of file
+from auth import invalidate_user
+from question_bank import INSERT_QUESTION, import_questions, question_hash, resolve_answer
+from question_sampler import bank_cache, bump_bank_version
+from repository import transaction
+from user_admin import export_users, import_users, list_users, set_status_bulk, timed
+
+def create_question(question, options, answer, category=None, difficulty=None):
+    # Returns True if added, False if the question is already in the quiz; raises ValueError if invalid
+    question, options = question.strip(), [option.strip() for option in options]
+    if not question or len(options) != 4 or not all(options):
+        raise ValueError("A question needs its text and 4 non-empty options.")
+    answer = resolve_answer(str(answer), options)
+    if answer is None:
+        raise ValueError("The answer must be 1-4 or the text of one of the options.")
+    with transaction() as conn:
+        added = conn.execute(INSERT_QUESTION, (question, *options, answer, None, None, None, category, difficulty,
+                                               question_hash(question, options))).rowcount > 0
+        if added:
+            bump_bank_version(conn)
+    if added:
+        bank_cache.invalidate()
+    return added
+
+def add_question():
+    question = input("Enter question: ")
+    options = [input(f"Option {i+1}: ") for i in range(4)]
+    answer = input("Enter correct option (1-4): ")
+    try:
+        added = create_question(question, options, answer)
+    except ValueError as e:
+        print(e)
+        return
+    print("Question added successfully." if added else "This question is already in the quiz.")
+
+def import_questions_from_csv(filename='quiz.csv'):
+    try:
+        report = import_questions(filename)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return
+    print(f"Questions imported from CSV: {report}.")
+    for line, reason in report.errors:
+        print(f"  line {line}: {reason}")
+
+def view_users(page_size=20):
+    after = None
+    while True:
+        rows = list_users(after=after, limit=page_size)
+        for row in rows:
+            print(row)
+        if len(rows) < page_size or input("Enter for more, q to stop: ").strip().lower() == 'q':
+            break
+        after = rows[-1][0]
+
+def set_user_status(username, status):
+    # Returns False if there is no such user
+    with transaction() as conn:
+        changed = conn.execute("UPDATE login SET status=? WHERE username=?", (status, username)).rowcount > 0
+    invalidate_user(username)
+    return changed
+
+def block_user(username):
+    set_user_status(username, 'blocked')
+    print(f"User '{username}' has been blocked.")
+
+def import_users_from_csv(filename='users.csv'):
+    try:
+        report = timed(f"Imported {filename}", import_users, filename)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return
+    print(f"Users imported from CSV: {report}.")
+    for line, reason in report.errors:
+        print(f"  line {line}: {reason}")
+
+def export_users_to_csv(filename='users.csv'):
+    try:
+        count = timed(f"Exported to {filename}", export_users, filename)
+    except OSError as e:
+        print(f"Export failed: {e}")
+        return
+    print(f"{count} user(s) written.")
+
+def set_status_by_pattern(pattern, status):
+    changed = timed(f"Set status {status}", set_status_bulk, status, pattern=pattern)
+    print(f"{len(changed)} user(s) matching '{pattern}' are now {status}.")
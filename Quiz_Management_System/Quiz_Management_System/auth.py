@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from repository import query_one, transaction
+
+# Password hashes are stored as "scrypt$n$r$p$salt$hash" or
+# "pbkdf2_sha256$iterations$salt$hash" (salt and hash base64). The cost can
+# be tuned with QUIZ_SCRYPT_N; stored hashes below the current cost are
+# upgraded on the next successful login.
+SCRYPT_N = int(os.environ.get('QUIZ_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(os.environ.get('QUIZ_PBKDF2_ITERATIONS', 600_000))
+DEFAULT_SCHEME = 'scrypt'
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+CACHE_SIZE = 10_000
+ACCOUNT_TTL = 30.0
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+def hash_password(password, scheme=DEFAULT_SCHEME, cost=None):
+    salt = os.urandom(SALT_BYTES)
+    if scheme == 'scrypt':
+        n = cost or SCRYPT_N
+        key = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=SCRYPT_R, p=SCRYPT_P,
+                             maxmem=256 * n * SCRYPT_R, dklen=KEY_BYTES)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+    if scheme == 'pbkdf2_sha256':
+        iterations = cost or PBKDF2_ITERATIONS
+        key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations, KEY_BYTES)
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(key)}"
+    raise ValueError(f"Unknown password scheme: {scheme}")
+
+def is_hashed(stored):
+    return stored is not None and stored.startswith(('scrypt$', 'pbkdf2_sha256$'))
+
+def verify_password(password, stored):
+    if stored is None:
+        return False
+    if not is_hashed(stored):
+        # A plaintext password from before hashing was introduced
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    scheme, *params = stored.split('$')
+    if scheme == 'scrypt':
+        n, r, p, salt, expected = params
+        n, r, p = int(n), int(r), int(p)
+        key = hashlib.scrypt(password.encode('utf-8'), salt=base64.b64decode(salt), n=n, r=r, p=p,
+                             maxmem=256 * n * r, dklen=KEY_BYTES)
+    else:
+        iterations, salt, expected = params
+        key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), base64.b64decode(salt), int(iterations), KEY_BYTES)
+    return hmac.compare_digest(key, base64.b64decode(expected))
+
+def needs_rehash(stored):
+    if not is_hashed(stored):
+        return True
+    scheme, cost = stored.split('$')[:2]
+    if scheme == 'scrypt':
+        return int(cost) < SCRYPT_N
+    return DEFAULT_SCHEME != scheme or int(cost) < PBKDF2_ITERATIONS
+
+def migrate_passwords(conn):
+    # Hashes every plaintext password left in the login table
+    rows = conn.execute("SELECT username, password FROM login "
+                        "WHERE password NOT LIKE 'scrypt$%' AND password NOT LIKE 'pbkdf2_sha256$%'").fetchall()
+    updates = [(hash_password(password), username) for username, password in rows]
+    conn.executemany("UPDATE login SET password=? WHERE username=?", updates)
+    return len(updates)
+
+class LRUCache:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class Authenticator:
+    # Login checks with two bounded caches in front of the login table:
+    # accounts maps username -> (role, status, stored hash), refreshed after
+    # ACCOUNT_TTL seconds or when an admin changes the user; verified holds a
+    # keyed digest (secret to this process) of each username/password pair
+    # that matched a stored hash, so repeat logins skip the slow hash.
+
+    def __init__(self, size=CACHE_SIZE, ttl=ACCOUNT_TTL):
+        self.ttl = ttl
+        self.accounts = LRUCache(size)
+        self.verified = LRUCache(size)
+        self._secret = secrets.token_bytes(32)
+
+    def _account(self, username):
+        cached = self.accounts.get(username)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        row = query_one("SELECT role, status, password FROM login WHERE username=?", (username,))
+        if row is not None:
+            self.accounts.put(username, (time.monotonic(), row))
+        return row
+
+    def authenticate(self, username, password):
+        # (role, status) when the password is right, otherwise None
+        account = self._account(username)
+        if account is None:
+            return None
+        role, status, stored = account
+        key = hmac.digest(self._secret, f"{username}\0{password}".encode('utf-8'), 'sha256')
+        if self.verified.get(key) != stored:
+            if not verify_password(password, stored):
+                return None
+            if needs_rehash(stored):
+                # Only replace the hash just verified: a password changed meanwhile must not be overwritten
+                rehashed = hash_password(password)
+                with transaction() as conn:
+                    changed = conn.execute("UPDATE login SET password=? WHERE username=? AND password=?",
+                                           (rehashed, username, stored)).rowcount
+                if changed:
+                    stored = rehashed
+                    self.accounts.put(username, (time.monotonic(), (role, status, stored)))
+                else:
+                    self.accounts.pop(username)
+            self.verified.put(key, stored)
+        return role, status
+
+    def account(self, username):
+        # (role, status) of an existing user, at most ttl seconds old, otherwise None
+        account = self._account(username)
+        return account[:2] if account is not None else None
+
+    def invalidate(self, username=None):
+        # Forget cached account data, e.g. after a user is blocked or their password changes
+        if username is None:
+            self.accounts.clear()
+            self.verified.clear()
+        else:
+            self.accounts.pop(username)
+
+authenticator = Authenticator()
+
+def authenticate(username, password):
+    return authenticator.authenticate(username, password)
+
+def current_account(username):
+    return authenticator.account(username)
+
+def invalidate_user(username=None):
+    authenticator.invalidate(username)
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import repository
+from db_setup import initialize_db
+from leaderboard import apply_score, leaderboard_page, rank_of_user, rebuild_best_scores, top_scores
+from auth import authenticate, hash_password, verify_password
+from question_bank import import_questions
+from question_sampler import QuizAttempt, bank_cache
+from result_writer import ResultWriter
+
+# The previous data access: a fresh connection per operation
+
+def authenticate_connect_per_call(db_path, username, password):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT role, status FROM login WHERE username=? AND password=?", (username, password))
+    result = c.fetchone()
+    conn.close()
+    return result
+
+def top_scores_connect_per_call(db_path, limit=10, offset=0):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    rows = c.execute("SELECT username, score FROM leaderboard ORDER BY score DESC LIMIT ? OFFSET ?",
+                     (limit, offset)).fetchall()
+    conn.close()
+    return rows
+
+def rank_connect_per_call(db_path, username):
+    # Without best_scores, a rank means grouping every attempt
+    conn = sqlite3.connect(db_path)
+    rank = conn.execute("SELECT 1 + COUNT(*) FROM (SELECT MAX(score) AS best FROM leaderboard GROUP BY username) "
+                        "WHERE best > (SELECT MAX(score) FROM leaderboard WHERE username=?)", (username,)).fetchone()
+    conn.close()
+    return rank
+
+PASSWORD = 'secret'
+
+def seed(users, attempts):
+    # Every user shares one password hash, so seeding does not pay for a slow hash per user
+    rng = random.Random(0)
+    stored = hash_password(PASSWORD)
+    with repository.transaction() as conn:
+        conn.executemany("INSERT OR IGNORE INTO login VALUES (?, ?, 'user', 'active')",
+                         [(f"player{i}", stored) for i in range(users)])
+        conn.executemany("INSERT INTO leaderboard VALUES (?, ?)",
+                         [(f"player{rng.randrange(users)}", rng.randrange(0, 101)) for _ in range(attempts)])
+        rebuild_best_scores(conn)
+
+def write_question_csv(path, rows, duplicate_every=10):
+    # Every duplicate_every-th question repeats an earlier one
+    rng = random.Random(2)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['qno', 'Question', 'Option1', 'Option2', 'Option3', 'Option4', 'CorrectAnswer', 'hint', 'explanation'])
+        for i in range(rows):
+            n = rng.randrange(i) if i and i % duplicate_every == 0 else i
+            options = [f"answer {n}-{k}" for k in range(4)]
+            writer.writerow([i + 1, f"Question number {n}?", *options, options[n % 4], '', f"Explanation {n}"])
+
+def submissions_per_second(submit, threads, per_thread):
+    # Quiz results submitted from many threads at once, each waiting until its result is stored
+    def worker(t):
+        for i in range(per_thread):
+            submit(f"player{t * per_thread + i}", i % 11, [(q, 1, True) for q in range(10)])
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return threads * per_thread / (time.perf_counter() - start)
+
+def ops_per_second(func, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login and leaderboard operations per second, before and after pooling.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--attempts", type=int, default=100_000)
+    parser.add_argument("--import-rows", type=int, default=0, help="also time a bulk import of this many CSV questions")
+    parser.add_argument("--login-users", type=int, default=200, help="users logging in repeatedly")
+    parser.add_argument("--submitters", type=int, default=16, help="threads submitting quiz results at once")
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of each measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        repository.configure(db_path)
+        initialize_db()
+        seed(args.users, args.attempts)
+
+        rng = random.Random(1)
+
+        def credentials():
+            return f"player{rng.randrange(args.users)}", PASSWORD
+
+        # Logins come from a set of recurring users, whose first login derives the hash
+        def recurring_credentials():
+            return f"player{rng.randrange(args.login_users)}", PASSWORD
+
+        for i in range(args.login_users):
+            authenticate(f"player{i}", PASSWORD)
+
+        cases = [
+            ("login", lambda: authenticate_connect_per_call(db_path, *recurring_credentials()),
+             lambda: authenticate(*recurring_credentials())),
+            ("leaderboard top 10", lambda: top_scores_connect_per_call(db_path), lambda: top_scores()),
+            ("leaderboard page 50", lambda: top_scores_connect_per_call(db_path, 10, 490),
+             lambda: leaderboard_page(10, after=top_scores(500)[-1])),
+            ("rank of user", lambda: rank_connect_per_call(db_path, credentials()[0]),
+             lambda: rank_of_user(credentials()[0])),
+        ]
+        print(f"{'operation':<20} {'connect/op':>12} {'pooled':>12} {'speedup':>8}")
+        for name, before, after in cases:
+            before_rate = ops_per_second(before, args.seconds)
+            after_rate = ops_per_second(after, args.seconds)
+            print(f"{name:<20} {before_rate:>10.0f}/s {after_rate:>10.0f}/s {after_rate / before_rate:>7.1f}x")
+
+        # A login that is not cached derives the password hash
+        for scheme in ('scrypt', 'pbkdf2_sha256'):
+            stored = hash_password(PASSWORD, scheme)
+            rate = ops_per_second(lambda: verify_password(PASSWORD, stored), args.seconds)
+            print(f"{'verify ' + scheme:<20} {rate:>23.1f}/s  ({stored.split('$')[1]} cost)")
+
+        # Each result in its own durable transaction, against the write-behind batches
+        def record_durably(user, score, responses):
+            with repository.transaction(durable=True) as conn:
+                apply_score(conn, user, score)
+
+        per_thread = 200
+        before_rate = submissions_per_second(record_durably, args.submitters, per_thread)
+        writer = ResultWriter()
+        after_rate = submissions_per_second(lambda user, score, responses: writer.submit(user, score, 10, responses).result(),
+                                            args.submitters, per_thread)
+        writer.close()
+        metrics = writer.metrics()
+        print(f"{'submit result':<20} {before_rate:>10.0f}/s {after_rate:>10.0f}/s {after_rate / before_rate:>7.1f}x"
+              f"  ({metrics['batches']} batches, flush avg {metrics['avg_flush_ms']:.1f}ms)")
+
+        if args.import_rows:
+            csv_path = os.path.join(tmp, "questions.csv")
+            write_question_csv(csv_path, args.import_rows)
+            start = time.perf_counter()
+            report = import_questions(csv_path)
+            elapsed = time.perf_counter() - start
+            print(f"import {args.import_rows} questions: {report} in {elapsed:.2f}s "
+                  f"({args.import_rows / elapsed:.0f} rows/s)")
+
+            # Starting a quiz: the whole bank read per quiz before, now 10 questions from the shared snapshot
+            start = time.perf_counter()
+            everything = repository.query("SELECT * FROM quiz")
+            load_all = time.perf_counter() - start
+            del everything
+            bank_cache.snapshot()  # the bank is loaded once per process and shared by every attempt
+            sample_rate = ops_per_second(lambda: QuizAttempt().all_questions(), args.seconds)
+            print(f"start quiz: load whole bank {load_all * 1000:.0f}ms, sample 10 questions {1000 / sample_rate:.2f}ms")
+        repository.get_repository().close()
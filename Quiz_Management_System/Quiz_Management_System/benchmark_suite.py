@@ -0,0 +1,207 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+import benchmark_harness
+import repository
+from auth import authenticate, hash_password, verify_password
+from benchmark_harness import Benchmark
+from db_setup import initialize_db
+from leaderboard import leaderboard_page, rank_of_user, rebuild_best_scores, top_scores
+from question_bank import import_rows
+from question_sampler import QuizAttempt
+from quiz_analytics import rebuild_analytics
+from result_writer import ResultWriter
+from user_admin import import_user_rows, list_users
+
+# Usage:
+#   python benchmark_suite.py --users 10000 --questions 10000 --attempts 50000 --output before.json
+#   python benchmark_suite.py --compare before.json --max-regression 0.2
+#   python benchmark_suite.py start_quiz submit_results --memory --profile 10
+#
+# Every case runs against a throwaway database filled with generated users,
+# questions and attempts (the same for the same seed), so runs with the same
+# arguments do the same work and their JSON reports can be compared.
+# benchmark_db.py compares the current code against the earlier designs.
+
+BENCHMARKS = {}
+
+def benchmark(name, unit='items', description=''):
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, unit, description)
+        return setup
+    return register
+
+PASSWORD = 'secret'
+QUESTIONS_PER_QUIZ = 10
+LOGIN_USERS = 200  # recurring users in the login case; each first login derives a hash
+CATEGORIES = ('science', 'history', 'sport', 'art', None)
+DIFFICULTIES = ('easy', 'medium', 'hard', None)
+
+def question_rows(count, prefix='q', seed=0):
+    # CSV rows (header first) of distinct questions, as import_rows and question_bank.py accept them
+    rng = random.Random(seed)
+    yield ['Question', 'Option1', 'Option2', 'Option3', 'Option4', 'CorrectAnswer', 'category', 'difficulty']
+    for i in range(count):
+        options = [f"{prefix} answer {i}-{k}" for k in range(4)]
+        yield [f"{prefix} question number {i}?", *options, str(rng.randint(1, 4)),
+               rng.choice(CATEGORIES) or '', rng.choice(DIFFICULTIES) or '']
+
+def user_rows(count, stored_password, prefix='player'):
+    yield ['username', 'password', 'role', 'status']
+    for i in range(count):
+        yield [f"{prefix}{i}", stored_password, 'user', 'active']
+
+def seed_attempts(conn, attempts, users, question_count, seed=0):
+    # Finished attempts of QUESTIONS_PER_QUIZ answers each, with the leaderboard tables rebuilt to match
+    rng = random.Random(seed)
+    rows, answers = [], []
+    now = time.time()
+    for attempt_id in range(1, attempts + 1):
+        question_ids = rng.sample(range(1, question_count + 1), min(QUESTIONS_PER_QUIZ, question_count))
+        skill = rng.random()
+        responses = [(question_id, rng.randint(1, 4), rng.random() < skill) for question_id in question_ids]
+        score = sum(correct for _, _, correct in responses)
+        rows.append((attempt_id, f"player{rng.randrange(users)}", score, len(responses), now - attempts + attempt_id))
+        answers.extend((attempt_id, question_id, choice, int(correct)) for question_id, choice, correct in responses)
+    conn.executemany("INSERT INTO attempts (id, username, score, total, finished_at) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO attempt_answers VALUES (?, ?, ?, ?)", answers)
+    conn.executemany("INSERT INTO leaderboard VALUES (?, ?)", [(row[1], row[2]) for row in rows])
+    rebuild_best_scores(conn)
+
+class SuiteData:
+    # A temporary quiz database seeded with users (all sharing one password hash,
+    # so seeding does not pay for a slow hash per user), questions and attempts
+
+    def __init__(self, users=10_000, questions=10_000, attempts=20_000, seed=0, operations=1000):
+        self.users = users
+        self.questions = questions
+        self.attempts = attempts
+        self.seed = seed
+        self.operations = operations
+        self.rng = random.Random(seed)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stored_password = hash_password(PASSWORD)
+        self._runs = itertools.count()
+        repository.configure(os.path.join(self.tmp.name, 'bench.db'))
+        initialize_db()
+        import_user_rows(user_rows(users, self.stored_password))
+        import_rows(question_rows(questions, seed=seed))
+        with repository.transaction() as conn:
+            seed_attempts(conn, attempts, users, questions, seed)
+
+    def next_run(self):
+        # A fresh number per call, for cases that must insert new rows every run
+        return next(self._runs)
+
+    def usernames(self, count, among=None):
+        among = min(among or self.users, self.users)
+        return [f"player{self.rng.randrange(among)}" for _ in range(count)]
+
+    def close(self):
+        repository.get_repository().close()
+        self.tmp.cleanup()
+
+@benchmark('login', 'logins', "authenticate recurring users (hash verified once, then cached)")
+def login(data):
+    usernames = data.usernames(data.operations, among=LOGIN_USERS)
+    for username in set(usernames):
+        authenticate(username, PASSWORD)
+    return lambda: [authenticate(username, PASSWORD) for username in usernames], len(usernames)
+
+@benchmark('verify_password', 'hashes', "derive one stored scrypt hash, as a first login does")
+def verify(data):
+    stored = data.stored_password
+    return lambda: [verify_password(PASSWORD, stored) for _ in range(5)], 5
+
+@benchmark('start_quiz', 'quizzes', "sample a quiz and read all of its questions")
+def start_quiz(data):
+    count = max(data.operations // 10, 1)
+    return lambda: [QuizAttempt().all_questions() for _ in range(count)], count
+
+@benchmark('rebuild_analytics', 'attempts', "recompute question and user statistics from every attempt")
+def analytics(data):
+    # Runs before submit_results adds attempts, unless the cases are picked in another order
+    attempts = repository.query_one("SELECT COUNT(*) FROM attempts")[0]
+    return rebuild_analytics, attempts
+
+@benchmark('submit_results', 'results', "write finished attempts through the write-behind queue")
+def submit_results(data):
+    count = data.operations
+    usernames = data.usernames(count)
+    responses = [(question_id, 1, question_id % 2 == 0) for question_id in range(1, QUESTIONS_PER_QUIZ + 1)]
+
+    def run():
+        writer = ResultWriter()
+        try:
+            futures = [writer.submit(username, i % 11, QUESTIONS_PER_QUIZ, responses)
+                       for i, username in enumerate(usernames)]
+            for future in futures:
+                future.result()
+        finally:
+            writer.close()
+    return run, count
+
+@benchmark('leaderboard_top', 'reads', "top 10 (served from memory between scores)")
+def leaderboard_top(data):
+    count = data.operations
+    return lambda: [top_scores() for _ in range(count)], count
+
+@benchmark('leaderboard_page', 'reads', "a page of 10 deep in the leaderboard by keyset")
+def leaderboard_deep_page(data):
+    count = data.operations
+    deep = top_scores(500)
+    after = deep[-1] if deep else None
+    return lambda: [leaderboard_page(10, after=after) for _ in range(count)], count
+
+@benchmark('rank_of_user', 'reads', "rank, best score and attempts of a user")
+def rank(data):
+    usernames = data.usernames(data.operations)
+    return lambda: [rank_of_user(username) for username in usernames], len(usernames)
+
+@benchmark('list_users', 'pages', "page through active users 50 at a time")
+def page_users(data):
+    pages = max(data.operations // 10, 1)
+
+    def run():
+        after = None
+        for _ in range(pages):
+            rows = list_users(status='active', after=after)
+            after = rows[-1][0] if rows else None
+    return run, pages
+
+@benchmark('import_questions', 'rows', "bulk import of new CSV questions")
+def import_questions(data):
+    count = data.questions
+    return lambda: import_rows(question_rows(count, prefix=f"run{data.next_run()}", seed=data.seed)), count
+
+@benchmark('import_users', 'users', "bulk import of new users with already-hashed passwords")
+def import_users(data):
+    count = data.users
+    return lambda: import_user_rows(user_rows(count, data.stored_password, prefix=f"run{data.next_run()}_")), count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the quiz database hot paths on a generated database.")
+    benchmark_harness.add_arguments(parser)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--questions", type=int, default=10_000)
+    parser.add_argument("--attempts", type=int, default=20_000)
+    parser.add_argument("--operations", type=int, default=1000, help="calls per run in the per-operation cases")
+    parser.add_argument("--seed", type=int, default=0)
+    args = benchmark_harness.parse_args(parser, BENCHMARKS)
+
+    if args.list:
+        sys.exit(benchmark_harness.main('quiz', BENCHMARKS, args, None, {}))
+    print("Seeding the benchmark database...", file=sys.stderr)
+    data = SuiteData(args.users, args.questions, args.attempts, args.seed, args.operations)
+    params = {'users': args.users, 'questions': args.questions, 'attempts': args.attempts,
+              'operations': args.operations, 'seed': args.seed}
+    try:
+        status = benchmark_harness.main('quiz', BENCHMARKS, args, data, params)
+    finally:
+        data.close()
+    sys.exit(status)
@@ -1,33 +1,161 @@
-import sqlite3
-
-def initialize_db():
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-
-    # Create login table
-    c.execute('''CREATE TABLE IF NOT EXISTS login (
-                    username TEXT PRIMARY KEY,
-                    password TEXT,
-                    role TEXT,
-                    status TEXT)''')
-
-    # Create quiz table
-    c.execute('''CREATE TABLE IF NOT EXISTS quiz (
-                    question TEXT,
-                    option1 TEXT,
-                    option2 TEXT,
-                    option3 TEXT,
-                    option4 TEXT,
-                    answer TEXT)''')
-
-    # Create leaderboard table
-    c.execute('''CREATE TABLE IF NOT EXISTS leaderboard (
-                    username TEXT,
-                    score INTEGER)''')
-
-    # Insert default users
-    c.execute("INSERT OR IGNORE INTO login VALUES ('admin', 'admin123', 'admin', 'active')")
-    c.execute("INSERT OR IGNORE INTO login VALUES ('user1', 'user123', 'user', 'active')")
-
-    conn.commit()
-    conn.close()
\ No newline at end of file
+from auth import hash_password, migrate_passwords
+from leaderboard import rebuild_best_scores
+from question_bank import question_hash
+from question_sampler import bump_bank_version
+from repository import transaction
+
+DEFAULT_USERS = (('admin', 'admin123', 'admin'), ('user1', 'user123', 'user'))
+
+# Columns added to the quiz table after the first release
+QUIZ_EXTRA_COLUMNS = (('qno', 'INTEGER'), ('hint', 'TEXT'), ('explanation', 'TEXT'),
+                      ('category', 'TEXT'), ('difficulty', 'TEXT'), ('question_hash', 'INTEGER'))
+
+# Question ids are stored in attempt_answers and question_stats, so they must never be
+# renumbered (VACUUM can renumber an implicit rowid) or reused after a delete
+QUIZ_TABLE = '''(
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        question TEXT,
+                        option1 TEXT,
+                        option2 TEXT,
+                        option3 TEXT,
+                        option4 TEXT,
+                        answer TEXT,
+                        qno INTEGER,
+                        hint TEXT,
+                        explanation TEXT,
+                        question_hash INTEGER,
+                        category TEXT,
+                        difficulty TEXT)'''
+
+def initialize_db():
+    with transaction() as c:
+        # Create login table
+        c.execute('''CREATE TABLE IF NOT EXISTS login (
+                        username TEXT PRIMARY KEY,
+                        password TEXT,
+                        role TEXT,
+                        status TEXT)''')
+        # Filtered, paginated user listings (user_admin.list_users) page through these in username order
+        c.execute("CREATE INDEX IF NOT EXISTS login_role_status ON login (role, status, username)")
+        c.execute("CREATE INDEX IF NOT EXISTS login_status ON login (status, username)")
+
+        # Create quiz table
+        c.execute(f"CREATE TABLE IF NOT EXISTS quiz {QUIZ_TABLE}")
+        # One row counting changes to the quiz table; question_sampler reloads its cached bank when it moves
+        c.execute('''CREATE TABLE IF NOT EXISTS bank_version (
+                        id INTEGER PRIMARY KEY CHECK (id = 0),
+                        version INTEGER NOT NULL)''')
+        c.execute("INSERT OR IGNORE INTO bank_version VALUES (0, 0)")
+        migrate_quiz_table(c)
+
+        # Create leaderboard table
+        c.execute('''CREATE TABLE IF NOT EXISTS leaderboard (
+                        username TEXT,
+                        score INTEGER)''')
+
+        # Best score per user and number of users per best score, kept up to date by leaderboard.apply_score
+        rebuild = c.execute("SELECT 1 FROM sqlite_master WHERE name='best_scores'").fetchone() is None
+        c.execute('''CREATE TABLE IF NOT EXISTS best_scores (
+                        username TEXT PRIMARY KEY,
+                        best_score INTEGER,
+                        total_score INTEGER,
+                        attempts INTEGER)''')
+        c.execute("CREATE INDEX IF NOT EXISTS best_scores_rank ON best_scores (best_score DESC, username)")
+        c.execute('''CREATE TABLE IF NOT EXISTS score_counts (
+                        score INTEGER PRIMARY KEY,
+                        users INTEGER)''')
+        # One row counting changes to best_scores; every process's top-scores cache compares against it
+        c.execute('''CREATE TABLE IF NOT EXISTS leaderboard_version (
+                        id INTEGER PRIMARY KEY CHECK (id = 0),
+                        version INTEGER NOT NULL)''')
+        c.execute("INSERT OR IGNORE INTO leaderboard_version VALUES (0, 0)")
+        if rebuild:
+            rebuild_best_scores(c)
+
+        # Finished attempts and each answer given, written in batches by result_writer
+        c.execute('''CREATE TABLE IF NOT EXISTS attempts (
+                        id INTEGER PRIMARY KEY,
+                        username TEXT,
+                        score INTEGER,
+                        total INTEGER,
+                        finished_at REAL)''')
+        c.execute("CREATE INDEX IF NOT EXISTS attempts_username ON attempts (username)")
+        c.execute('''CREATE TABLE IF NOT EXISTS attempt_answers (
+                        attempt_id INTEGER,
+                        question_id INTEGER,
+                        choice INTEGER,
+                        correct INTEGER,
+                        PRIMARY KEY (attempt_id, question_id)) WITHOUT ROWID''')
+        c.execute("CREATE INDEX IF NOT EXISTS attempt_answers_question ON attempt_answers (question_id)")
+
+        # Running sums maintained by quiz_analytics.update_analytics
+        c.execute('''CREATE TABLE IF NOT EXISTS question_stats (
+                        question_id INTEGER PRIMARY KEY,
+                        answered INTEGER,
+                        correct INTEGER,
+                        chose_1 INTEGER,
+                        chose_2 INTEGER,
+                        chose_3 INTEGER,
+                        chose_4 INTEGER,
+                        skipped INTEGER,
+                        rest_n INTEGER,
+                        rest_correct INTEGER,
+                        sum_rest REAL,
+                        sum_rest2 REAL,
+                        sum_correct_rest REAL)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS user_stats (
+                        username TEXT PRIMARY KEY,
+                        attempts INTEGER,
+                        sum_t REAL,
+                        sum_t2 REAL,
+                        sum_y REAL,
+                        sum_y2 REAL,
+                        sum_ty REAL,
+                        last_score REAL,
+                        best_score REAL)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS analytics_state (
+                        name TEXT PRIMARY KEY,
+                        value INTEGER)''')
+
+        # Hash passwords stored in plaintext by earlier versions
+        migrate_passwords(c)
+
+        # Insert default users
+        for username, password, role in DEFAULT_USERS:
+            if c.execute("SELECT 1 FROM login WHERE username=?", (username,)).fetchone() is None:
+                c.execute("INSERT INTO login VALUES (?, ?, ?, 'active')", (username, hash_password(password), role))
+
+def migrate_quiz_table(c):
+    existing = {row[1] for row in c.execute("PRAGMA table_info(quiz)")}
+    for name, kind in QUIZ_EXTRA_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE quiz ADD COLUMN {name} {kind}")
+    if 'id' not in existing:
+        # Copy tables from before the id column, keeping each question's rowid as its id
+        columns = ', '.join(['question', 'option1', 'option2', 'option3', 'option4', 'answer',
+                             *(name for name, _ in QUIZ_EXTRA_COLUMNS)])
+        c.execute(f"CREATE TABLE quiz_with_id {QUIZ_TABLE}")
+        c.execute(f"INSERT INTO quiz_with_id (id, {columns}) SELECT rowid, {columns} FROM quiz")
+        c.execute("DROP TABLE quiz")
+        c.execute("ALTER TABLE quiz_with_id RENAME TO quiz")
+
+    # Hash questions added before the column existed; repeated questions are removed
+    seen = {row[0] for row in c.execute("SELECT question_hash FROM quiz WHERE question_hash IS NOT NULL")}
+    updates, duplicates = [], []
+    rows = c.execute("SELECT id, question, option1, option2, option3, option4 FROM quiz "
+                     "WHERE question_hash IS NULL ORDER BY id").fetchall()
+    for question_id, question, *options in rows:
+        digest = question_hash(question or '', [option or '' for option in options])
+        if digest in seen:
+            duplicates.append((question_id,))
+        else:
+            seen.add(digest)
+            updates.append((digest, question_id))
+    c.executemany("DELETE FROM quiz WHERE id=?", duplicates)
+    c.executemany("UPDATE quiz SET question_hash=? WHERE id=?", updates)
+    if duplicates:
+        bump_bank_version(c)
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS quiz_question_hash ON quiz (question_hash)")
+    # Question ids by category and difficulty
+    c.execute("CREATE INDEX IF NOT EXISTS quiz_category ON quiz (category, difficulty)")
+    c.execute("CREATE INDEX IF NOT EXISTS quiz_difficulty ON quiz (difficulty)")
@@ -1,9 +1,99 @@
-import sqlite3
-
-def show_leaderboard():
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-    print("\nLeaderboard:")
-    for row in c.execute("SELECT username, score FROM leaderboard ORDER BY score DESC LIMIT 10"):
-        print(f"{row[0]}: {row[1]}")
-    conn.close()
\ No newline at end of file
+import threading
+
+from repository import get_repository, query, query_one, read, transaction
+
+TOP_N = 10
+
+# The leaderboard table keeps every attempt; best_scores holds one row per
+# user (indexed on score) and score_counts how many users have each best
+# score, so ranks are counted over the distinct scores instead of all users.
+# Cached top scores are kept with the leaderboard_version they were read at,
+# which apply_score bumps in the same transaction as the scores it changes.
+_top_cache = {}
+_top_cache_lock = threading.Lock()
+
+def invalidate_cache():
+    with _top_cache_lock:
+        _top_cache.clear()
+
+def record_score(username, score):
+    with transaction() as conn:
+        apply_score(conn, username, score)
+    invalidate_cache()
+
+def _bump_version(conn):
+    conn.execute("UPDATE leaderboard_version SET version = version + 1")
+
+def apply_score(conn, username, score):
+    # Adds one attempt inside the caller's transaction; the caller clears the cache after committing
+    conn.execute("INSERT INTO leaderboard VALUES (?, ?)", (username, score))
+    _bump_version(conn)
+    row = conn.execute("SELECT best_score FROM best_scores WHERE username=?", (username,)).fetchone()
+    if row is None:
+        conn.execute("INSERT INTO best_scores VALUES (?, ?, ?, 1)", (username, score, score))
+        _count_score(conn, score, 1)
+    else:
+        best = max(row[0], score)
+        conn.execute("UPDATE best_scores SET best_score=?, total_score=total_score+?, attempts=attempts+1 "
+                     "WHERE username=?", (best, score, username))
+        if best != row[0]:
+            _count_score(conn, row[0], -1)
+            _count_score(conn, best, 1)
+
+def _count_score(conn, score, delta):
+    conn.execute("INSERT INTO score_counts VALUES (?, ?) "
+                 "ON CONFLICT(score) DO UPDATE SET users=users+excluded.users", (score, delta))
+    if delta < 0:
+        conn.execute("DELETE FROM score_counts WHERE score=? AND users<=0", (score,))
+
+def rebuild_best_scores(conn):
+    # Recomputes best_scores and score_counts from the attempts in leaderboard
+    conn.execute("DELETE FROM best_scores")
+    conn.execute("DELETE FROM score_counts")
+    conn.execute("INSERT INTO best_scores SELECT username, MAX(score), SUM(score), COUNT(*) "
+                 "FROM leaderboard GROUP BY username")
+    conn.execute("INSERT INTO score_counts SELECT best_score, COUNT(*) FROM best_scores GROUP BY best_score")
+    _bump_version(conn)
+    invalidate_cache()
+
+def top_scores(limit=TOP_N):
+    # Best score per user, highest first; served from memory while the leaderboard
+    # version is unchanged, including scores recorded by other processes
+    key = (id(get_repository()), limit)
+    with read() as conn:
+        version = conn.execute("SELECT version FROM leaderboard_version").fetchone()[0]
+        with _top_cache_lock:
+            cached = _top_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # Same read transaction as the version, so the rows belong to exactly that version
+        rows = conn.execute("SELECT username, best_score FROM best_scores "
+                            "ORDER BY best_score DESC, username LIMIT ?", (limit,)).fetchall()
+    with _top_cache_lock:
+        cached = _top_cache.get(key)
+        if cached is None or cached[0] < version:  # never replace rows read at a newer version
+            _top_cache[key] = (version, rows)
+    return rows
+
+def leaderboard_page(limit=TOP_N, after=None):
+    # Keyset pagination: pass the last (username, best_score) row of a page to get the next one
+    if after is None:
+        return top_scores(limit)
+    username, score = after
+    return query("SELECT username, best_score FROM best_scores "
+                 "WHERE best_score < ? OR (best_score = ? AND username > ?) "
+                 "ORDER BY best_score DESC, username LIMIT ?", (score, score, username, limit))
+
+def rank_of_user(username):
+    # (rank, best score, attempts), ties sharing a rank, or None if the user never played
+    row = query_one("SELECT best_score, attempts FROM best_scores WHERE username=?", (username,))
+    if row is None:
+        return None
+    best, attempts = row
+    ahead = query_one("SELECT COALESCE(SUM(users), 0) FROM score_counts WHERE score > ?", (best,))[0]
+    return ahead + 1, best, attempts
+
+def show_leaderboard():
+    print("\nLeaderboard:")
+    for row in top_scores():
+        print(f"{row[0]}: {row[1]}")
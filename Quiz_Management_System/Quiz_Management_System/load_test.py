@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import repository
+from auth import hash_password
+from db_setup import initialize_db
+from question_bank import import_questions
+
+# Simulates many people taking the quiz at once against quiz_server.py.
+# Without --url a server is started on a temporary database seeded with
+# --users test accounts and the questions from quiz.csv.
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.token = None
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None, latencies=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        start = time.perf_counter()
+        self.writer.write((head + "\r\n").encode('latin-1') + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length))
+        if latencies is not None:
+            latencies.setdefault(f"{method} {path}", []).append(time.perf_counter() - start)
+        if status != 200:
+            raise RuntimeError(f"{method} {path} -> {status}: {data.get('error')}")
+        return data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def test_taker(host, port, username, password, latencies, rng):
+    client = Client(host, port)
+    try:
+        client.token = (await client.request('POST', '/login', {'username': username, 'password': password}, latencies))['token']
+        questions = (await client.request('GET', '/quiz', latencies=latencies))['questions']
+        answers = {str(q['id']): str(rng.randint(1, 4)) for q in questions}
+        await client.request('POST', '/quiz', {'answers': answers}, latencies)
+        await client.request('GET', '/leaderboard', latencies=latencies)
+        await client.request('GET', '/leaderboard/me', latencies=latencies)
+    finally:
+        client.close()
+
+async def run_load(host, port, users, concurrency):
+    latencies, errors = {}, []
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(0)
+
+    async def one(i):
+        async with semaphore:
+            try:
+                await test_taker(host, port, f"loadtest{i}", f"pass{i}", latencies, rng)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(users)))
+    return latencies, errors, time.perf_counter() - start
+
+async def server_metrics(host, port, username='admin', password='admin123'):
+    client = Client(host, port)
+    try:
+        client.token = (await client.request('POST', '/login', {'username': username, 'password': password}))['token']
+        return await client.request('GET', '/admin/metrics')
+    finally:
+        client.close()
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+def report(latencies, errors, elapsed):
+    print(f"{'endpoint':<22} {'requests':>9} {'p50':>9} {'p99':>9} {'max':>9}")
+    total = 0
+    for path, values in sorted(latencies.items()):
+        values.sort()
+        total += len(values)
+        print(f"{path:<22} {len(values):>9} {percentile(values, 50) * 1000:>7.1f}ms "
+              f"{percentile(values, 99) * 1000:>7.1f}ms {values[-1] * 1000:>7.1f}ms")
+    every = sorted(v for values in latencies.values() for v in values)
+    if every:
+        print(f"{'all':<22} {total:>9} {percentile(every, 50) * 1000:>7.1f}ms {percentile(every, 99) * 1000:>7.1f}ms "
+              f"{every[-1] * 1000:>7.1f}ms")
+    print(f"{total / elapsed:.0f} requests/s over {elapsed:.2f}s, {len(errors)} failed test-taker(s)")
+    for error in sorted(set(errors))[:5]:
+        print(f"  {error}")
+
+def seed_database(path, users, questions_csv, scrypt_n):
+    repository.configure(path)
+    initialize_db()
+    with repository.transaction() as conn:
+        conn.executemany("INSERT OR IGNORE INTO login VALUES (?, ?, 'user', 'active')",
+                         [(f"loadtest{i}", hash_password(f"pass{i}", cost=scrypt_n)) for i in range(users)])
+    import_questions(questions_csv)
+    repository.get_repository().close()
+
+def start_server(db_path, workers, scrypt_n):
+    env = dict(os.environ, QUIZ_DB=db_path, QUIZ_SCRYPT_N=str(scrypt_n))
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable, os.path.join(here, 'quiz_server.py'), '--port', '0', '--workers', str(workers)],
+                               env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise SystemExit("The quiz server did not start")
+    return process, urlsplit(line.split()[-1]).port
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the quiz HTTP service with simulated test-takers.")
+    parser.add_argument("--users", type=int, default=2000, help="test-takers, each logs in, takes the quiz and checks the leaderboard")
+    parser.add_argument("--concurrency", type=int, default=1000, help="test-takers active at the same time")
+    parser.add_argument("--url", help="existing server; its users must be loadtest<i> with password pass<i>")
+    parser.add_argument("--workers", type=int, default=repository.POOL_SIZE, help="database threads of the started server")
+    parser.add_argument("--questions", default="quiz.csv")
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 10,
+                        help="password hash cost of the seeded users (lower than production to keep seeding quick)")
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            db_path = os.path.join(tmp, "loadtest.db")
+            seed_database(db_path, args.users, args.questions, args.scrypt_n)
+            process, port = start_server(db_path, args.workers, args.scrypt_n)
+            host = '127.0.0.1'
+        try:
+            latencies, errors, elapsed = asyncio.run(run_load(host, port, args.users, args.concurrency))
+            try:
+                metrics = asyncio.run(server_metrics(host, port))
+            except Exception:
+                metrics = None
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        report(latencies, errors, elapsed)
+        if metrics:
+            print(f"result writer: {metrics['written']} attempts in {metrics['batches']} batches "
+                  f"(avg {metrics['avg_batch']:.1f}), flush avg {metrics['avg_flush_ms']:.1f}ms "
+                  f"max {metrics['max_flush_ms']:.1f}ms, {metrics['errors']} failed batch(es)")
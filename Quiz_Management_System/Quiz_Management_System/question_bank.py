@@ -0,0 +1,166 @@
+import csv
+import hashlib
+import re
+from itertools import chain, islice
+
+from question_sampler import bank_cache, bump_bank_version
+from repository import transaction
+
+BATCH_SIZE = 50_000
+
+# quiz table columns, in the order they are inserted
+QUIZ_COLUMNS = ('question', 'option1', 'option2', 'option3', 'option4', 'answer',
+                'qno', 'hint', 'explanation', 'category', 'difficulty', 'question_hash')
+INSERT_QUESTION = (f"INSERT OR IGNORE INTO quiz ({', '.join(QUIZ_COLUMNS)}) "
+                   f"VALUES ({', '.join('?' * len(QUIZ_COLUMNS))})")
+
+# CSV header names (lowercase, without spaces or underscores) accepted for each column
+HEADER_ALIASES = {
+    'qno': 'qno', 'questionno': 'qno', 'id': 'qno',
+    'question': 'question',
+    'option1': 'option1', 'option2': 'option2', 'option3': 'option3', 'option4': 'option4',
+    'correctanswer': 'answer', 'answer': 'answer',
+    'hint': 'hint',
+    'explanation': 'explanation',
+    'category': 'category', 'topic': 'category',
+    'difficulty': 'difficulty', 'level': 'difficulty',
+}
+REQUIRED = ('question', 'option1', 'option2', 'option3', 'option4', 'answer')
+OPTIONAL = ('qno', 'hint', 'explanation', 'category', 'difficulty')
+# Files without a header row use the original layout: question, 4 options, answer
+LEGACY_LAYOUT = {name: i for i, name in enumerate(REQUIRED)}
+
+def normalize(text):
+    return ' '.join(text.split()).casefold()
+
+def _digest(normalized):
+    # 64-bit integer, which keeps the unique index small enough to insert into quickly
+    digest = hashlib.blake2b('\x1f'.join(normalized).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def question_hash(question, options):
+    # Same question with the same options, ignoring case and spacing
+    return _digest([normalize(part) for part in (question, *options)])
+
+def resolve_answer(answer, options, normalized=None):
+    # Returns the answer as '1'-'4', accepting the option number or the option text
+    answer = answer.strip()
+    if answer in ('1', '2', '3', '4'):
+        return answer
+    wanted = normalize(answer)
+    for i, option in enumerate(normalized or map(normalize, options), start=1):
+        if option == wanted:
+            return str(i)
+    return None
+
+def header_layout(row):
+    columns = {}
+    for i, name in enumerate(row):
+        column = HEADER_ALIASES.get(re.sub(r'[\s_]', '', name.lower()))
+        if column and column not in columns:
+            columns[column] = i
+    if 'question' not in columns:
+        return None
+    missing = [name for name in REQUIRED if name not in columns]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+    return columns
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []  # (line number, reason) of the first invalid rows
+
+    def add_invalid(self, line, reason, keep=20):
+        self.invalid += 1
+        if len(self.errors) < keep:
+            self.errors.append((line, reason))
+
+    def __str__(self):
+        return f"{self.inserted} inserted, {self.skipped} duplicate(s) skipped, {self.invalid} invalid"
+
+def iter_questions(rows, report):
+    # Yields insert parameters for the valid rows; invalid ones are counted in report
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    layout = header_layout(first)
+    line = 1
+    if layout is None:
+        layout = LEGACY_LAYOUT
+        line = 0
+        rows = chain([first], rows)
+    width = max(layout.values()) + 1
+    text_columns = [layout[name] for name in REQUIRED[:5]]
+    answer_column = layout['answer']
+    optional_columns = [layout.get(name) for name in OPTIONAL]
+
+    for row in rows:
+        line += 1
+        if len(row) < width:
+            if not any(field.strip() for field in row):
+                continue
+            row = row + [''] * (width - len(row))
+        question, *options = texts = [row[i].strip() for i in text_columns]
+        if not question:
+            report.add_invalid(line, "empty question")
+            continue
+        if not all(options):
+            report.add_invalid(line, "empty option")
+            continue
+        normalized = [normalize(text) for text in texts]
+        answer = resolve_answer(row[answer_column], options, normalized[1:])
+        if answer is None:
+            report.add_invalid(line, f"answer {row[answer_column].strip()!r} is neither 1-4 nor one of the options")
+            continue
+        qno, *extra = [row[i].strip() if i is not None else '' for i in optional_columns]
+        yield (*texts, answer, int(qno) if qno.isdigit() else None, *(value or None for value in extra),
+               _digest(normalized))
+
+def import_rows(rows, batch_size=BATCH_SIZE):
+    # Streams CSV rows into the quiz table, one transaction per batch. Questions
+    # already in the bank (same question_hash, also within the file) are
+    # skipped by the unique index.
+    report = ImportReport()
+    questions = iter_questions(rows, report)
+    while True:
+        batch = list(islice(questions, batch_size))
+        if not batch:
+            break
+        with transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_QUESTION, batch)
+            inserted = conn.total_changes - before
+            if inserted:
+                bump_bank_version(conn)
+        report.inserted += inserted
+        report.skipped += len(batch) - inserted
+    if report.inserted:
+        bank_cache.invalidate()
+    return report
+
+def import_questions(filename, batch_size=BATCH_SIZE):
+    with open(filename, newline='', encoding='utf-8-sig') as csvfile:
+        return import_rows(csv.reader(csvfile), batch_size)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from db_setup import initialize_db
+
+    parser = argparse.ArgumentParser(description="Bulk import questions from a CSV file into the quiz bank.")
+    parser.add_argument("csv", nargs="?", default="quiz.csv")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    initialize_db()
+    start = time.perf_counter()
+    report = import_questions(args.csv, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"{report} in {elapsed:.2f}s")
+    for line, reason in report.errors:
+        print(f"  line {line}: {reason}")
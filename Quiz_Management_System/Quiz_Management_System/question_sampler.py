@@ -0,0 +1,196 @@
+import random
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from repository import get_repository, read
+
+QUIZ_LENGTH = 10
+VERSION_CHECK_INTERVAL = 1.0  # seconds between checks for questions added by other processes
+
+QUESTION_FIELDS = "id, question, option1, option2, option3, option4, answer, hint, category, difficulty"
+
+class QuizConfig:
+    # count questions in total, of which quotas[(category, difficulty)] come from that group;
+    # None in a quota key matches any category or difficulty
+    def __init__(self, count=QUIZ_LENGTH, quotas=None, shuffle_options=True):
+        self.count = count
+        self.quotas = dict(quotas or {})
+        self.shuffle_options = shuffle_options
+        if sum(self.quotas.values()) > count:
+            raise ValueError("The quotas add up to more questions than the quiz has.")
+
+DEFAULT_CONFIG = QuizConfig()
+
+class Question(namedtuple('Question', QUESTION_FIELDS)):
+    # One question of the bank; a tuple, so it takes no per-instance dict
+    __slots__ = ()
+
+    @property
+    def options(self):
+        return (self.option1, self.option2, self.option3, self.option4)
+
+def bump_bank_version(conn):
+    # Call inside the transaction that changes the quiz table; every process's
+    # bank cache reloads when it next sees the new version
+    conn.execute("UPDATE bank_version SET version = version + 1")
+
+class BankSnapshot:
+    # The whole question bank as it was at one bank version. Never modified after
+    # loading, so any number of attempts and threads can share it.
+
+    __slots__ = ('version', 'questions', '_ids')
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.questions = {}
+        ids = {}
+        intern = sys.intern  # the few category and difficulty names are shared by every question
+        for row in rows:
+            category = intern(row[8]) if row[8] is not None else None
+            difficulty = intern(row[9]) if row[9] is not None else None
+            question = Question(*row[:8], category, difficulty)
+            self.questions[question.id] = question
+            for key in {(None, None), (category, None), (None, difficulty), (category, difficulty)}:
+                ids.setdefault(key, array('q')).append(question.id)
+        self._ids = ids
+
+    def __len__(self):
+        return len(self.questions)
+
+    def ids(self, category=None, difficulty=None):
+        # Question ids in the group; None matches any category or difficulty
+        return self._ids.get((category, difficulty), EMPTY_IDS)
+
+EMPTY_IDS = array('q')
+
+class BankCache:
+    # Process-wide cache of the question bank. Quizzes start from the current
+    # snapshot without touching the database; the one-row bank_version table is
+    # read at most every check_every seconds (at once after invalidate()) and
+    # the bank is reloaded only when that version has changed.
+
+    def __init__(self, check_every=VERSION_CHECK_INTERVAL):
+        self.check_every = check_every
+        self._snapshot = None
+        self._repository = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        fresh = self._repository is get_repository()
+        if snapshot is not None and fresh and time.monotonic() - self._checked < self.check_every:
+            return snapshot
+        with self._lock:
+            # One thread checks and reloads; the others wait and then share its result
+            snapshot = self._snapshot
+            repository = get_repository()
+            if snapshot is None or self._repository is not repository or \
+                    time.monotonic() - self._checked >= self.check_every:
+                with read() as conn:
+                    version = conn.execute("SELECT version FROM bank_version").fetchone()[0]
+                    if snapshot is None or self._repository is not repository or snapshot.version != version:
+                        snapshot = BankSnapshot(version, conn.execute(f"SELECT {QUESTION_FIELDS} FROM quiz"))
+                self._snapshot, self._repository = snapshot, repository
+                self._checked = time.monotonic()
+            return snapshot
+
+    def invalidate(self):
+        # Questions were changed by this process: check the version on the next snapshot()
+        self._checked = float('-inf')
+
+bank_cache = BankCache()
+
+def _sample(ids, count, chosen, rng):
+    # Up to count ids not already chosen, without copying the id array
+    if count <= 0 or not ids:
+        return []
+    extra = len(chosen)
+    while True:
+        candidates = rng.sample(range(len(ids)), min(len(ids), count + extra))
+        picked = [ids[i] for i in candidates if ids[i] not in chosen][:count]
+        if len(picked) == count or len(candidates) == len(ids):
+            return picked
+        extra *= 2
+
+def sample_question_ids(config=DEFAULT_CONFIG, rng=None, bank=None):
+    # Pre-shuffled list of question ids for one attempt, from the given or current bank snapshot
+    rng = rng or random.Random()
+    bank = bank or bank_cache.snapshot()
+    chosen = set()
+    selected = []
+    for (category, difficulty), count in config.quotas.items():
+        picked = _sample(bank.ids(category, difficulty), count, chosen, rng)
+        chosen.update(picked)
+        selected.extend(picked)
+    picked = _sample(bank.ids(), config.count - len(selected), chosen, rng)
+    selected.extend(picked)
+    rng.shuffle(selected)
+    return selected
+
+class QuizAttempt:
+    # One person's pass through a sampled quiz. Questions come from the bank
+    # snapshot current when the attempt started, so an attempt is unaffected by
+    # later imports; options are shown in a per-attempt random order and answers
+    # are given as the displayed option number.
+
+    def __init__(self, config=DEFAULT_CONFIG, rng=None):
+        self.rng = rng or random.Random()
+        self.config = config
+        self.bank = bank_cache.snapshot()
+        self.ids = sample_question_ids(config, self.rng, self.bank)
+        self._option_order = {}
+        self._correct = {}
+        self.answers = {}
+        self.choices = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _present(self, question):
+        order = [1, 2, 3, 4]
+        if self.config.shuffle_options:
+            self.rng.shuffle(order)
+        self._option_order[question.id] = order
+        self._correct[question.id] = question.answer
+        options = question.options
+        return {'id': question.id, 'question': question.question, 'options': [options[i - 1] for i in order],
+                'hint': question.hint}
+
+    def question(self, position):
+        question = self.bank.questions.get(self.ids[position])
+        return self._present(question) if question else None
+
+    def __iter__(self):
+        for position in range(len(self.ids)):
+            question = self.question(position)
+            if question is not None:
+                yield question
+
+    def all_questions(self):
+        # Every question of the attempt, for clients that want the whole quiz up front
+        return [question for question in map(self.question, range(len(self.ids))) if question is not None]
+
+    def answer(self, question_id, choice):
+        # Records the displayed option number chosen for a question; returns whether it is correct
+        order = self._option_order.get(question_id)
+        if order is None:
+            raise KeyError(f"Question {question_id} is not part of this quiz")
+        choice = str(choice).strip()
+        option = order[int(choice) - 1] if choice in ('1', '2', '3', '4') else None
+        correct = option is not None and str(option) == self._correct[question_id]
+        self.answers[question_id] = correct
+        self.choices[question_id] = option
+        return correct
+
+    def responses(self):
+        # (question id, option chosen in the stored order or None, correct) for every question asked
+        return [(question_id, self.choices.get(question_id), self.answers.get(question_id, False))
+                for question_id in self._option_order]
+
+    @property
+    def score(self):
+        return sum(self.answers.values())
@@ -1,20 +1,22 @@
-import sqlite3
-
-def take_quiz(username):
-    conn = sqlite3.connect('quiz.db')
-    c = conn.cursor()
-    questions = c.execute("SELECT * FROM quiz").fetchall()
-    score = 0
-
-    for q in questions:
-        print(f"\n{q[0]}")
-        for i in range(1, 5):
-            print(f"{i}. {q[i]}")
-        ans = input("Your answer (1-4): ")
-        if ans == q[5]:
-            score += 1
-
-    print(f"\nQuiz completed! Your score: {score}/{len(questions)}")
-    c.execute("INSERT INTO leaderboard VALUES (?, ?)", (username, score))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+from leaderboard import rank_of_user
+from question_sampler import DEFAULT_CONFIG, QuizAttempt
+from result_writer import get_writer
+
+def submit_attempt(username, attempt):
+    # Queues the attempt for the batched writer; returns a Future of its attempt id
+    return get_writer().submit(username, attempt.score, len(attempt), attempt.responses())
+
+def take_quiz(username, config=DEFAULT_CONFIG):
+    attempt = QuizAttempt(config)
+
+    for q in attempt:
+        print(f"\n{q['question']}")
+        for i, option in enumerate(q['options'], start=1):
+            print(f"{i}. {option}")
+        attempt.answer(q['id'], input("Your answer (1-4): "))
+
+    score = attempt.score
+    print(f"\nQuiz completed! Your score: {score}/{len(attempt)}")
+    submit_attempt(username, attempt).result()
+    rank, best, attempts = rank_of_user(username)
+    print(f"Your best score: {best} after {attempts} attempt(s), rank #{rank} on the leaderboard.")
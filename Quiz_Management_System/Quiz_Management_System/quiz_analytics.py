@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from repository import query, transaction
+
+# Question and user statistics over the attempts and attempt_answers tables
+# written by result_writer. Only running sums are stored (question_stats and
+# user_stats, created by db_setup), so each update reads just the attempts
+# added since the previous one (analytics_state keeps the last attempt id)
+# and adds them to the totals:
+#   difficulty      share of answers that were correct (p-value)
+#   discrimination  point-biserial correlation between answering the question
+#                   correctly and the score on the rest of the quiz
+#   distractors     share of answers picking each option
+#   trend           per-user least-squares slope of score over attempt number
+
+QUESTION_SUMS = ('answered', 'correct', 'chose_1', 'chose_2', 'chose_3', 'chose_4', 'skipped',
+                 'rest_n', 'rest_correct', 'sum_rest', 'sum_rest2', 'sum_correct_rest')
+USER_SUMS = ('attempts', 'sum_t', 'sum_t2', 'sum_y', 'sum_y2', 'sum_ty')
+
+UPSERT_QUESTION = (f"INSERT INTO question_stats (question_id, {', '.join(QUESTION_SUMS)}) "
+                   f"VALUES (?{', ?' * len(QUESTION_SUMS)}) ON CONFLICT(question_id) DO UPDATE SET "
+                   + ', '.join(f"{c}={c}+excluded.{c}" for c in QUESTION_SUMS))
+UPSERT_USER = (f"INSERT INTO user_stats (username, {', '.join(USER_SUMS)}, last_score, best_score) "
+               f"VALUES (?{', ?' * (len(USER_SUMS) + 2)}) ON CONFLICT(username) DO UPDATE SET "
+               + ', '.join(f"{c}={c}+excluded.{c}" for c in USER_SUMS)
+               + ", last_score=excluded.last_score, best_score=MAX(best_score, excluded.best_score)")
+
+CHUNK = 500
+EASY = 0.9
+HARD = 0.2
+LOW_DISCRIMINATION = 0.1
+
+def _question_sums(answers):
+    # answers: attempt_id, question_id, choice, correct, score, total (one row per answer)
+    correct = answers['correct'].to_numpy(dtype=np.float64)
+    total = answers['total'].to_numpy(dtype=np.float64)
+    has_rest = total > 1
+    rest = np.where(has_rest, (answers['score'].to_numpy(dtype=np.float64) - correct) / np.maximum(total - 1, 1), 0.0)
+    choice = answers['choice'].to_numpy(dtype=np.float64)
+    frame = pd.DataFrame({
+        'question_id': answers['question_id'].to_numpy(),
+        'answered': 1,
+        'correct': correct,
+        **{f'chose_{k}': (choice == k).astype(np.int64) for k in range(1, 5)},
+        'skipped': np.isnan(choice).astype(np.int64),
+        'rest_n': has_rest.astype(np.int64),
+        'rest_correct': correct * has_rest,
+        'sum_rest': rest,
+        'sum_rest2': rest * rest,
+        'sum_correct_rest': correct * rest,
+    })
+    return frame.groupby('question_id', sort=False).sum()
+
+def _user_sums(attempts, previous_counts):
+    # attempts: id, username, score, total ordered by id; t numbers each user's attempts from 1
+    attempts = attempts.sort_values('id')
+    offset = attempts['username'].map(previous_counts).fillna(0).to_numpy()
+    t = offset + attempts.groupby('username', sort=False).cumcount().to_numpy() + 1
+    y = (attempts['score'] / attempts['total'].where(attempts['total'] > 0)).fillna(0.0).to_numpy()
+    frame = pd.DataFrame({'username': attempts['username'].to_numpy(), 'attempts': 1, 'sum_t': t, 'sum_t2': t * t,
+                          'sum_y': y, 'sum_y2': y * y, 'sum_ty': t * y, 'last_score': y, 'best_score': y})
+    grouped = frame.groupby('username', sort=False)
+    sums = grouped[list(USER_SUMS)].sum()
+    sums['last_score'] = grouped['last_score'].last()
+    sums['best_score'] = grouped['best_score'].max()
+    return sums
+
+def _rows(frame):
+    # Plain Python values for sqlite3, which does not accept NumPy integers
+    return zip(*(frame[column].tolist() for column in frame.columns))
+
+def _previous_attempt_counts(conn, usernames):
+    counts = {}
+    for start in range(0, len(usernames), CHUNK):
+        chunk = usernames[start:start + CHUNK]
+        counts.update(conn.execute(f"SELECT username, attempts FROM user_stats WHERE username IN "
+                                   f"({', '.join('?' * len(chunk))})", chunk).fetchall())
+    return counts
+
+def update_analytics(batch_attempts=50_000):
+    # Adds every attempt recorded since the last update; returns how many were added
+    processed = 0
+    while True:
+        with transaction() as conn:
+            row = conn.execute("SELECT value FROM analytics_state WHERE name='last_attempt_id'").fetchone()
+            last_id = row[0] if row else 0
+            attempts = pd.DataFrame(conn.execute(
+                "SELECT id, username, score, total FROM attempts WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_attempts)).fetchall(), columns=['id', 'username', 'score', 'total'])
+            if attempts.empty:
+                return processed
+            upto = int(attempts['id'].iloc[-1])
+            answers = pd.DataFrame(conn.execute(
+                "SELECT a.attempt_id, a.question_id, a.choice, a.correct, t.score, t.total "
+                "FROM attempt_answers a JOIN attempts t ON t.id = a.attempt_id "
+                "WHERE a.attempt_id > ? AND a.attempt_id <= ?", (last_id, upto)).fetchall(),
+                columns=['attempt_id', 'question_id', 'choice', 'correct', 'score', 'total'])
+            if not answers.empty:
+                sums = _question_sums(answers)
+                conn.executemany(UPSERT_QUESTION, _rows(sums.reset_index()))
+            previous = _previous_attempt_counts(conn, attempts['username'].unique().tolist())
+            users = _user_sums(attempts, previous)
+            conn.executemany(UPSERT_USER, _rows(users.reset_index()))
+            conn.execute("INSERT INTO analytics_state VALUES ('last_attempt_id', ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value=excluded.value", (upto,))
+        processed += len(attempts)
+
+def rebuild_analytics():
+    with transaction() as conn:
+        conn.execute("DELETE FROM question_stats")
+        conn.execute("DELETE FROM user_stats")
+        conn.execute("DELETE FROM analytics_state WHERE name='last_attempt_id'")
+    return update_analytics()
+
+def question_report(min_answers=1):
+    # One row per answered question: difficulty, discrimination, distractor shares and flags
+    columns = ['question_id', 'question', 'answer', *QUESTION_SUMS]
+    stats = pd.DataFrame(query(
+        f"SELECT s.question_id, q.question, q.answer, {', '.join('s.' + c for c in QUESTION_SUMS)} "
+        "FROM question_stats s LEFT JOIN quiz q ON q.id = s.question_id WHERE s.answered >= ?",
+        (min_answers,)), columns=columns).set_index('question_id')
+    n = stats['rest_n'].astype(np.float64)
+    sx = stats['rest_correct']
+    covariance = n * stats['sum_correct_rest'] - sx * stats['sum_rest']
+    variance_x = n * sx - sx * sx
+    variance_y = n * stats['sum_rest2'] - stats['sum_rest'] ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = covariance / np.sqrt(variance_x * variance_y)
+    report = pd.DataFrame({
+        'question': stats['question'],
+        'answered': stats['answered'],
+        'difficulty': stats['correct'] / stats['answered'],
+        'discrimination': discrimination.replace([np.inf, -np.inf], np.nan),
+    })
+    for k in range(1, 5):
+        report[f'option_{k}'] = stats[f'chose_{k}'] / stats['answered']
+    report['skipped'] = stats['skipped'] / stats['answered']
+    report['flag'] = np.select(
+        [report['difficulty'] >= EASY, report['difficulty'] <= HARD, report['discrimination'] < LOW_DISCRIMINATION],
+        ['too easy', 'too hard', 'low discrimination'], default='')
+    return report
+
+def user_trends(min_attempts=1):
+    # One row per user: attempts, mean and best score (0-1), last score and trend per attempt
+    stats = pd.DataFrame(query(
+        f"SELECT username, {', '.join(USER_SUMS)}, last_score, best_score FROM user_stats WHERE attempts >= ?",
+        (min_attempts,)), columns=['username', *USER_SUMS, 'last_score', 'best_score']).set_index('username')
+    n = stats['attempts'].astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * stats['sum_ty'] - stats['sum_t'] * stats['sum_y']) / (n * stats['sum_t2'] - stats['sum_t'] ** 2)
+    return pd.DataFrame({
+        'attempts': stats['attempts'],
+        'mean_score': stats['sum_y'] / n,
+        'best_score': stats['best_score'],
+        'last_score': stats['last_score'],
+        'trend': slope.replace([np.inf, -np.inf], np.nan),
+    })
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from db_setup import initialize_db
+
+    parser = argparse.ArgumentParser(description="Question difficulty, discrimination and user score trends.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from every attempt")
+    parser.add_argument("--questions", type=int, default=10, help="questions to list (hardest first)")
+    parser.add_argument("--users", type=int, default=10, help="users to list (most improved first)")
+    parser.add_argument("--min-answers", type=int, default=5)
+    args = parser.parse_args()
+
+    initialize_db()
+    start = time.perf_counter()
+    added = rebuild_analytics() if args.rebuild else update_analytics()
+    print(f"{added} new attempt(s) added in {time.perf_counter() - start:.2f}s")
+
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_colwidth', 40)
+    questions = question_report(args.min_answers)
+    if not questions.empty:
+        print(f"\nQuestions answered at least {args.min_answers} times, hardest first:")
+        print(questions.sort_values('difficulty').head(args.questions).round(3).to_string())
+        flagged = questions['flag'].value_counts()
+        summary = ', '.join(f"{count} {flag}" for flag, count in flagged.items() if flag)
+        print("\n" + (summary or "No questions flagged."))
+    trends = user_trends(2)
+    if not trends.empty:
+        print("\nMost improved users:")
+        print(trends.sort_values('trend', ascending=False).head(args.users).round(3).to_string())
@@ -0,0 +1,402 @@
+import asyncio
+import csv
+import io
+import json
+import secrets
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+import admin
+import user_admin
+from db_setup import initialize_db
+from leaderboard import leaderboard_page, rank_of_user
+from auth import authenticate, current_account
+from question_bank import import_rows
+from question_sampler import QUIZ_LENGTH, QuizAttempt, QuizConfig
+from quiz import submit_attempt
+from result_writer import close_writer, get_writer
+from repository import POOL_SIZE
+
+# HTTP/JSON front end for the quiz, so many people can take it at once.
+#
+#   POST /login             {"username", "password"}        -> {"token", "role"}
+#   POST /logout
+#   GET  /quiz              ?count=10&category=&difficulty= -> {"questions": [{"id", "question", "options", "hint"}]}
+#   POST /quiz              {"answers": {"<id>": "1"-"4"}}  -> {"score", "total", "best", "rank", "attempts"}
+#   GET  /leaderboard       ?limit=10&after_user=&after_score=
+#   GET  /leaderboard/me
+#   GET  /admin/users       ?role=&status=&after=&limit=50  -> {"users", "next"}
+#   POST /admin/users/status {"status", "usernames": [...]} or {"status", "pattern": "class2024_*"}
+#   POST /admin/users/import CSV text, as accepted by user_admin.py
+#   POST /admin/questions   {"question", "options", "answer", "category", "difficulty"}
+#   POST /admin/import      CSV text, as accepted by question_bank.py
+#   POST /admin/block       {"username"}  (and /admin/unblock)
+#   GET  /admin/metrics     result writer queue depth and flush latency
+#
+# Every request but /login needs an "Authorization: Bearer <token>" header.
+# Database calls run on a thread pool the size of the connection pool, so
+# the event loop keeps serving other clients while SQLite works.
+
+SESSION_TTL = 3600
+MAX_SESSIONS = 100_000
+MAX_BODY = 10 * 1024 * 1024
+MAX_QUIZ_LENGTH = 100
+MAX_USER_PAGE = 1000
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+           405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class Sessions:
+    # Logged-in tokens, least recently used first; the oldest are dropped beyond max_sessions
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, username, role):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._sessions[token] = {'username': username, 'role': role, 'expires': time.monotonic() + self.ttl}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session['expires'] < time.monotonic():
+                del self._sessions[token]
+                return None
+            session['expires'] = time.monotonic() + self.ttl
+            self._sessions.move_to_end(token)
+            return session
+
+    def drop(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def drop_user(self, username):
+        self.drop_users((username,))
+
+    def drop_users(self, usernames):
+        usernames = set(usernames)
+        with self._lock:
+            for token in [t for t, s in self._sessions.items() if s['username'] in usernames]:
+                del self._sessions[token]
+
+class QuizService:
+    def __init__(self, workers=POOL_SIZE):
+        self.sessions = Sessions()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-db')
+        self.routes = {
+            ('POST', '/login'): self.login,
+            ('POST', '/logout'): self.logout,
+            ('GET', '/quiz'): self.get_quiz,
+            ('POST', '/quiz'): self.submit_quiz,
+            ('GET', '/leaderboard'): self.leaderboard,
+            ('GET', '/leaderboard/me'): self.my_rank,
+            ('GET', '/admin/users'): self.users,
+            ('POST', '/admin/users/status'): self.set_users_status,
+            ('POST', '/admin/users/import'): self.import_users,
+            ('POST', '/admin/questions'): self.add_question,
+            ('POST', '/admin/import'): self.import_questions,
+            ('POST', '/admin/block'): self.block,
+            ('POST', '/admin/unblock'): self.unblock,
+            ('GET', '/admin/metrics'): self.metrics,
+        }
+
+    async def db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def handle(self, method, path, query, headers, body):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                raise HTTPError(405, f"{method} is not allowed on {path}")
+            raise HTTPError(404, f"No such endpoint: {path}")
+        session = None
+        if path != '/login':
+            token = headers.get('authorization', '').removeprefix('Bearer ').strip()
+            session = self.sessions.get(token)
+            if session is None:
+                raise HTTPError(401, "Log in first")
+            session['token'] = token
+            if path == '/quiz' or path.startswith('/admin/'):
+                # Blocking or role changes may come from another process, e.g. user_admin.py
+                account = await self.db(current_account, session['username'])
+                if account is None or account[1] == 'blocked' or account[0] != session['role']:
+                    self.sessions.drop(token)
+                    raise HTTPError(401, "Session ended; log in again")
+            if path.startswith('/admin/') and session['role'] != 'admin':
+                raise HTTPError(403, "Admins only")
+        return await handler(session, query, body)
+
+    async def login(self, session, query, body):
+        data = parse_json(body)
+        username, password = data.get('username'), data.get('password')
+        if not isinstance(username, str) or not isinstance(password, str):
+            raise HTTPError(400, "username and password are required")
+        result = await self.db(authenticate, username, password)
+        if not result:
+            raise HTTPError(401, "Invalid credentials.")
+        role, status = result
+        if status == 'blocked':
+            raise HTTPError(403, "Your account is blocked.")
+        return {'token': self.sessions.create(username, role), 'role': role}
+
+    async def logout(self, session, query, body):
+        self.sessions.drop(session['token'])
+        return {'ok': True}
+
+    async def get_quiz(self, session, query, body):
+        # Samples a new quiz for this session; its answers are checked by the next POST /quiz
+        count = min(max(int_param(query, 'count', QUIZ_LENGTH), 1), MAX_QUIZ_LENGTH)
+        category = query.get('category', [None])[0]
+        difficulty = query.get('difficulty', [None])[0]
+        config = QuizConfig(count, {(category, difficulty): count} if category or difficulty else None)
+        attempt = await self.db(QuizAttempt, config)
+        questions = await self.db(attempt.all_questions)
+        session['attempt'] = attempt
+        return {'questions': questions}
+
+    async def submit_quiz(self, session, query, body):
+        answers = parse_json(body).get('answers')
+        if not isinstance(answers, dict):
+            raise HTTPError(400, "answers must map question ids to options")
+        attempt = session.get('attempt')
+        if attempt is None:
+            raise HTTPError(409, "Get a quiz first")
+        # Every answer is checked before the attempt is used up, so a bad id leaves it open for a retry
+        asked = set(attempt.ids)
+        parsed = {}
+        for question_id, choice in answers.items():
+            try:
+                key = int(question_id)
+            except ValueError:
+                key = None
+            if key not in asked:
+                raise HTTPError(400, f"Question {question_id} is not part of this quiz")
+            parsed[key] = choice
+        if session.pop('attempt', None) is not attempt:
+            raise HTTPError(409, "This quiz was already submitted")
+        for question_id, choice in parsed.items():
+            attempt.answer(question_id, choice)
+        # Answered once the batch holding this attempt is committed
+        await asyncio.wrap_future(submit_attempt(session['username'], attempt))
+        rank, best, attempts = await self.db(rank_of_user, session['username'])
+        return {'score': attempt.score, 'total': len(attempt), 'best': best, 'rank': rank, 'attempts': attempts}
+
+    async def leaderboard(self, session, query, body):
+        limit = min(max(int_param(query, 'limit', 10), 1), 100)
+        after = None
+        if 'after_user' in query:
+            after = (query['after_user'][0], int_param(query, 'after_score', 0))
+        rows = await self.db(leaderboard_page, limit, after)
+        return {'leaderboard': [{'username': username, 'score': score} for username, score in rows]}
+
+    async def my_rank(self, session, query, body):
+        result = await self.db(rank_of_user, session['username'])
+        if result is None:
+            return {'rank': None}
+        rank, best, attempts = result
+        return {'rank': rank, 'best': best, 'attempts': attempts}
+
+    async def users(self, session, query, body):
+        limit = min(max(int_param(query, 'limit', user_admin.PAGE_SIZE), 1), MAX_USER_PAGE)
+        role, status, after = (query[name][0] if name in query else None for name in ('role', 'status', 'after'))
+        rows = await self.db(user_admin.list_users, role, status, after, limit)
+        return {'users': [{'username': u, 'role': r, 'status': s} for u, r, s in rows],
+                'next': rows[-1][0] if len(rows) == limit else None}
+
+    async def set_users_status(self, session, query, body):
+        data = parse_json(body)
+        usernames, pattern = data.get('usernames'), data.get('pattern')
+        if usernames is not None and not (isinstance(usernames, list) and all(isinstance(u, str) for u in usernames)):
+            raise HTTPError(400, "usernames must be a list of strings")
+        if pattern is not None and not isinstance(pattern, str):
+            raise HTTPError(400, "pattern must be a string")
+        try:
+            changed = await self.db(partial(user_admin.set_status_bulk, data.get('status'),
+                                            usernames=usernames, pattern=pattern))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        if data.get('status') == 'blocked':
+            self.sessions.drop_users(changed)
+        return {'status': data.get('status'), 'changed': len(changed)}
+
+    async def import_users(self, session, query, body):
+        rows = csv.reader(io.StringIO(body.decode('utf-8-sig')))
+        try:
+            report = await self.db(user_admin.import_user_rows, rows, query.get('update', [''])[0] == '1')
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return {'inserted': report.inserted, 'updated': report.updated, 'skipped': report.skipped,
+                'invalid': report.invalid,
+                'errors': [{'line': line, 'reason': reason} for line, reason in report.errors]}
+
+    async def add_question(self, session, query, body):
+        data = parse_json(body)
+        try:
+            added = await self.db(admin.create_question, str(data.get('question', '')),
+                                  list(data.get('options') or []), data.get('answer', ''),
+                                  data.get('category') or None, data.get('difficulty') or None)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        if not added:
+            raise HTTPError(409, "This question is already in the quiz.")
+        return {'added': True}
+
+    async def import_questions(self, session, query, body):
+        rows = csv.reader(io.StringIO(body.decode('utf-8-sig')))
+        try:
+            report = await self.db(import_rows, rows)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return {'inserted': report.inserted, 'skipped': report.skipped, 'invalid': report.invalid,
+                'errors': [{'line': line, 'reason': reason} for line, reason in report.errors]}
+
+    async def metrics(self, session, query, body):
+        return get_writer().metrics()
+
+    async def block(self, session, query, body):
+        return await self._set_status(body, 'blocked')
+
+    async def unblock(self, session, query, body):
+        return await self._set_status(body, 'active')
+
+    async def _set_status(self, body, status):
+        username = parse_json(body).get('username')
+        if not await self.db(admin.set_user_status, username, status):
+            raise HTTPError(404, f"No such user: {username}")
+        if status == 'blocked':
+            self.sessions.drop_user(username)
+        return {'username': username, 'status': status}
+
+def parse_json(body):
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HTTPError(400, "Request body is not valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return data
+
+def int_param(query, name, default):
+    try:
+        return int(query[name][0]) if name in query else default
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+
+async def read_request(reader):
+    # Returns (method, target, headers, body), or None when the client closed the connection
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "Content-Length must be a non-negative integer")
+    if length > MAX_BODY:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+def encode_response(status, payload, keep_alive):
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+async def serve_connection(service, reader, writer):
+    try:
+        while True:
+            keep_alive = False  # until the request is read, the rest of the stream cannot be trusted
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                url = urlsplit(target)
+                status, payload = 200, await service.handle(method, url.path, parse_qs(url.query), headers, body)
+            except HTTPError as e:
+                status, payload = e.status, {'error': str(e)}
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception:
+                # The details stay in the server's log; clients only learn that the request failed
+                traceback.print_exc(file=sys.stderr)
+                status, payload = 500, {'error': "Internal server error"}
+            writer.write(encode_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(host='127.0.0.1', port=8000, workers=POOL_SIZE, ready=None):
+    service = QuizService(workers)
+    server = await asyncio.start_server(lambda r, w: serve_connection(service, r, w), host, port, backlog=4096)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    loop = asyncio.get_running_loop()
+    serving = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, serving.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass  # not available on Windows, Ctrl+C still raises KeyboardInterrupt
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        # Attempts still queued are written before the process exits
+        await loop.run_in_executor(None, close_writer)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the quiz over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=POOL_SIZE, help="threads running database calls")
+    args = parser.parse_args()
+
+    initialize_db()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers,
+                          ready=lambda port: print(f"Quiz service listening on http://{args.host}:{port}/", flush=True)))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,185 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Database file; override with the QUIZ_DB environment variable or configure()
+DB_PATH = os.environ.get('QUIZ_DB', 'quiz.db')
+POOL_SIZE = 4
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16384",
+    "PRAGMA busy_timeout=5000",
+)
+
+class ConnectionPool:
+    # Connections are opened lazily up to `size` and handed to one thread at a time.
+    # Each keeps its own cache of prepared statements, so reusing the same SQL text
+    # skips re-preparing it.
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class Repository:
+    def __init__(self, path=None, pool_size=POOL_SIZE):
+        self.path = path or DB_PATH
+        self.pool = ConnectionPool(self.path, pool_size)
+
+    @contextmanager
+    def transaction(self, durable=False):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        # wait on busy_timeout instead of failing halfway through. A durable
+        # transaction is synced to disk on commit (synchronous=FULL); otherwise
+        # WAL mode may lose the last commits on power failure, never corrupt.
+        with self.pool.connection() as conn:
+            if durable:
+                conn.execute("PRAGMA synchronous=FULL")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+            finally:
+                if durable:
+                    conn.execute("PRAGMA synchronous=NORMAL")
+
+    @contextmanager
+    def read(self):
+        # A deferred read transaction: every query in it sees the same committed state
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def stream(self, sql, params=(), size=1000):
+        # Yields rows a batch at a time, holding one connection until exhausted or closed
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+
+    def execute(self, sql, params=()):
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def executemany(self, sql, rows):
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    def close(self):
+        self.pool.close()
+
+_repository = None
+_repository_lock = threading.Lock()
+
+def configure(path=None, pool_size=POOL_SIZE):
+    global _repository
+    with _repository_lock:
+        if _repository is not None:
+            _repository.close()
+        _repository = Repository(path, pool_size)
+    return _repository
+
+def get_repository():
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = Repository()
+    return _repository
+
+def transaction(durable=False):
+    return get_repository().transaction(durable)
+
+def read():
+    return get_repository().read()
+
+def query(sql, params=()):
+    return get_repository().query(sql, params)
+
+def query_one(sql, params=()):
+    return get_repository().query_one(sql, params)
+
+def stream(sql, params=(), size=1000):
+    return get_repository().stream(sql, params, size)
+
+def execute(sql, params=()):
+    return get_repository().execute(sql, params)
+
+def executemany(sql, rows):
+    return get_repository().executemany(sql, rows)
@@ -0,0 +1,175 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from leaderboard import apply_score, invalidate_cache
+from repository import transaction
+
+BATCH_SIZE = 500
+# Seconds to keep collecting after the first queued result. 0 writes whatever
+# is queued as soon as the writer is free; results arriving during a write
+# then form the next batch.
+FLUSH_INTERVAL = 0.0
+# A batch that fails with sqlite3.OperationalError (e.g. SQLITE_BUSY after the
+# busy timeout) is retried this many times, waiting RETRY_BACKOFF seconds
+# before the first retry and twice as long before each next one
+RETRIES = 5
+RETRY_BACKOFF = 0.1
+
+_STOP = object()
+
+class AttemptResult:
+    __slots__ = ('username', 'score', 'total', 'responses', 'finished_at', 'future')
+
+    def __init__(self, username, score, total, responses):
+        self.username = username
+        self.score = score
+        self.total = total
+        self.responses = responses
+        self.finished_at = time.time()
+        self.future = Future()
+
+class ResultWriter:
+    # Write-behind queue for finished attempts. Submissions are queued and a
+    # background thread writes them in batches: a batch is committed once it
+    # holds batch_size attempts or flush_interval seconds after its first one,
+    # so concurrent submissions share one durable transaction (and one fsync)
+    # instead of waiting on each other's write lock. Each submission returns a
+    # Future that resolves to the attempt id once its batch is on disk.
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, retries=RETRIES,
+                 retry_backoff=RETRY_BACKOFF):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._batches = 0
+        self._written = 0
+        self._errors = 0
+        self._retries = 0
+        self._flush_seconds = 0.0
+        self._last_flush = 0.0
+        self._max_flush = 0.0
+        self._thread = threading.Thread(target=self._run, name='result-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, username, score, total, responses=()):
+        result = AttemptResult(username, score, total, list(responses))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The result writer is closed")
+            self._queue.put(result)
+        return result.future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    timeout = deadline - time.monotonic()
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _write(self, batch):
+        with transaction(durable=True) as conn:
+            attempt_ids = []
+            for result in batch:
+                attempt_id = conn.execute("INSERT INTO attempts (username, score, total, finished_at) "
+                                          "VALUES (?, ?, ?, ?)",
+                                          (result.username, result.score, result.total, result.finished_at)).lastrowid
+                attempt_ids.append(attempt_id)
+                apply_score(conn, result.username, result.score)
+            conn.executemany("INSERT OR REPLACE INTO attempt_answers VALUES (?, ?, ?, ?)",
+                             [(attempt_id, question_id, choice, int(correct))
+                              for attempt_id, result in zip(attempt_ids, batch)
+                              for question_id, choice, correct in result.responses])
+        return attempt_ids
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            for retry in range(self.retries + 1):
+                try:
+                    attempt_ids = self._write(batch)
+                    break
+                except sqlite3.OperationalError:
+                    # The transaction was rolled back, so the whole batch can be written again
+                    if retry == self.retries:
+                        raise
+                    with self._lock:
+                        self._retries += 1
+                    time.sleep(self.retry_backoff * 2 ** retry)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            for result in batch:
+                result.future.set_exception(e)
+            return
+        invalidate_cache()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._batches += 1
+            self._written += len(batch)
+            self._flush_seconds += elapsed
+            self._last_flush = elapsed
+            self._max_flush = max(self._max_flush, elapsed)
+        for attempt_id, result in zip(attempt_ids, batch):
+            result.future.set_result(attempt_id)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'written': self._written,
+                'errors': self._errors,
+                'retries': self._retries,
+                'avg_batch': self._written / self._batches if self._batches else 0.0,
+                'last_flush_ms': self._last_flush * 1000,
+                'avg_flush_ms': self._flush_seconds / self._batches * 1000 if self._batches else 0.0,
+                'max_flush_ms': self._max_flush * 1000,
+            }
+
+    def close(self):
+        # Writes everything already submitted, then stops the writer thread
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ResultWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+def close_writer():
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,242 @@
+import csv
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from auth import hash_password, invalidate_user, is_hashed
+from repository import query, query_one, stream, transaction
+
+BATCH_SIZE = 5_000
+PAGE_SIZE = 50
+CHUNK = 500
+ROLES = ('admin', 'user')
+STATUSES = ('active', 'blocked')
+EXPORT_COLUMNS = ('username', 'role', 'status')
+
+_USERNAME = re.compile(r'[\w.@+-]{1,64}')
+
+UPSERT_USER = ("INSERT INTO login (username, password, role, status) VALUES (?, ?, ?, ?) "
+               "ON CONFLICT(username) DO UPDATE SET password=excluded.password, role=excluded.role, "
+               "status=excluded.status")
+INSERT_USER = "INSERT OR IGNORE INTO login (username, password, role, status) VALUES (?, ?, ?, ?)"
+
+class UserImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []  # (line number, reason) of the first invalid rows
+
+    def add_invalid(self, line, reason, keep=20):
+        self.invalid += 1
+        if len(self.errors) < keep:
+            self.errors.append((line, reason))
+
+    def __str__(self):
+        return (f"{self.inserted} inserted, {self.updated} updated, {self.skipped} existing skipped, "
+                f"{self.invalid} invalid")
+
+def iter_users(rows, report):
+    # Yields (username, password, role, status) for valid CSV rows; the header must name the columns
+    rows = iter(rows)
+    header = [name.strip().lower() for name in next(rows, [])]
+    if 'username' not in header or 'password' not in header:
+        raise ValueError("The CSV header needs at least the username and password columns")
+    columns = {name: header.index(name) for name in ('username', 'password', 'role', 'status') if name in header}
+    width = max(columns.values()) + 1
+    for line, row in enumerate(rows, start=2):
+        if len(row) < width:
+            if not any(field.strip() for field in row):
+                continue
+            row = row + [''] * (width - len(row))
+        username = row[columns['username']].strip()
+        password = row[columns['password']]
+        role = row[columns['role']].strip().lower() if 'role' in columns else ''
+        status = row[columns['status']].strip().lower() if 'status' in columns else ''
+        if not _USERNAME.fullmatch(username):
+            report.add_invalid(line, f"invalid username {username!r}")
+        elif not password:
+            report.add_invalid(line, "empty password")
+        elif (role or 'user') not in ROLES:
+            report.add_invalid(line, f"unknown role {role!r}")
+        elif (status or 'active') not in STATUSES:
+            report.add_invalid(line, f"unknown status {status!r}")
+        else:
+            yield username, password, role or 'user', status or 'active'
+
+def _existing(conn, usernames):
+    found = set()
+    for start in range(0, len(usernames), CHUNK):
+        chunk = usernames[start:start + CHUNK]
+        found.update(row[0] for row in conn.execute(
+            f"SELECT username FROM login WHERE username IN ({', '.join('?' * len(chunk))})", chunk))
+    return found
+
+def _stored_password(password):
+    return password if is_hashed(password) else hash_password(password)
+
+def import_user_rows(rows, update_existing=False, batch_size=BATCH_SIZE, workers=None):
+    # Loads users in batches of one transaction each. Passwords may be plaintext, hashed here on
+    # `workers` threads (hashlib releases the GIL), or hashes exported from another quiz database.
+    # Existing usernames are skipped unless update_existing, and are never hashed for nothing.
+    report = UserImportReport()
+    users = iter_users(rows, report)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as hasher:
+        while True:
+            batch = {user[0]: user for user in islice(users, batch_size)}
+            if not batch:
+                break
+            with transaction() as conn:
+                existing = _existing(conn, list(batch))
+            if not update_existing:
+                report.skipped += len(existing)
+                batch = {username: user for username, user in batch.items() if username not in existing}
+            passwords = hasher.map(_stored_password, [user[1] for user in batch.values()])
+            rows_to_write = [(username, password, role, status)
+                             for (username, _, role, status), password in zip(batch.values(), passwords)]
+            with transaction() as conn:
+                before = conn.total_changes
+                conn.executemany(UPSERT_USER if update_existing else INSERT_USER, rows_to_write)
+                written = conn.total_changes - before
+            updated = len(existing) if update_existing else 0
+            report.updated += updated
+            report.inserted += written - updated
+            report.skipped += len(rows_to_write) - written
+            for username in existing:
+                invalidate_user(username)
+    return report
+
+def import_users(filename, update_existing=False, batch_size=BATCH_SIZE, workers=None):
+    with open(filename, newline='', encoding='utf-8-sig') as csvfile:
+        return import_user_rows(csv.reader(csvfile), update_existing, batch_size, workers)
+
+def _filters(role=None, status=None, pattern=None):
+    conditions, params = [], []
+    for column, value in (('role', role), ('status', status)):
+        if value is not None:
+            conditions.append(f"{column}=?")
+            params.append(value)
+    if pattern is not None:
+        conditions.append("username GLOB ?")
+        params.append(pattern)
+    return conditions, params
+
+def export_users(filename, role=None, status=None, include_passwords=False):
+    # Streams the matching users to CSV in username order; returns the number written
+    columns = EXPORT_COLUMNS[:1] + ('password',) + EXPORT_COLUMNS[1:] if include_passwords else EXPORT_COLUMNS
+    conditions, params = _filters(role, status)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    count = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        for row in stream(f"SELECT {', '.join(columns)} FROM login{where} ORDER BY username", params):
+            writer.writerow(row)
+            count += 1
+    return count
+
+def set_status_bulk(status, usernames=None, pattern=None, role='user'):
+    # Sets status for a list of usernames or those matching a GLOB pattern (e.g. 'batch2024_*'),
+    # in one transaction. Patterns only touch accounts with `role`, so admins are not locked out by
+    # accident. Returns the usernames whose status changed.
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status {status!r}")
+    if (usernames is None) == (pattern is None):
+        raise ValueError("Give either a list of usernames or a pattern")
+    with transaction() as conn:
+        if pattern is not None:
+            conditions, params = _filters(role, None, pattern)
+            where = ' AND '.join(conditions + ["status != ?"])
+            changed = [row[0] for row in conn.execute(f"SELECT username FROM login WHERE {where}", (*params, status))]
+            conn.execute(f"UPDATE login SET status=? WHERE {where}", (status, *params, status))
+        else:
+            usernames = list(dict.fromkeys(usernames))
+            changed = []
+            for start in range(0, len(usernames), CHUNK):
+                chunk = usernames[start:start + CHUNK]
+                changed.extend(row[0] for row in conn.execute(
+                    f"SELECT username FROM login WHERE status != ? AND username IN ({', '.join('?' * len(chunk))})",
+                    (status, *chunk)))
+            conn.executemany("UPDATE login SET status=? WHERE username=?", [(status, username) for username in changed])
+    for username in changed:
+        invalidate_user(username)
+    return changed
+
+def list_users(role=None, status=None, after=None, limit=PAGE_SIZE):
+    # One page of (username, role, status) in username order; pass the last username as `after`
+    conditions, params = _filters(role, status)
+    if after is not None:
+        conditions.append("username > ?")
+        params.append(after)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return query(f"SELECT username, role, status FROM login{where} ORDER BY username LIMIT ?", (*params, limit))
+
+def count_users(role=None, status=None):
+    conditions, params = _filters(role, status)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return query_one(f"SELECT COUNT(*) FROM login{where}", params)[0]
+
+def timed(label, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label} in {time.perf_counter() - start:.2f}s")
+    return result
+
+if __name__ == "__main__":
+    import argparse
+
+    from db_setup import initialize_db
+
+    parser = argparse.ArgumentParser(description="Bulk user administration for the quiz database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("import", help="add users from a CSV with username,password[,role,status]")
+    command.add_argument("csv")
+    command.add_argument("--update", action="store_true", help="also overwrite existing users")
+    command.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    command.add_argument("--workers", type=int, default=None, help="password hashing threads")
+    command = commands.add_parser("export", help="write users to a CSV")
+    command.add_argument("csv")
+    command.add_argument("--role", choices=ROLES)
+    command.add_argument("--status", choices=STATUSES)
+    command.add_argument("--passwords", action="store_true", help="include the password hashes")
+    for name in ("block", "unblock"):
+        command = commands.add_parser(name, help=f"{name} users by name or GLOB pattern")
+        command.add_argument("usernames", nargs="*")
+        command.add_argument("--pattern", help="e.g. 'class2024_*'; only affects plain users")
+        command.add_argument("--from-file", help="file with one username per line")
+    command = commands.add_parser("list", help="list users a page at a time")
+    command.add_argument("--role", choices=ROLES)
+    command.add_argument("--status", choices=STATUSES)
+    command.add_argument("--after", help="last username of the previous page")
+    command.add_argument("--limit", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    initialize_db()
+    if args.command == "import":
+        report = timed(f"Imported {args.csv}", import_users, args.csv, args.update, args.batch_size, args.workers)
+        print(report)
+        for line, reason in report.errors:
+            print(f"  line {line}: {reason}")
+    elif args.command == "export":
+        count = timed(f"Exported to {args.csv}", export_users, args.csv, args.role, args.status, args.passwords)
+        print(f"{count} user(s) written")
+    elif args.command in ("block", "unblock"):
+        usernames = list(args.usernames)
+        if args.from_file:
+            with open(args.from_file, encoding='utf-8') as f:
+                usernames.extend(line.strip() for line in f if line.strip())
+        if args.pattern and usernames:
+            parser.error("give either usernames or --pattern")
+        status = 'blocked' if args.command == "block" else 'active'
+        changed = timed(f"Set status {status}", set_status_bulk, status,
+                        usernames=None if args.pattern else usernames, pattern=args.pattern)
+        print(f"{len(changed)} user(s) changed")
+    else:
+        rows = timed("Listed", list_users, args.role, args.status, args.after, args.limit)
+        for username, role, status in rows:
+            print(f"{username:<30} {role:<6} {status}")
+        print(f"{len(rows)} of {count_users(args.role, args.status)} user(s)"
+              + (f", next page: --after {rows[-1][0]}" if len(rows) == args.limit else ""))